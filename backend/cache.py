@@ -0,0 +1,326 @@
+import asyncio
+import time
+from collections import Counter, OrderedDict, deque
+from typing import Any, Awaitable, Callable
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from backend import config
+
+MISSING = object()
+
+
+def as_dict(obj) -> dict:
+    """Снимок колонок ORM-объекта, который можно держать в кэше"""
+
+    return {column.key: getattr(obj, column.key) for column in obj.__table__.columns}
+
+
+class TTLCache:
+    """Ограниченный по размеру LRU-кэш процесса с временем жизни записей"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.data: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str, default=MISSING):
+        if (entry := self.data.get(key)) is None:
+            self.misses += 1
+            return default
+
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self.data[key]
+            self.misses += 1
+            return default
+
+        self.data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: str, value, ttl: float | None = None):
+        self.data[key] = (time.monotonic() + (ttl or self.ttl), value)
+        self.data.move_to_end(key)
+        while len(self.data) > self.maxsize:
+            self.data.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, key: str):
+        self.data.pop(key, None)
+
+    def delete_prefix(self, prefix: str):
+        for key in [key for key in self.data if key.startswith(prefix)]:
+            del self.data[key]
+
+    def clear(self):
+        self.data.clear()
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self.data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class CacheBackend:
+    """Общий для всех процессов уровень кэша (Redis, memcached и т.п.)"""
+
+    async def get(self, key: str):
+        raise NotImplementedError
+
+    async def set(self, key: str, value, ttl: float):
+        raise NotImplementedError
+
+    async def delete(self, key: str):
+        raise NotImplementedError
+
+    async def delete_prefix(self, prefix: str):
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        return {}
+
+
+class InMemoryBackend(CacheBackend):
+    """Общий уровень в памяти процесса - заменитель внешнего кэша в тестах"""
+
+    def __init__(self, maxsize: int = 100_000, ttl: float = 60):
+        self.cache = TTLCache(maxsize, ttl)
+
+    async def get(self, key: str):
+        return self.cache.get(key)
+
+    async def set(self, key: str, value, ttl: float):
+        self.cache.set(key, value, ttl)
+
+    async def delete(self, key: str):
+        self.cache.delete(key)
+
+    async def delete_prefix(self, prefix: str):
+        self.cache.delete_prefix(prefix)
+
+    def stats(self) -> dict:
+        return self.cache.stats()
+
+
+class TieredCache:
+    """Двухуровневый кэш: LRU процесса и необязательный общий backend
+
+    Записи сбрасываются после коммита транзакции, которая их изменила:
+    crud-функции регистрируют ключи через invalidate_on_commit. Остальным
+    процессам сброс рассылает broadcast (мост LISTEN/NOTIFY), у них он
+    применяется через apply_remote.
+
+    Каждый сброс увеличивает version и попадает в журнал recent. Значение,
+    которое читалось из базы, пока его ключ сбрасывали, в кэш не кладется:
+    оно прочитано до коммита и уже устарело.
+    """
+
+    RECENT_INVALIDATIONS = 10_000
+
+    def __init__(
+        self,
+        local: TTLCache,
+        shared: CacheBackend | None = None,
+        enabled: bool = True,
+    ):
+        self.local = local
+        self.shared = shared
+        self.enabled = enabled
+        self.pending_tasks: set[asyncio.Task] = set()
+        self.broadcast: Callable[[set[tuple[str, bool]]], None] | None = None
+        self.version = 0
+        self.recent: deque[tuple[int, str, bool]] = deque(
+            maxlen=self.RECENT_INVALIDATIONS
+        )
+        # старшая версия, вытесненная из recent: по ней уже не проверить ключ
+        self.forgotten_version = 0
+        # сбросы, которые еще не дошли до общего уровня: читать его рано
+        self.unsynced: Counter[tuple[str, bool]] = Counter()
+        self.stale_fills = 0
+        self.remote_invalidations = 0
+
+    async def get_or_load(
+        self, key: str, loader: Callable[[], Awaitable[Any]], db=None
+    ):
+        if not self.enabled:
+            return await loader()
+
+        version = self.version
+        if (value := self.local.get(key)) is not MISSING:
+            return value
+
+        if self.shared is not None and not self._matches(key, self.unsynced):
+            if (value := await self.shared.get(key)) is not MISSING:
+                self.local.set(key, value)
+                return value
+
+        value = await loader()
+        await self._fill({key: value}, db, version)
+        return value
+
+    async def get_many_or_load(
+        self,
+        keys: list[str],
+        loader: Callable[[list[str]], Awaitable[dict[str, Any]]],
+        db=None,
+    ) -> dict[str, Any]:
+        """Значения нескольких ключей; промахи загружаются одним вызовом loader
+
+        loader получает ключи-промахи и возвращает словарь ключ - значение,
+        ненайденных ключей в нем нет.
+        """
+
+        if not self.enabled:
+            return await loader(keys)
+
+        version = self.version
+        found = {}
+        for key in keys:
+            if (value := self.local.get(key)) is not MISSING:
+                found[key] = value
+
+        if self.shared is not None:
+            for key in keys:
+                if key in found or self._matches(key, self.unsynced):
+                    continue
+                if (value := await self.shared.get(key)) is not MISSING:
+                    self.local.set(key, value)
+                    found[key] = value
+
+        if missing := [key for key in keys if key not in found]:
+            loaded = await loader(missing)
+            await self._fill(loaded, db, version)
+            found.update(loaded)
+        return found
+
+    async def _fill(self, values: dict[str, Any], db, version: int):
+        # сессия реплики, которая отставала при последней проверке, кэш не
+        # заполняет: иначе после инвалидации в кэш вернулись бы данные до
+        # записи и их читали бы все, включая только что писавшего клиента
+        if db is not None and not db.info.get("cache_fill", True):
+            return
+
+        for key, value in values.items():
+            if self._invalidated_since(key, version):
+                self.stale_fills += 1
+                continue
+            self.local.set(key, value)
+            if self.shared is not None:
+                await self.shared.set(key, value, self.local.ttl)
+
+    @staticmethod
+    def _matches(key: str, pending) -> bool:
+        return any(
+            key.startswith(target) if is_prefix else key == target
+            for target, is_prefix in pending
+        )
+
+    def _invalidated_since(self, key: str, version: int) -> bool:
+        if version == self.version:
+            return False
+        if self.forgotten_version > version:
+            return True
+        for entry_version, target, is_prefix in reversed(self.recent):
+            if entry_version <= version:
+                break
+            if key.startswith(target) if is_prefix else key == target:
+                return True
+        return False
+
+    def invalidate_on_commit(self, db, *keys: str, prefixes: tuple[str, ...] = ()):
+        pending = db.info.setdefault("cache_invalidate", set())
+        pending.update((key, False) for key in keys)
+        pending.update((prefix, True) for prefix in prefixes)
+
+    def invalidate(self, pending: set[tuple[str, bool]]):
+        """Сбрасывает ключи после коммита этого процесса и рассылает сброс"""
+
+        self._forget(pending)
+        if self.shared is None:
+            if self.broadcast is not None:
+                self.broadcast(pending)
+            return
+
+        # другие процессы узнают о сбросе после очистки общего уровня,
+        # иначе они успели бы перечитать из него старое значение
+        self.unsynced.update(pending)
+        task = asyncio.get_running_loop().create_task(self._invalidate_shared(pending))
+        self.pending_tasks.add(task)
+        task.add_done_callback(self.pending_tasks.discard)
+
+    def apply_remote(self, pending: set[tuple[str, bool]]):
+        """Сброс, пришедший от другого процесса: общий уровень он уже очистил"""
+
+        self.remote_invalidations += 1
+        self._forget(pending)
+
+    def clear_local(self):
+        """Сбрасывает весь кэш процесса, когда часть сбросов могла потеряться"""
+
+        self.local.clear()
+        self.version += 1
+        self.forgotten_version = self.version
+
+    def _forget(self, pending: set[tuple[str, bool]]):
+        self.version += 1
+        for key, is_prefix in pending:
+            if is_prefix:
+                self.local.delete_prefix(key)
+            else:
+                self.local.delete(key)
+            if len(self.recent) == self.recent.maxlen:
+                self.forgotten_version = self.recent[0][0]
+            self.recent.append((self.version, key, is_prefix))
+
+    async def _invalidate_shared(self, pending: set[tuple[str, bool]]):
+        try:
+            for key, is_prefix in pending:
+                if is_prefix:
+                    await self.shared.delete_prefix(key)
+                else:
+                    await self.shared.delete(key)
+        finally:
+            self.unsynced.subtract(pending)
+            self.unsynced = +self.unsynced
+            if self.broadcast is not None:
+                self.broadcast(pending)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "version": self.version,
+            "stale_fills": self.stale_fills,
+            "remote_invalidations": self.remote_invalidations,
+            "local": self.local.stats(),
+            "shared": self.shared.stats() if self.shared is not None else None,
+        }
+
+
+catalogue_cache = TieredCache(
+    TTLCache(config.CACHE_LOCAL_MAXSIZE, config.CACHE_TTL_SECONDS),
+    (
+        InMemoryBackend(ttl=config.CACHE_TTL_SECONDS)
+        if config.CACHE_SHARED_BACKEND == "memory"
+        else None
+    ),
+    enabled=config.CACHE_ENABLED,
+)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(ses: Session):
+    if pending := ses.info.pop("cache_invalidate", None):
+        catalogue_cache.invalidate(pending)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_after_rollback(ses: Session):
+    ses.info.pop("cache_invalidate", None)
@@ -0,0 +1,141 @@
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    return os.getenv(name, str(default)).strip().lower() in ("1", "true", "yes", "on")
+
+
+POSTGRES_USER = os.getenv("POSTGRES_USER")
+POSTGRES_PASSWORD = os.getenv("POSTGRES_PASSWORD")
+POSTGRES_DB = os.getenv("POSTGRES_DB")
+POSTGRES_HOST = os.getenv("POSTGRES_HOST")
+POSTGRES_PORT = os.getenv("POSTGRES_PORT")
+DATABASE_URL = os.getenv(
+    "DATABASE_URL",
+    f"postgresql+asyncpg://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}",
+)
+
+# Пул соединений: размер считается на один процесс uvicorn
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "20"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+DB_POOL_PRE_PING = _env_bool("DB_POOL_PRE_PING", True)
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+# сколько соединений открыть при старте приложения
+DB_POOL_WARMUP = int(os.getenv("DB_POOL_WARMUP", str(DB_POOL_SIZE)))
+
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "15000"))
+# 0 - если перед базой стоит pgbouncer в transaction-режиме
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "500"))
+# false - без логов SQL, true - запросы, debug - запросы и результаты
+DB_ECHO = os.getenv("DB_ECHO", "false").strip().lower()
+
+# Реплика для читающих GET-эндпоинтов; без нее чтение идет в основную БД
+DATABASE_REPLICA_URL = os.getenv("DATABASE_REPLICA_URL")
+# сколько секунд после записи клиент читает из основной БД
+DB_READ_YOUR_WRITES_SECONDS = float(os.getenv("DB_READ_YOUR_WRITES_SECONDS", "5"))
+# при большем отставании реплики чтение уходит в основную БД
+DB_REPLICA_MAX_LAG_SECONDS = float(os.getenv("DB_REPLICA_MAX_LAG_SECONDS", "5"))
+DB_REPLICA_CHECK_INTERVAL = float(os.getenv("DB_REPLICA_CHECK_INTERVAL", "2"))
+
+# Кэш каталога (товары и категории)
+CACHE_ENABLED = _env_bool("CACHE_ENABLED", True)
+CACHE_TTL_SECONDS = float(os.getenv("CACHE_TTL_SECONDS", "60"))
+CACHE_LOCAL_MAXSIZE = int(os.getenv("CACHE_LOCAL_MAXSIZE", "10000"))
+# none - только кэш процесса, memory - общий уровень в памяти (для тестов)
+CACHE_SHARED_BACKEND = os.getenv("CACHE_SHARED_BACKEND", "none").strip().lower()
+
+# JWT. Ключи подписи задаются кольцом, активный ключ выбирается по kid:
+# HS256 - JWT_SECRET_KEYS="kid1:secret1,kid2:secret2" (или один SECRET_KEY),
+# EdDSA/RS256 - файлы в JWT_KEYS_DIR: <kid>.key (закрытый) и <kid>.pub (открытый).
+# Старые ключи оставляют в кольце, пока не истекут подписанные ими токены.
+JWT_ALGORITHM = os.getenv("JWT_ALGORITHM", os.getenv("ALGORITHM") or "HS256")
+SECRET_KEY = os.getenv("SECRET_KEY")
+JWT_SECRET_KEYS = os.getenv("JWT_SECRET_KEYS", "")
+JWT_KEYS_DIR = os.getenv("JWT_KEYS_DIR")
+JWT_ACTIVE_KID = os.getenv("JWT_ACTIVE_KID")
+JWT_ACCESS_TOKEN_MINUTES = int(os.getenv("JWT_ACCESS_TOKEN_MINUTES", "30"))
+# проверенные токены: ключ - sha256 токена, запись живет до exp
+JWT_TOKEN_CACHE_MAXSIZE = int(os.getenv("JWT_TOKEN_CACHE_MAXSIZE", "10000"))
+
+# Хэширование паролей выполняется в отдельном пуле потоков, чтобы bcrypt
+# не блокировал event loop. При смене BCRYPT_ROUNDS хэши пересчитываются при входе.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(
+    os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1)))
+)
+# сколько операций может ждать свободный поток, сверх этого - 429
+PASSWORD_HASH_QUEUE = int(os.getenv("PASSWORD_HASH_QUEUE", "64"))
+
+# Refresh-токены: выдаются вместе с access-токеном и меняются при каждом обновлении
+JWT_REFRESH_TOKEN_DAYS = int(os.getenv("JWT_REFRESH_TOKEN_DAYS", "14"))
+# как часто процесс узнает об изменении прав пользователей
+PERMISSION_POLL_SECONDS = float(os.getenv("PERMISSION_POLL_SECONDS", "2"))
+
+# Массовый импорт и выгрузка каталога
+# 7 параметров на строку, лимит postgres - 32767 параметров на запрос
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "1000"))
+# сколько ошибок по строкам вернуть в отчете (считаются все)
+IMPORT_MAX_ERRORS = int(os.getenv("IMPORT_MAX_ERRORS", "1000"))
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+# куда пишутся сжатые выгрузки продаж для заданий по расписанию
+EXPORT_DIR = os.getenv("EXPORT_DIR", "exports")
+
+# Фоновые задачи (удаление и перенос поддерева категорий)
+JOB_BATCH_SIZE = int(os.getenv("JOB_BATCH_SIZE", "1000"))
+# пауза между пачками, чтобы не занимать БД у кассовых запросов
+JOB_BATCH_PAUSE_SECONDS = float(os.getenv("JOB_BATCH_PAUSE_SECONDS", "0.05"))
+# задачу без heartbeat дольше этого подхватывает другой процесс
+JOB_STALE_SECONDS = float(os.getenv("JOB_STALE_SECONDS", "60"))
+
+# Уведомления о низком остатке
+# порог для товаров, у которых нет своего порога и порога категории (пусто - нет)
+LOW_STOCK_DEFAULT_THRESHOLD = (
+    int(os.environ["LOW_STOCK_DEFAULT_THRESHOLD"])
+    if os.getenv("LOW_STOCK_DEFAULT_THRESHOLD")
+    else None
+)
+# повторное уведомление по товару не раньше, чем через это время
+LOW_STOCK_DEDUP_SECONDS = float(os.getenv("LOW_STOCK_DEDUP_SECONDS", "3600"))
+# уведомления копятся в памяти и пишутся одним INSERT раз в интервал
+LOW_STOCK_FLUSH_SECONDS = float(os.getenv("LOW_STOCK_FLUSH_SECONDS", "1"))
+LOW_STOCK_BATCH_SIZE = int(os.getenv("LOW_STOCK_BATCH_SIZE", "500"))
+# как часто SSE и long-poll проверяют уведомления других процессов
+NOTIFICATION_POLL_SECONDS = float(os.getenv("NOTIFICATION_POLL_SECONDS", "5"))
+
+# Поток изменений остатков и цен для касс и склада
+# сколько непрочитанных коммитов держать для клиента, дальше - resync
+STOCK_EVENTS_QUEUE_SIZE = int(os.getenv("STOCK_EVENTS_QUEUE_SIZE", "100"))
+# канал LISTEN/NOTIFY, через который процессы обмениваются событиями и сбросами
+# кэша каталога (только postgres)
+STOCK_EVENTS_CHANNEL = os.getenv("STOCK_EVENTS_CHANNEL", "stock_events")
+STOCK_EVENTS_OUTBOX_SIZE = int(os.getenv("STOCK_EVENTS_OUTBOX_SIZE", "1000"))
+# лимит payload у NOTIFY - 8000 байт
+STOCK_EVENTS_MESSAGE_BYTES = int(os.getenv("STOCK_EVENTS_MESSAGE_BYTES", "7000"))
+STOCK_EVENTS_KEEPALIVE_SECONDS = float(
+    os.getenv("STOCK_EVENTS_KEEPALIVE_SECONDS", "30")
+)
+STOCK_EVENTS_RECONNECT_SECONDS = float(os.getenv("STOCK_EVENTS_RECONNECT_SECONDS", "5"))
+
+# Выгрузка офлайн-чеков: сколько хранить ключи идемпотентности. Касса
+# повторяет пачку, пока не получит ответ, дольше этого повторов не бывает
+IDEMPOTENCY_KEY_TTL_HOURS = float(os.getenv("IDEMPOTENCY_KEY_TTL_HOURS", "72"))
+
+# Статистика: предел точек в одном ряду /statistic/series
+STAT_SERIES_MAX_POINTS = int(os.getenv("STAT_SERIES_MAX_POINTS", "5000"))
+
+# Статистика: границы классов ABC по накопленной доле метрики
+# (A - первые 80%, B - следующие 15%, C - остальное)
+STAT_ABC_A_SHARE = float(os.getenv("STAT_ABC_A_SHARE", "0.8"))
+STAT_ABC_B_SHARE = float(os.getenv("STAT_ABC_B_SHARE", "0.95"))
+
+# Секции sales по месяцам: сколько месяцев вперед держать созданными
+# (commands.partitions create по расписанию); строки без секции попадают
+# в sales_default и переносятся при создании секции
+SALES_PARTITION_MONTHS_AHEAD = int(os.getenv("SALES_PARTITION_MONTHS_AHEAD", "3"))
+# куда commands.partitions archive пишет выгрузки отсоединенных секций
+SALES_ARCHIVE_DIR = os.getenv("SALES_ARCHIVE_DIR", "archive")
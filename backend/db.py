@@ -1,22 +1,254 @@
-from sqlalchemy.orm import DeclarativeBase
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
-from dotenv import load_dotenv
-import os
-
-load_dotenv()
-POSTGRES_USER = os.getenv("POSTGRES_USER")
-POSTGRES_PASSWORD = os.getenv("POSTGRES_PASSWORD")
-POSTGRES_DB = os.getenv("POSTGRES_DB")
-POSTGRES_HOST = os.getenv("POSTGRES_HOST")
-POSTGRES_PORT = os.getenv("POSTGRES_PORT")
-URL = f"postgresql+asyncpg://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
-
-engine = create_async_engine(URL, echo=True)
+import asyncio
+import math
+import time
+
+from fastapi import Request, Response
+from sqlalchemy import event, make_url, text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.orm import DeclarativeBase, Session
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    create_async_engine,
+    async_sessionmaker,
+)
+
+from backend import config
+
+
+class PoolMetrics:
+    """Счетчики насыщенности пула соединений одного engine"""
+
+    def __init__(self):
+        self.pool = None
+        self.checkouts = 0
+        self.timeouts = 0
+        self.waits = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.overflow_peak = 0
+
+    def attach(self, engine: AsyncEngine):
+        self.pool = engine.sync_engine.pool
+        event.listen(engine.sync_engine, "checkout", self._on_checkout)
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        self.checkouts += 1
+        if isinstance(self.pool, QueuePool):
+            self.overflow_peak = max(self.overflow_peak, self.pool.overflow())
+
+    def observe_wait(self, seconds: float):
+        self.waits += 1
+        self.wait_total += seconds
+        self.wait_max = max(self.wait_max, seconds)
+
+    def snapshot(self) -> dict:
+        result = {
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "overflow_peak": self.overflow_peak,
+            "wait_avg_ms": self.wait_total / self.waits * 1000 if self.waits else 0.0,
+            "wait_max_ms": self.wait_max * 1000,
+        }
+        if isinstance(self.pool, QueuePool):
+            result.update(
+                pool_size=self.pool.size(),
+                checked_out=self.pool.checkedout(),
+                overflow=self.pool.overflow(),
+            )
+        return result
+
+
+def create_engine_from_settings(url: str = config.DATABASE_URL) -> AsyncEngine:
+    """Создает engine с пулом и таймаутами из настроек"""
+
+    url = make_url(url)
+    kwargs = {
+        "echo": "debug" if config.DB_ECHO == "debug" else config.DB_ECHO == "true",
+        "pool_pre_ping": config.DB_POOL_PRE_PING,
+        "pool_recycle": config.DB_POOL_RECYCLE,
+    }
+
+    if url.get_backend_name() != "sqlite":
+        kwargs.update(
+            pool_size=config.DB_POOL_SIZE,
+            max_overflow=config.DB_MAX_OVERFLOW,
+            pool_timeout=config.DB_POOL_TIMEOUT,
+        )
+
+    if url.get_driver_name() == "asyncpg":
+        url = url.update_query_dict(
+            {"prepared_statement_cache_size": str(config.DB_STATEMENT_CACHE_SIZE)}
+        )
+        kwargs["connect_args"] = {
+            "server_settings": {
+                "statement_timeout": str(config.DB_STATEMENT_TIMEOUT_MS),
+            },
+        }
+
+    return create_async_engine(url, **kwargs)
+
+
+class ReadRouter:
+    """Решает, можно ли отдать чтение реплике
+
+    Если реплика недоступна или отстает больше DB_REPLICA_MAX_LAG_SECONDS,
+    все чтения уходят в основную БД до следующей проверки.
+    """
+
+    # на основной БД pg_last_wal_receive_lsn() - NULL, поэтому отставание 0
+    LAG_QUERY = text(
+        "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn()"
+        " THEN 0 ELSE COALESCE(EXTRACT(EPOCH FROM now()"
+        " - pg_last_xact_replay_timestamp()), 0) END"
+    )
+
+    def __init__(self, replica: AsyncEngine):
+        self.replica = replica
+        self.healthy = True
+        self.lag = 0.0
+        self.checked_at = 0.0
+        self.lock = asyncio.Lock()
+
+    async def replica_ok(self) -> bool:
+        if time.monotonic() - self.checked_at < config.DB_REPLICA_CHECK_INTERVAL:
+            return self.healthy
+
+        async with self.lock:
+            if time.monotonic() - self.checked_at >= config.DB_REPLICA_CHECK_INTERVAL:
+                await self._check()
+        return self.healthy
+
+    async def _check(self):
+        try:
+            async with self.replica.connect() as connection:
+                if self.replica.dialect.name == "postgresql":
+                    self.lag = float(await connection.scalar(self.LAG_QUERY))
+                else:
+                    await connection.execute(text("SELECT 1"))
+                    self.lag = 0.0
+            self.healthy = self.lag <= config.DB_REPLICA_MAX_LAG_SECONDS
+        except Exception:
+            self.healthy = False
+        self.checked_at = time.monotonic()
+
+
+engine = create_engine_from_settings()
 session = async_sessionmaker(bind=engine, class_=AsyncSession)
+pool_metrics = PoolMetrics()
+pool_metrics.attach(engine)
+
+if config.DATABASE_REPLICA_URL:
+    replica_engine = create_engine_from_settings(config.DATABASE_REPLICA_URL)
+    replica_pool_metrics = PoolMetrics()
+    replica_pool_metrics.attach(replica_engine)
+else:
+    replica_engine = engine
+    replica_pool_metrics = pool_metrics
+read_session = async_sessionmaker(bind=replica_engine, class_=AsyncSession)
+read_router = ReadRouter(replica_engine)
+
+
+# время последней записи клиента: браузер возвращает cookie сам, остальные
+# клиенты передают заголовок из ответа на запись
+LAST_WRITE_COOKIE = "last_write"
+LAST_WRITE_HEADER = "X-Last-Write"
+
+
+@event.listens_for(Session, "after_commit")
+def _mark_last_write(ses: Session):
+    if (response := ses.info.get("response")) is None:
+        return
+
+    last_write = f"{time.time():.3f}"
+    response.headers[LAST_WRITE_HEADER] = last_write
+    response.set_cookie(
+        LAST_WRITE_COOKIE,
+        last_write,
+        max_age=math.ceil(config.DB_READ_YOUR_WRITES_SECONDS),
+        httponly=True,
+        samesite="lax",
+    )
+
+
+def wrote_recently(request: Request) -> bool:
+    """Клиент писал в БД меньше DB_READ_YOUR_WRITES_SECONDS секунд назад
+
+    Время записи приходит от самого клиента, поэтому его видит любой
+    процесс и сервер, а не только тот, что выполнил запись.
+    """
+
+    last_write = request.headers.get(LAST_WRITE_HEADER) or request.cookies.get(
+        LAST_WRITE_COOKIE
+    )
+    try:
+        return time.time() - float(last_write) < config.DB_READ_YOUR_WRITES_SECONDS
+    except (TypeError, ValueError):
+        return False
+
+
+async def warm_up_pool(
+    db_engine: AsyncEngine = engine, size: int = config.DB_POOL_WARMUP
+):
+    """Открывает size соединений заранее, чтобы первые запросы не ждали connect"""
+
+    async def ping():
+        async with db_engine.connect() as connection:
+            await connection.execute(text("SELECT 1"))
+
+    await asyncio.gather(*(ping() for _ in range(size)))
+
+
+async def _open_session(
+    factory: async_sessionmaker,
+    metrics: PoolMetrics,
+    response: Response | None = None,
+    cache_fill: bool = True,
+):
+    async with factory() as ses:
+        ses.info["response"] = response
+        ses.info["cache_fill"] = cache_fill
+        started = time.perf_counter()
+        try:
+            await ses.connection()
+        except PoolTimeoutError:
+            metrics.timeouts += 1
+            raise
+        metrics.observe_wait(time.perf_counter() - started)
+        yield ses
+
+
+async def get_db(response: Response) -> AsyncSession:
+    async for ses in _open_session(session, pool_metrics, response):
+        yield ses
+
+
+async def choose_read_session(
+    request: Request,
+) -> tuple[async_sessionmaker, PoolMetrics]:
+    """Реплика, если она есть, здорова и клиент недавно ничего не писал,
+    иначе - основная БД"""
+
+    if (
+        replica_engine is engine
+        or wrote_recently(request)
+        or not await read_router.replica_ok()
+    ):
+        return session, pool_metrics
+    return read_session, replica_pool_metrics
+
+
+async def get_read_db(request: Request) -> AsyncSession:
+    """Сессия для эндпоинтов, которые только читают
 
+    Чтения реплики попадают в общий кэш, только если при последней проверке
+    она не отставала от основной БД.
+    """
 
-async def get_db() -> AsyncSession:
-    async with session() as ses:
+    factory, metrics = await choose_read_session(request)
+    cache_fill = factory is session or read_router.lag == 0
+    async for ses in _open_session(factory, metrics, cache_fill=cache_fill):
         yield ses
 
 
@@ -0,0 +1,76 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+
+from backend import config
+
+
+class PasswordHasher:
+    """bcrypt в ограниченном пуле потоков с отказом при переполнении очереди
+
+    bcrypt отпускает GIL, поэтому потоков достаточно, а event loop продолжает
+    обслуживать остальные запросы, пока считается хэш.
+    """
+
+    def __init__(self, context: CryptContext, workers: int, max_queue: int):
+        self.context = context
+        self.workers = workers
+        self.max_queue = max_queue
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="password-hash"
+        )
+        self.pending = 0
+        self.rejected = 0
+        self.total_seconds = 0.0
+        self.completed = 0
+
+    async def _run(self, func, *args):
+        if self.pending >= self.workers + self.max_queue:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Слишком много одновременных входов, повторите позже",
+                headers={"Retry-After": "1"},
+            )
+
+        self.pending += 1
+        started = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self.executor, func, *args
+            )
+        finally:
+            self.pending -= 1
+            self.completed += 1
+            self.total_seconds += time.perf_counter() - started
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self.context.hash, password)
+
+    async def verify(self, password: str, hashed: str) -> tuple[bool, str | None]:
+        """Проверяет пароль; второй элемент - новый хэш, если параметры устарели"""
+
+        return await self._run(self.context.verify_and_update, password, hashed)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "pending": self.pending,
+            "rejected": self.rejected,
+            "completed": self.completed,
+            "avg_seconds": self.total_seconds / self.completed if self.completed else 0,
+        }
+
+
+pwd_context = CryptContext(
+    schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=config.BCRYPT_ROUNDS
+)
+password_hasher = PasswordHasher(
+    pwd_context, config.PASSWORD_HASH_WORKERS, config.PASSWORD_HASH_QUEUE
+)
@@ -0,0 +1,51 @@
+"""Замер накладных расходов авторизации на один запрос
+
+    python -m commands.bench_auth --requests 100000
+
+Сравнивает полную проверку JWT с проверкой через кэш токенов.
+"""
+
+import argparse
+import asyncio
+import time
+from datetime import timedelta
+
+from routers.auth.utils import (
+    create_access_token,
+    decode_user,
+    get_current_user,
+    token_cache,
+)
+
+
+async def main(args: argparse.Namespace) -> int:
+    token = await create_access_token(
+        username="bench",
+        user_id=1,
+        is_owner=True,
+        is_seller=True,
+        is_warehouse_worker=False,
+        expires_delta=timedelta(minutes=5),
+    )
+
+    started = time.perf_counter()
+    for _ in range(args.requests):
+        decode_user(token)
+    decode_time = time.perf_counter() - started
+
+    await get_current_user(token)
+    started = time.perf_counter()
+    for _ in range(args.requests):
+        await get_current_user(token)
+    cached_time = time.perf_counter() - started
+
+    for title, elapsed in (("проверка JWT", decode_time), ("кэш", cached_time)):
+        print(f"{title}: {elapsed / args.requests * 1e6:.1f} мкс на запрос")
+    print(token_cache.stats())
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=100_000)
+    raise SystemExit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,77 @@
+"""Оценка нагрузки авторизации в час для магазина с N кассами
+
+    python -m commands.bench_auth_load --registers 200 --workers 4
+
+Замеряет CPU на одну операцию (bcrypt с текущими BCRYPT_ROUNDS, подпись JWT,
+хэш refresh-токена) и считает нагрузку в час для двух схем: повторный вход
+с паролем каждые JWT_ACCESS_TOKEN_MINUTES и обновление через refresh-токен
+с одним входом за смену.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import secrets
+import time
+from datetime import timedelta
+
+from backend import config
+from backend.passwords import pwd_context
+from routers.auth.utils import create_access_token
+
+
+def measure(func, repeat: int) -> float:
+    started = time.process_time()
+    for _ in range(repeat):
+        func()
+    return (time.process_time() - started) / repeat
+
+
+async def main(args: argparse.Namespace) -> int:
+    hashed = pwd_context.hash("password")
+    bcrypt_cpu = measure(lambda: pwd_context.verify("password", hashed), 5)
+    token = secrets.token_urlsafe(32)
+    sha_cpu = measure(lambda: hashlib.sha256(token.encode()).hexdigest(), 10_000)
+
+    started = time.process_time()
+    for _ in range(1000):
+        await create_access_token("bench", 1, False, True, False, timedelta(minutes=5))
+    sign_cpu = (time.process_time() - started) / 1000
+
+    renewals = args.registers * 60 / config.JWT_ACCESS_TOKEN_MINUTES
+    shift_logins = args.registers / args.shift_hours
+    polls = args.workers * 3600 / config.PERMISSION_POLL_SECONDS
+
+    schemes = {
+        # вход: SELECT пользователя + bcrypt + подпись
+        "повторный вход": {
+            "db_queries": renewals,
+            "cpu_seconds": renewals * (bcrypt_cpu + sign_cpu),
+        },
+        # обновление: UPDATE refresh_tokens, SELECT пользователя, INSERT нового
+        # токена; вход раз в смену; опрос изменений прав в каждом процессе
+        "refresh-токены": {
+            "db_queries": renewals * 3 + shift_logins * 2 + polls,
+            "cpu_seconds": renewals * (sha_cpu * 2 + sign_cpu)
+            + shift_logins * (bcrypt_cpu + sign_cpu),
+        },
+    }
+
+    print(
+        f"bcrypt: {bcrypt_cpu * 1000:.1f} мс, подпись JWT: {sign_cpu * 1e6:.0f} мкс,"
+        f" sha256: {sha_cpu * 1e6:.1f} мкс"
+    )
+    for title, load in schemes.items():
+        print(
+            f"{title}: {load['db_queries']:.0f} запросов к БД в час,"
+            f" {load['cpu_seconds']:.2f} с CPU в час"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--registers", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--shift-hours", type=float, default=8)
+    raise SystemExit(asyncio.run(main(parser.parse_args())))
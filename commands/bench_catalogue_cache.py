@@ -0,0 +1,191 @@
+"""Замер чтения каталога с кэшем и без и проверка сброса кэша
+
+    python -m commands.bench_catalogue_cache --goods 10000 --requests 20000
+    python -m commands.bench_catalogue_cache --rounds 1000
+
+Заполняет --categories категорий и --goods товаров внутри транзакции,
+которая в конце откатывается, и выполняет --requests чтений, как касса и
+витрина: товар по id, категория по id, товары категории и страница всех
+товаров, популярные товары чаще. Печатает запросы в секунду без кэша и с
+кэшем и долю попаданий.
+
+Затем проверяет сброс: значение, загруженное во время сброса своего ключа,
+не должно попасть в кэш. На postgres два кэша с мостами LISTEN/NOTIFY
+изображают два процесса: --rounds раз первый сбрасывает запись, которая
+есть у второго, и печатается задержка, с которой она пропадает у второго.
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend import config
+from backend.cache import TieredCache, TTLCache, catalogue_cache
+from backend.db import engine
+from crud.category.category_crud import get_category_by_id
+from crud.good.good_crud import get_all_goods, get_good_by_id, get_products_by_category
+from models.article import Article
+from models.category import Category
+from services.stock.stock_events import PgNotifyBridge, StockEventHub
+
+
+def popular(first: int, count: int) -> int:
+    # степень сдвигает выбор к первым записям, как спрос на ходовые товары
+    return first + int(count * random.random() ** 3)
+
+
+def requests(db: AsyncSession, goods: tuple[int, int], categories: tuple[int, int]):
+    kind = random.random()
+    if kind < 0.6:
+        return get_good_by_id(popular(*goods), db)
+    if kind < 0.8:
+        return get_category_by_id(popular(*categories), db)
+    if kind < 0.95:
+        return get_products_by_category(
+            popular(*categories), db, None, None, None, None
+        )
+    return get_all_goods(db, 0, 50)
+
+
+async def throughput(db: AsyncSession, args, goods, categories) -> float:
+    random.seed(args.seed)
+    started = time.perf_counter()
+    for _ in range(args.requests):
+        await requests(db, goods, categories)
+    return args.requests / (time.perf_counter() - started)
+
+
+async def stale_fill_check() -> bool:
+    cache = TieredCache(TTLCache(100, 60))
+    loading = asyncio.Event()
+    release = asyncio.Event()
+
+    async def load():
+        loading.set()
+        await release.wait()
+        return "до коммита"
+
+    task = asyncio.create_task(cache.get_or_load("good:1", load))
+    await loading.wait()
+    cache.invalidate({("good:1", False)})
+    release.set()
+    await task
+    return "good:1" not in cache.local.data and cache.stale_fills == 1
+
+
+async def bridge_latency(rounds: int) -> list[float]:
+    channel = f"{config.STOCK_EVENTS_CHANNEL}_bench"
+    sender = TieredCache(TTLCache(100, 60))
+    receiver = TieredCache(TTLCache(rounds, 60))
+    bridges = [
+        PgNotifyBridge(StockEventHub(1), cache, engine, channel)
+        for cache in (sender, receiver)
+    ]
+    for bridge in bridges:
+        await bridge.start()
+    # мосты подключаются в фоне
+    await asyncio.sleep(1)
+
+    latencies = []
+    for number in range(rounds):
+        key = f"good:{number}"
+        receiver.local.set(key, number)
+        started = time.perf_counter()
+        sender.invalidate({(key, False)})
+        while key in receiver.local.data:
+            await asyncio.sleep(0.0005)
+        latencies.append(time.perf_counter() - started)
+
+    for bridge in bridges:
+        await bridge.stop()
+    return latencies
+
+
+async def main(args: argparse.Namespace) -> int:
+    async with engine.connect() as conn:
+        transaction = await conn.begin()
+        first_category = await conn.scalar(
+            select(func.coalesce(func.max(Category.id), 0))
+        )
+        first_category += 1
+        await conn.execute(
+            insert(Category),
+            [
+                {"id": first_category + number, "title": f"bench cache {number}"}
+                for number in range(args.categories)
+            ],
+        )
+        first_good = await conn.scalar(select(func.coalesce(func.max(Article.id), 0)))
+        first_good += 1
+        await conn.execute(
+            insert(Article),
+            [
+                {
+                    "id": first_good + number,
+                    "name": f"bench cache {number}",
+                    "category_id": first_category + number % args.categories,
+                    "price": 100,
+                    "cost_price": 60,
+                    "stock_quantity": 1000,
+                }
+                for number in range(args.goods)
+            ],
+        )
+
+        db = AsyncSession(bind=conn)
+        goods = (first_good, args.goods)
+        categories = (first_category, args.categories)
+
+        catalogue_cache.enabled = False
+        uncached = await throughput(db, args, goods, categories)
+        catalogue_cache.enabled = True
+        before = catalogue_cache.local.stats()
+        cached = await throughput(db, args, goods, categories)
+        after = catalogue_cache.local.stats()
+
+        await db.close()
+        await transaction.rollback()
+
+    hits = after["hits"] - before["hits"]
+    misses = after["misses"] - before["misses"]
+    print(
+        f"товаров: {args.goods}, категорий: {args.categories},"
+        f" запросов: {args.requests}"
+    )
+    print(f"без кэша: {uncached:.0f} запросов/с")
+    print(
+        f"с кэшем: {cached:.0f} запросов/с, попаданий"
+        f" {hits / max(hits + misses, 1) * 100:.1f}%"
+    )
+    print(
+        "загрузка во время сброса в кэш не попала:"
+        f" {'да' if await stale_fill_check() else 'НЕТ'}"
+    )
+
+    if engine.dialect.name == "postgresql":
+        latencies = await bridge_latency(args.rounds)
+        print(
+            f"сброс у другого процесса: p50 {statistics.median(latencies) * 1000:.2f}"
+            f" мс, p99 {statistics.quantiles(latencies, n=100)[98] * 1000:.2f} мс,"
+            f" максимум {max(latencies) * 1000:.2f} мс"
+        )
+    else:
+        print("сброс между процессами проверяется только на postgres")
+
+    await engine.dispose()
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--goods", type=int, default=10_000)
+    parser.add_argument("--categories", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--rounds", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=1)
+    raise SystemExit(asyncio.run(main(parser.parse_args())))
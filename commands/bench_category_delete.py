@@ -0,0 +1,113 @@
+"""Замер задержек кассовых записей во время удаления большой категории
+
+    python -m commands.bench_category_delete --goods 100000
+    python -m commands.bench_category_delete --goods 100000 --mode single
+
+Создает категорию с --goods товарами и отдельный товар вне нее. Пока идет
+удаление (фоновой задачей пачками или, с --mode single, одним DELETE), в цикле
+меняется остаток отдельного товара, как при продаже на кассе. Печатает
+p50/p99/максимум задержки этих записей. Созданные данные удаляются.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from sqlalchemy import delete, insert, select, text
+
+from backend.db import engine, session
+from crud.stock.stock_crud import change_stock
+from models import Article, BackgroundJob, Category
+from services.category.category_delete import JOB_KIND
+from services.jobs.job_runner import job_runner
+
+
+async def seed(goods: int) -> tuple[int, int]:
+    async with session() as db:
+        category_id = await db.scalar(
+            insert(Category).values(title="bench delete").returning(Category.id)
+        )
+        other_id = await db.scalar(
+            insert(Article)
+            .values(name="bench register good", price=1, stock_quantity=10**9)
+            .returning(Article.id)
+        )
+        await db.execute(
+            text(
+                "INSERT INTO goods (name, category_id, price, cost_price, stock_quantity)"
+                " SELECT 'bench delete ' || g, :category_id, 1, 1, 1"
+                " FROM generate_series(1, :goods) g"
+            ),
+            {"category_id": category_id, "goods": goods},
+        )
+        await db.commit()
+        return category_id, other_id
+
+
+async def register_writes(other_id: int, stop: asyncio.Event, latencies: list):
+    while not stop.is_set():
+        started = time.perf_counter()
+        async with session() as db:
+            await change_stock(db, other_id, -1)
+            await db.commit()
+        latencies.append(time.perf_counter() - started)
+        await asyncio.sleep(0.01)
+
+
+async def delete_category(category_id: int, mode: str):
+    async with session() as db:
+        if mode == "single":
+            await db.execute(delete(Category).where(Category.id == category_id))
+            await db.commit()
+            return
+
+        job_id = await db.scalar(
+            insert(BackgroundJob)
+            .values(
+                kind=JOB_KIND,
+                status="pending",
+                params={"category_id": category_id, "move_goods_to": None},
+                progress={"goods_done": 0, "categories_done": 0},
+            )
+            .returning(BackgroundJob.id)
+        )
+        await db.commit()
+    await job_runner.run(job_id)
+
+
+async def main(args: argparse.Namespace) -> int:
+    category_id, other_id = await seed(args.goods)
+
+    stop, latencies = asyncio.Event(), []
+    writer = asyncio.create_task(register_writes(other_id, stop, latencies))
+    await asyncio.sleep(0.5)
+
+    started = time.perf_counter()
+    await delete_category(category_id, args.mode)
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await writer
+    async with session() as db:
+        await db.execute(delete(Article).where(Article.id == other_id))
+        await db.commit()
+        left = await db.scalar(select(Category.id).where(Category.id == category_id))
+
+    latencies.sort()
+    print(f"удаление ({args.mode}): {elapsed:.1f} с, категория удалена: {left is None}")
+    print(
+        f"записи кассы: {len(latencies)},"
+        f" p50 {statistics.median(latencies) * 1000:.1f} мс,"
+        f" p99 {statistics.quantiles(latencies, n=100)[98] * 1000:.1f} мс,"
+        f" максимум {latencies[-1] * 1000:.1f} мс"
+    )
+    await engine.dispose()
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--goods", type=int, default=100_000)
+    parser.add_argument("--mode", choices=["job", "single"], default="job")
+    raise SystemExit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,61 @@
+"""Замер дерева категорий на синтетическом дереве
+
+    python -m commands.bench_category_tree --nodes 10000 --levels 8
+
+Строит дерево из --nodes категорий глубиной --levels и замеряет построение
+дерева, поиск потомков и выдачу вложенного дерева. Без дерева в памяти
+потомков приходится искать запросом на каждый уровень (--levels запросов).
+"""
+
+import argparse
+import random
+import time
+
+from services.category.category_tree import CategoryTree
+
+
+def synthetic_rows(nodes: int, levels: int):
+    rows, level_ids = [], [[] for _ in range(levels)]
+    for category_id in range(1, nodes + 1):
+        level = 0 if category_id <= 10 else random.randrange(1, levels)
+        while not level_ids[level - 1] and level:
+            level -= 1
+        parent = random.choice(level_ids[level - 1]) if level else None
+        level_ids[level].append(category_id)
+        rows.append((category_id, parent, f"category {category_id}"))
+    return rows
+
+
+def timed(func, repeat: int = 1) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - started) / repeat
+
+
+def main(args: argparse.Namespace) -> int:
+    random.seed(args.seed)
+    rows = synthetic_rows(args.nodes, args.levels)
+
+    build = timed(lambda: CategoryTree(rows), 5)
+    tree = CategoryTree(rows)
+    root = tree.children[None][0]
+    descendants = timed(lambda: tree.descendants(root), 1000)
+    nested = timed(lambda: tree.as_nested(), 5)
+
+    print(f"категорий: {len(tree)}, глубина: {max(tree.depths.values()) + 1}")
+    print(f"построение дерева: {build * 1000:.1f} мс")
+    print(
+        f"потомки корня ({len(tree.descendants(root))}): {descendants * 1e6:.1f} мкс,"
+        " 0 запросов к БД"
+    )
+    print(f"вложенное дерево целиком: {nested * 1000:.1f} мс")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--nodes", type=int, default=10_000)
+    parser.add_argument("--levels", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=1)
+    raise SystemExit(main(parser.parse_args()))
@@ -0,0 +1,201 @@
+"""Сравнение планов и времени запросов прибыли до и после cost_at_sale (только postgres)
+
+    python -m commands.bench_cost_at_sale --sales 10000000
+    python -m commands.bench_cost_at_sale --sales 1000000 --days 7 --keep
+
+Заполняет goods, receipts и sales синтетическими данными (--sales строк за
+последние --days дней), делает VACUUM ANALYZE - без карты видимости чтение
+только из индекса невозможно - и для каждого запроса печатает план и время:
+"до" - с соединением sales и goods и текущей goods.cost_price, как считала
+статистика раньше, "после" - по одной таблице sales с cost_at_sale, как
+запросы crud/ сейчас. Созданные данные удаляются, если не указан --keep.
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, func, select, text
+
+from backend.db import engine
+from models import Article, Category, Receipt, Sales, User
+
+SEED = (
+    "INSERT INTO categories (id, title) VALUES (-2, 'cost bench seed')",
+    "INSERT INTO goods (name, category_id, price, cost_price, stock_quantity)"
+    " SELECT 'cost bench seed ' || g, -2, 10, 5, 1000"
+    " FROM generate_series(1, 10000) g",
+    "INSERT INTO users (username, email)"
+    " SELECT 'cost bench seed ' || g, 'cost-bench' || g || '@seed'"
+    " FROM generate_series(1, 50) g",
+    "INSERT INTO receipts (user_id, created_at, closed_at, total_amount, status)"
+    " SELECT u.first + g % 50, t, t, 10, 'closed'"
+    " FROM generate_series(1, :sales / 5) g,"
+    " LATERAL (SELECT now() - random() * :days * interval '1 day' AS t) d,"
+    " (SELECT min(id) AS first FROM users WHERE username LIKE 'cost bench seed %') u",
+    "INSERT INTO sales (receipt_id, good_id, quantity, user_id, total_price,"
+    " sales_date, price_at_sale, cost_at_sale)"
+    " SELECT r.id, g.first + (r.id * 7 + n) % 10000, 1, r.user_id, 10, r.created_at,"
+    " 10, 5 FROM receipts r, generate_series(1, 5) n,"
+    " (SELECT min(id) AS first FROM goods WHERE category_id = -2) g"
+    " WHERE r.user_id IN (SELECT id FROM users WHERE username LIKE 'cost bench seed %')",
+)
+
+
+def compared_queries(start: datetime, end: datetime, good_id: int):
+    """(название, запрос до, запрос после)"""
+
+    in_range = (Sales.sales_date >= start, Sales.sales_date <= end)
+    return (
+        (
+            "итоги за период",
+            select(
+                func.sum(Sales.total_price),
+                func.sum(Sales.quantity * Article.cost_price),
+                func.count(Sales.id),
+            )
+            .join(Article, Sales.good_id == Article.id)
+            .where(*in_range),
+            select(
+                func.sum(Sales.total_price),
+                func.sum(Sales.quantity * Sales.cost_at_sale),
+                func.count(),
+            ).where(*in_range),
+        ),
+        (
+            "итоги товара за период",
+            select(
+                func.sum(Sales.total_price),
+                func.sum(Sales.quantity * Article.cost_price),
+                func.count(Sales.id),
+            )
+            .join(Article, Sales.good_id == Article.id)
+            .where(Sales.good_id == good_id, *in_range),
+            select(
+                func.sum(Sales.total_price),
+                func.sum(Sales.quantity * Sales.cost_at_sale),
+                func.count(),
+            ).where(Sales.good_id == good_id, *in_range),
+        ),
+        (
+            "итоги по товарам (рейтинг)",
+            select(
+                Sales.good_id,
+                func.sum(Sales.total_price),
+                func.sum(Sales.quantity * Article.cost_price),
+            )
+            .join(Article, Sales.good_id == Article.id)
+            .where(*in_range)
+            .group_by(Sales.good_id),
+            select(
+                Sales.good_id,
+                func.sum(Sales.total_price),
+                func.sum(Sales.quantity * Sales.cost_at_sale),
+            )
+            .where(*in_range)
+            .group_by(Sales.good_id),
+        ),
+    )
+
+
+def plan_summary(node: dict) -> list[str]:
+    """Узлы плана в одну строку: тип, индекс, чтения из таблицы"""
+
+    line = node["Node Type"]
+    if "Index Name" in node:
+        line += f" {node['Index Name']}"
+    elif "Relation Name" in node:
+        line += f" {node['Relation Name']}"
+    if "Heap Fetches" in node:
+        line += f" (heap fetches {node['Heap Fetches']})"
+    lines = [line]
+    for child in node.get("Plans", ()):
+        lines += [f"  {child_line}" for child_line in plan_summary(child)]
+    return lines
+
+
+async def measure(conn, query, repeat: int) -> tuple[dict, float]:
+    compiled = str(query.compile(conn, compile_kwargs={"literal_binds": True}))
+    result = await conn.exec_driver_sql(
+        f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {compiled}"
+    )
+    plan = result.scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await conn.exec_driver_sql(compiled)
+        timings.append(time.perf_counter() - started)
+    return plan[0], statistics.median(timings)
+
+
+async def seed(args: argparse.Namespace):
+    started = time.perf_counter()
+    async with engine.begin() as conn:
+        for statement in SEED:
+            await conn.execute(
+                text(statement), {"sales": args.sales, "days": args.days}
+            )
+    # VACUUM нельзя выполнять в транзакции
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.exec_driver_sql("VACUUM ANALYZE sales")
+        await conn.exec_driver_sql("VACUUM ANALYZE goods")
+    print(f"заполнение: {time.perf_counter() - started:.1f} с")
+
+
+async def cleanup():
+    users = select(User.id).where(User.username.like("cost bench seed %"))
+    async with engine.begin() as conn:
+        await conn.execute(delete(Sales).where(Sales.user_id.in_(users)))
+        await conn.execute(delete(Receipt).where(Receipt.user_id.in_(users)))
+        await conn.execute(delete(Article).where(Article.category_id == -2))
+        await conn.execute(delete(User).where(User.id.in_(users)))
+        await conn.execute(delete(Category).where(Category.id == -2))
+
+
+async def main(args: argparse.Namespace) -> int:
+    if engine.dialect.name != "postgresql":
+        print("Сравнение работает только на postgres")
+        await engine.dispose()
+        return 1
+
+    await seed(args)
+    try:
+        async with engine.connect() as conn:
+            good_id = await conn.scalar(
+                select(func.min(Article.id)).where(Article.category_id == -2)
+            )
+            end = datetime.now()
+            start = end - timedelta(days=args.days)
+            for title, before, after in compared_queries(start, end, good_id):
+                print(f"\n{title}")
+                for label, query in (("до", before), ("после", after)):
+                    plan, median = await measure(conn, query, args.repeat)
+                    root = plan["Plan"]
+                    print(
+                        f"  {label}: {median * 1000:.1f} мс,"
+                        f" блоков из кэша {root.get('Shared Hit Blocks', 0)},"
+                        f" с диска {root.get('Shared Read Blocks', 0)}"
+                    )
+                    for line in plan_summary(root):
+                        print(f"    {line}")
+    finally:
+        if not args.keep:
+            await cleanup()
+        await engine.dispose()
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sales", type=int, default=10_000_000)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--keep", action="store_true")
+    raise SystemExit(asyncio.run(main(parser.parse_args())))
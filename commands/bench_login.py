@@ -0,0 +1,63 @@
+"""Нагрузочный замер входа: задержка event loop во время одновременных логинов
+
+    python -m commands.bench_login --logins 50
+
+Запускает --logins одновременных проверок пароля дважды: прямо в event loop
+(как было раньше) и через пул password_hasher. Параллельно идут короткие
+"запросы кассы" - каждый ждет event loop, как ждал бы обработчик добавления
+товара в чек. Печатает максимальную задержку цикла и p99 этих запросов.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from backend.passwords import password_hasher, pwd_context
+
+PROBE_INTERVAL = 0.005
+
+
+async def probe(stop: asyncio.Event, latencies: list[float]):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(PROBE_INTERVAL)
+        latencies.append(time.perf_counter() - started - PROBE_INTERVAL)
+
+
+async def inline_verify(password: str, hashed: str):
+    return pwd_context.verify_and_update(password, hashed)
+
+
+async def run(verify, logins: int, hashed: str) -> dict:
+    stop = asyncio.Event()
+    latencies: list[float] = []
+    probes = [asyncio.create_task(probe(stop, latencies)) for _ in range(10)]
+    await asyncio.sleep(PROBE_INTERVAL * 2)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(verify("password", hashed) for _ in range(logins)))
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await asyncio.gather(*probes)
+    latencies.sort()
+    return {
+        "logins_seconds": round(elapsed, 3),
+        "loop_lag_max_ms": round(latencies[-1] * 1000, 1),
+        "checkout_p99_ms": round(statistics.quantiles(latencies, n=100)[98] * 1000, 1),
+    }
+
+
+async def main(args: argparse.Namespace) -> int:
+    hashed = pwd_context.hash("password")
+    print("в event loop:", await run(inline_verify, args.logins, hashed))
+    print("в пуле потоков:", await run(password_hasher.verify, args.logins, hashed))
+    password_hasher.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=50)
+    raise SystemExit(asyncio.run(main(parser.parse_args())))
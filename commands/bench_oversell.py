@@ -0,0 +1,144 @@
+"""Нагрузочная проверка списания остатка одного товара параллельными кассами
+
+    python -m commands.bench_oversell --clients 50 --stock 1000
+    python -m commands.bench_oversell --clients 200 --attempts 50 --count 2
+
+Создает товар с остатком --stock, и --clients касс одновременно пытаются
+продать его по --count единиц, каждая --attempts раз, в отдельной сессии и
+транзакции на попытку. Попыток больше, чем остатка, так что последние
+единицы разбираются наперегонки. Сначала проверяется reserve_stock (условный
+UPDATE), затем прежний путь: остаток читается, сравнивается в Python и
+уменьшается относительным UPDATE. Печатает продажи в секунду, p50/p99
+попытки и перепродажу - сколько единиц продано сверх остатка; если
+перепродал reserve_stock, код выхода 1. Товар и категория в конце удаляются.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from sqlalchemy import delete, insert, select, update
+
+from backend.db import engine, session
+from crud.stock.stock_crud import reserve_stock
+from models import Article, Category
+
+
+async def atomic_sale(good_id: int, count: int) -> bool:
+    async with session() as db:
+        if await reserve_stock(db, good_id, count) is None:
+            await db.rollback()
+            return False
+        await db.commit()
+        return True
+
+
+async def unchecked_sale(good_id: int, count: int) -> bool:
+    async with session() as db:
+        stock = await db.scalar(
+            select(Article.stock_quantity).where(Article.id == good_id)
+        )
+        if stock < count:
+            return False
+        await db.execute(
+            update(Article)
+            .where(Article.id == good_id)
+            .values(stock_quantity=Article.stock_quantity - count)
+        )
+        await db.commit()
+        return True
+
+
+async def cashier(sale, good_id: int, args, latencies: list, sold: list):
+    for _ in range(args.attempts):
+        started = time.perf_counter()
+        if await sale(good_id, args.count):
+            sold.append(args.count)
+        latencies.append(time.perf_counter() - started)
+
+
+async def run(sale, good_id: int, args) -> dict:
+    async with session() as db:
+        await db.execute(
+            update(Article)
+            .where(Article.id == good_id)
+            .values(stock_quantity=args.stock)
+        )
+        await db.commit()
+
+    latencies, sold = [], []
+    started = time.perf_counter()
+    await asyncio.gather(
+        *(cashier(sale, good_id, args, latencies, sold) for _ in range(args.clients))
+    )
+    elapsed = time.perf_counter() - started
+
+    async with session() as db:
+        left = await db.scalar(
+            select(Article.stock_quantity).where(Article.id == good_id)
+        )
+    return {
+        "sales": len(sold) / elapsed,
+        "p50": statistics.median(latencies),
+        "p99": statistics.quantiles(latencies, n=100)[98],
+        "sold": sum(sold),
+        "left": left,
+        "oversold": max(sum(sold) - args.stock, 0),
+    }
+
+
+async def main(args: argparse.Namespace) -> int:
+    async with session() as db:
+        category_id = await db.scalar(
+            insert(Category).values(title="bench oversell").returning(Category.id)
+        )
+        good_id = await db.scalar(
+            insert(Article)
+            .values(
+                name="bench oversell",
+                category_id=category_id,
+                price=100,
+                cost_price=60,
+                stock_quantity=args.stock,
+                low_stock_threshold=0,
+            )
+            .returning(Article.id)
+        )
+        await db.commit()
+
+    print(
+        f"касс: {args.clients}, попыток: {args.attempts} по {args.count} шт.,"
+        f" остаток: {args.stock}"
+    )
+    oversold = 0
+    try:
+        for name, sale in (
+            ("reserve_stock", atomic_sale),
+            ("чтение и UPDATE", unchecked_sale),
+        ):
+            result = await run(sale, good_id, args)
+            print(
+                f"{name}: {result['sales']:.0f} продаж/с,"
+                f" p50 {result['p50'] * 1000:.2f} мс,"
+                f" p99 {result['p99'] * 1000:.2f} мс, продано {result['sold']},"
+                f" остаток {result['left']}, перепродано {result['oversold']}"
+            )
+            if sale is atomic_sale:
+                oversold = result["oversold"]
+    finally:
+        async with session() as db:
+            await db.execute(delete(Article).where(Article.id == good_id))
+            await db.execute(delete(Category).where(Category.id == category_id))
+            await db.commit()
+        await engine.dispose()
+    return 1 if oversold else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--attempts", type=int, default=40)
+    parser.add_argument("--count", type=int, default=1)
+    parser.add_argument("--stock", type=int, default=1000)
+    raise SystemExit(asyncio.run(main(parser.parse_args())))
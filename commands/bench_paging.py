@@ -0,0 +1,148 @@
+"""Замер страниц списка чеков: OFFSET против курсора на разной глубине
+
+    python -m commands.bench_paging --receipts 1100000
+    python -m commands.bench_paging --receipts 200000 --depths 1 1000 10000
+
+Заполняет --receipts закрытых чеков одного продавца внутри транзакции,
+которая в конце откатывается, и для каждой глубины из --depths (номер
+страницы по --size чеков) замеряет страницу /cash/sales/receipts
+(get_all_sold_receipts) и чеков продавца (get_user_receipts_from_db) в
+режиме страниц и по курсору. Курсор на нужной глубине строится заранее,
+как если бы клиент долистал до нее. Печатает p50 из --repeat замеров и
+отмечает, если страница по курсору не совпала со страницей по номеру.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.db import engine
+from crud.cash.cash_crud import get_all_sold_receipts, get_user_receipts_from_db
+from crud.pagination import encode_cursor
+from models import Receipt, User
+from schemas.requests.pagination import PaginationParams
+
+
+async def seed(conn, count: int, batch: int) -> int:
+    user_id = await conn.scalar(
+        insert(User)
+        .values(username="bench paging", email="bench@paging")
+        .returning(User.id)
+    )
+    started = datetime.now()
+    for offset in range(0, count, batch):
+        await conn.execute(
+            insert(Receipt),
+            [
+                {
+                    "user_id": user_id,
+                    # несколько чеков в одну секунду - порядок решает id
+                    "created_at": started - timedelta(seconds=number // 3),
+                    "closed_at": started,
+                    "total_amount": 100.0,
+                    "status": "closed",
+                }
+                for number in range(offset, min(offset + batch, count))
+            ],
+        )
+    return user_id
+
+
+async def cursor_at(db: AsyncSession, query, order_by: list, position: int) -> str:
+    """Курсор, который клиент получил бы на странице перед position"""
+
+    if position == 0:
+        return ""
+    row = await db.scalar(
+        query.order_by(*(column.desc() for column in order_by))
+        .offset(position - 1)
+        .limit(1)
+    )
+    return encode_cursor([getattr(row, column.key) for column in order_by])
+
+
+async def timed(listing, db, user: dict, pagination, repeat: int):
+    latencies = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        page = await listing(db, user, pagination)
+        latencies.append(time.perf_counter() - started)
+    return statistics.median(latencies), page
+
+
+async def main(args: argparse.Namespace) -> int:
+    async with engine.connect() as conn:
+        transaction = await conn.begin()
+        started = time.perf_counter()
+        user_id = await seed(conn, args.receipts, args.batch)
+        if conn.dialect.name == "postgresql":
+            await conn.execute(text("ANALYZE receipts"))
+        print(f"заполнение: {time.perf_counter() - started:.1f} с")
+
+        db = AsyncSession(bind=conn)
+        user = {"id": user_id}
+        listings = (
+            (
+                "закрытые чеки",
+                get_all_sold_receipts,
+                select(Receipt).where(Receipt.status == "closed"),
+                [Receipt.created_at, Receipt.id],
+            ),
+            (
+                "чеки продавца",
+                get_user_receipts_from_db,
+                select(Receipt).where(Receipt.user_id == user_id),
+                [Receipt.id],
+            ),
+        )
+
+        print(f"чеков: {args.receipts}, на странице: {args.size}")
+        for name, listing, query, order_by in listings:
+            print(f"{name}:")
+            for depth in args.depths:
+                position = (depth - 1) * args.size
+                if position >= args.receipts:
+                    print(f"  страница {depth}: чеков меньше, пропущена")
+                    continue
+                offset, rows = await timed(
+                    listing,
+                    db,
+                    user,
+                    PaginationParams(page=depth, size=args.size),
+                    args.repeat,
+                )
+                cursor = await cursor_at(db, query, order_by, position)
+                keyset, page = await timed(
+                    listing,
+                    db,
+                    user,
+                    PaginationParams(size=args.size, cursor=cursor),
+                    args.repeat,
+                )
+                same = [row.id for row in rows] == [row["id"] for row in page.items]
+                print(
+                    f"  страница {depth}: OFFSET {offset * 1000:.2f} мс,"
+                    f" курсор {keyset * 1000:.2f} мс"
+                    f"{'' if same else ', СТРАНИЦЫ РАЗЛИЧАЮТСЯ'}"
+                )
+
+        await db.close()
+        await transaction.rollback()
+
+    await engine.dispose()
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--receipts", type=int, default=1_100_000)
+    parser.add_argument("--depths", type=int, nargs="+", default=[1, 1000, 100_000])
+    parser.add_argument("--size", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--batch", type=int, default=10_000)
+    raise SystemExit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,178 @@
+"""Замер поиска товаров по названию на синтетическом каталоге
+
+    python -m commands.bench_search --goods 100000 --queries 500
+    python -m commands.bench_search --goods 1000000 --queries 200
+
+Заполняет --goods товаров со случайными названиями внутри транзакции,
+которая в конце откатывается, и выполняет --queries запросов, как поле
+поиска кассы: начало слова, подстрока или слово с опечаткой. Сравнивает
+прежний поиск (name ILIKE '%...%' полным просмотром таблицы - индексы для
+него выключены в транзакции), get_goods_by_name по GIN-индексу pg_trgm
+(только postgres) и триграммный индекс в памяти, которым поиск пользуется
+на остальных базах. Печатает p50/p99 и долю запросов, нашедших товар.
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+from fastapi import HTTPException
+from sqlalchemy import func, insert, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.db import engine
+from crud.good.good_crud import get_goods_by_name
+from models import Article, Category
+from services.search.ngram_index import NGramIndex, words
+
+NOUNS = (
+    "молоко кефир сметана творог йогурт хлеб батон сыр масло чай кофе сахар"
+    " мука рис гречка макароны печенье шоколад сок вода колбаса сосиски курица"
+    " яблоки бананы картофель морковь лук капуста томаты"
+).split()
+KINDS = (
+    "отборный домашний фермерский классический деревенский цельный"
+    " обезжиренный сливочный ржаной пшеничный черный зеленый молочный горький"
+    " апельсиновый питьевой вареная"
+).split()
+BRANDS = (
+    "Простоквашино Вкусвилл Любимый Агуша Ахмад Жокей Макфа Мистраль"
+    " Юбилейное Аленка Добрый Родник"
+).split()
+
+
+def synthetic_names(count: int) -> list[str]:
+    return [
+        f"{random.choice(NOUNS)} {random.choice(KINDS)} {random.choice(BRANDS)}"
+        f" {random.randrange(100, 2000)} г арт {number}"
+        for number in range(count)
+    ]
+
+
+def typo(word: str) -> str:
+    if len(word) < 4:
+        return word
+    position = random.randrange(1, len(word) - 2)
+    return word[:position] + word[position + 1] + word[position] + word[position + 2 :]
+
+
+def synthetic_queries(names: list[str], count: int) -> list[str]:
+    queries = []
+    for _ in range(count):
+        word = max(words(random.choice(names)), key=len)
+        kind = random.random()
+        if kind < 0.4:
+            queries.append(word[: random.randrange(3, min(len(word), 6) + 1)])
+        elif kind < 0.7:
+            start = random.randrange(0, max(len(word) - 4, 1))
+            queries.append(word[start : start + 4])
+        else:
+            queries.append(typo(word))
+    return queries
+
+
+async def timed(search, queries: list[str]) -> tuple[list[float], int]:
+    latencies, found = [], 0
+    for query in queries:
+        started = time.perf_counter()
+        if await search(query):
+            found += 1
+        latencies.append(time.perf_counter() - started)
+    return latencies, found
+
+
+def describe(name: str, latencies: list[float], found: int) -> str:
+    return (
+        f"{name}: p50 {statistics.median(latencies) * 1000:.2f} мс,"
+        f" p99 {statistics.quantiles(latencies, n=100)[98] * 1000:.2f} мс,"
+        f" найдено {found / len(latencies) * 100:.0f}%"
+    )
+
+
+async def main(args: argparse.Namespace) -> int:
+    random.seed(args.seed)
+    names = synthetic_names(args.goods)
+    queries = synthetic_queries(names, args.queries)
+
+    async with engine.connect() as conn:
+        postgres = conn.dialect.name == "postgresql"
+        transaction = await conn.begin()
+        started = time.perf_counter()
+        category_id = await conn.scalar(
+            insert(Category).values(title="bench search").returning(Category.id)
+        )
+        first = await conn.scalar(select(func.coalesce(func.max(Article.id), 0))) + 1
+        for offset in range(0, args.goods, args.batch):
+            await conn.execute(
+                insert(Article),
+                [
+                    {
+                        "id": first + offset + number,
+                        "name": name,
+                        "category_id": category_id,
+                        "price": 100,
+                        "cost_price": 60,
+                        "stock_quantity": 10,
+                    }
+                    for number, name in enumerate(names[offset : offset + args.batch])
+                ],
+            )
+        if postgres:
+            await conn.execute(text("ANALYZE goods"))
+        print(f"заполнение: {time.perf_counter() - started:.1f} с")
+
+        db = AsyncSession(bind=conn)
+        results = []
+
+        async def ilike(query: str) -> list:
+            found = await db.scalars(
+                select(Article).where(Article.name.ilike(f"%{query}%")).limit(10)
+            )
+            return found.all()
+
+        async def ranked(query: str) -> list:
+            try:
+                return await get_goods_by_name(db, query, 10)
+            except HTTPException:
+                return []
+
+        if postgres:
+            # прежний поиск работал без индекса по названию
+            await db.execute(text("SET LOCAL enable_indexscan = off"))
+            await db.execute(text("SET LOCAL enable_bitmapscan = off"))
+        results.append(("ILIKE без индекса", *await timed(ilike, queries)))
+        if postgres:
+            await db.execute(text("SET LOCAL enable_indexscan = on"))
+            await db.execute(text("SET LOCAL enable_bitmapscan = on"))
+            results.append(("pg_trgm", *await timed(ranked, queries)))
+
+        await db.close()
+        await transaction.rollback()
+
+    await engine.dispose()
+
+    started = time.perf_counter()
+    index = NGramIndex(dict(enumerate(names)))
+    build = time.perf_counter() - started
+
+    async def in_memory(query: str) -> list:
+        return index.search(query, 10)
+
+    results.append(("индекс в памяти", *await timed(in_memory, queries)))
+
+    print(f"товаров: {args.goods}, запросов: {args.queries}")
+    for result in results:
+        print(describe(*result))
+    print(f"построение индекса в памяти: {build:.1f} с")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--goods", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--batch", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=1)
+    raise SystemExit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,178 @@
+"""Замер продажи чека: прежний ORM-путь против переноса одним запросом (только postgres)
+
+    python -m commands.bench_sell_receipt --receipts 200
+    python -m commands.bench_sell_receipt --sizes 1 10 100 --rollups
+
+Для каждого размера корзины из --sizes заполняет --receipts открытых чеков
+на каждый путь внутри транзакции, которая в конце откатывается, и продает
+их. Прежний путь, как до переписывания sell_receipt: чек и строки читаются
+в ORM-объекты, на каждую строку создается объект Sales, строки удаляются,
+статус меняется на объекте. Новый - set_closed_status_for_receipt и
+add_items_to_sales_table, с --rollups еще и дневные агрегаты. Вместо коммита
+каждого чека - flush. Печатает p50/p99 на чек и число запросов к БД.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from datetime import datetime
+
+from sqlalchemy import delete, event, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.db import engine
+from crud.rollup.rollup_crud import add_receipt_to_rollups
+from crud.sales.sales_crud import (
+    add_items_to_sales_table,
+    set_closed_status_for_receipt,
+)
+from models import Article, Category, Receipt, ReceiptItem, Sales, User
+
+
+async def old_checkout(db: AsyncSession, receipt_id: int, user_id: int, rollups: bool):
+    receipt = await db.scalar(select(Receipt).where(Receipt.id == receipt_id))
+    items = await db.scalars(
+        select(ReceiptItem).where(ReceiptItem.receipt_id == receipt_id)
+    )
+    db.add_all(
+        Sales(
+            good_id=item.product_id,
+            quantity=item.quantity,
+            user_id=user_id,
+            total_price=item.price_at_sale * item.quantity,
+            receipt_id=receipt_id,
+        )
+        for item in items.all()
+    )
+    await db.execute(delete(ReceiptItem).where(ReceiptItem.receipt_id == receipt_id))
+    receipt.closed_at = datetime.now()
+    receipt.status = "closed"
+    await db.flush()
+    # у каждого запроса своя сессия, identity map не копится
+    db.expunge_all()
+
+
+async def new_checkout(db: AsyncSession, receipt_id: int, user_id: int, rollups: bool):
+    sold_at = await set_closed_status_for_receipt(db, receipt_id, user_id)
+    await add_items_to_sales_table(db, user_id, receipt_id, sold_at)
+    if rollups:
+        await add_receipt_to_rollups(db, receipt_id)
+
+
+async def seed_receipts(
+    db: AsyncSession, user_id: int, good_ids: list[int], count: int, size: int
+) -> list[int]:
+    receipt_ids = await db.scalars(
+        insert(Receipt)
+        .values([{"user_id": user_id, "status": "open"}] * count)
+        .returning(Receipt.id)
+    )
+    receipt_ids = receipt_ids.all()
+    for receipt_id in receipt_ids:
+        await db.execute(
+            insert(ReceiptItem).values(
+                [
+                    {
+                        "receipt_id": receipt_id,
+                        "product_id": good_ids[line % len(good_ids)],
+                        "quantity": 1 + line % 3,
+                        "price_at_sale": 100.0,
+                    }
+                    for line in range(size)
+                ]
+            )
+        )
+    return receipt_ids
+
+
+async def measure(db: AsyncSession, checkout, receipt_ids, user_id, args, counter):
+    latencies = []
+    statements = counter[0]
+    for receipt_id in receipt_ids:
+        started = time.perf_counter()
+        await checkout(db, receipt_id, user_id, args.rollups)
+        latencies.append(time.perf_counter() - started)
+    return latencies, (counter[0] - statements) / len(receipt_ids)
+
+
+def describe(latencies: list[float]) -> str:
+    return (
+        f"p50 {statistics.median(latencies) * 1000:.2f} мс,"
+        f" p99 {statistics.quantiles(latencies, n=100)[98] * 1000:.2f} мс"
+    )
+
+
+async def main(args: argparse.Namespace) -> int:
+    counter = [0]
+
+    def count_statement(*_):
+        counter[0] += 1
+
+    async with engine.connect() as conn:
+        if conn.dialect.name != "postgresql":
+            print("Замер работает только на postgres")
+            await engine.dispose()
+            return 1
+
+        transaction = await conn.begin()
+        db = AsyncSession(bind=conn)
+        category_id = await db.scalar(
+            insert(Category).values(title="bench sell").returning(Category.id)
+        )
+        good_ids = await db.scalars(
+            insert(Article)
+            .values(
+                [
+                    {
+                        "name": f"bench sell {number}",
+                        "category_id": category_id,
+                        "price": 100,
+                        "cost_price": 60,
+                        "stock_quantity": 1_000_000,
+                    }
+                    for number in range(max(args.sizes))
+                ]
+            )
+            .returning(Article.id)
+        )
+        good_ids = good_ids.all()
+        user_id = await db.scalar(
+            insert(User)
+            .values(username="bench sell", email="bench@sell")
+            .returning(User.id)
+        )
+
+        event.listen(engine.sync_engine, "before_cursor_execute", count_statement)
+        print(f"чеков на путь: {args.receipts}, агрегаты: {args.rollups}")
+        for size in args.sizes:
+            results = {}
+            for name, checkout in (("прежний", old_checkout), ("новый", new_checkout)):
+                receipt_ids = await seed_receipts(
+                    db, user_id, good_ids, args.receipts, size
+                )
+                results[name] = await measure(
+                    db, checkout, receipt_ids, user_id, args, counter
+                )
+            (old, old_statements), (new, new_statements) = results.values()
+            print(f"корзина {size}:")
+            print(f"  прежний: {describe(old)}, запросов {old_statements:.0f}")
+            print(f"  новый:   {describe(new)}, запросов {new_statements:.0f}")
+            print(
+                f"  ускорение p50: {statistics.median(old) / statistics.median(new):.1f}x"
+            )
+        event.remove(engine.sync_engine, "before_cursor_execute", count_statement)
+
+        await db.close()
+        await transaction.rollback()
+
+    await engine.dispose()
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--receipts", type=int, default=200)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--rollups", action="store_true")
+    raise SystemExit(asyncio.run(main(parser.parse_args())))
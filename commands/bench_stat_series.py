@@ -0,0 +1,68 @@
+"""Замер ряда продаж по дням: один запрос против запроса на каждый день
+
+    python -m commands.bench_stat_series --days 365
+    python -m commands.bench_stat_series --days 90 --bucket week --group-by seller
+
+Считает ряд за последние --days дней через get_sales_series_rows и тот же
+ряд вызовами get_sales_totals на каждый интервал, как это делал бы клиент
+без /statistic/series. Печатает время обоих способов и сверяет выручку ряда
+с итогом за период. Работает на данных текущей БД, ничего не изменяет.
+"""
+
+import argparse
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+from backend.db import engine, session
+from crud.statistic.statistic_crud import get_sales_series_rows, get_sales_totals
+from services.statisitc.statistic import bucket_starts, next_bucket
+
+
+async def main(args: argparse.Namespace) -> int:
+    end = datetime.now()
+    start = (end - timedelta(days=args.days)).replace(
+        hour=0, minute=0, second=0, microsecond=0
+    )
+    starts = bucket_starts(start, end, args.bucket)
+
+    async with session() as db:
+        started = time.perf_counter()
+        rows = await get_sales_series_rows(db, start, end, args.bucket, args.group_by)
+        series_time = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for period in starts:
+            stop = min(next_bucket(period, args.bucket), end)
+            await get_sales_totals(db, max(period, start), stop)
+        loop_time = time.perf_counter() - started
+
+        # границы интервалов включаются в get_sales_totals с обеих сторон,
+        # поэтому сверяется итог за весь период, а не сумма интервалов
+        totals = await get_sales_totals(db, start, end)
+
+    await engine.dispose()
+
+    series_revenue = sum(revenue for revenue, _, _ in rows.values())
+    print(f"интервалов: {len(starts)} ({args.bucket}), групп: {args.group_by or '-'}")
+    print(f"один запрос ряда: {series_time * 1000:.1f} мс")
+    print(
+        f"запрос на интервал: {loop_time * 1000:.1f} мс"
+        f" ({loop_time / len(starts) * 1000:.2f} мс на интервал)"
+    )
+    print(f"ускорение: {loop_time / series_time:.1f}x")
+    if abs(series_revenue - totals["revenue"]) > 0.01:
+        print(f"ОШИБКА: выручка ряда {series_revenue}, за период {totals['revenue']}")
+        return 1
+    print(f"выручка совпадает: {series_revenue:.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument(
+        "--bucket", choices=["hour", "day", "week", "month"], default="day"
+    )
+    parser.add_argument("--group-by", choices=["category", "seller"], default=None)
+    raise SystemExit(asyncio.run(main(parser.parse_args())))
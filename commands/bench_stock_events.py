@@ -0,0 +1,95 @@
+"""Замер рассылки изменений остатков подписчикам одного процесса
+
+    python -m commands.bench_stock_events --subscribers 1000 --commits 2000
+    python -m commands.bench_stock_events --subscribers 1000 --categories 50
+
+Создает --subscribers подписок (без --categories - на все товары, иначе
+каждая на одну из --categories категорий) и читателя на каждую. Публикует
+--commits коммитов по --lines товаров, как продажа на кассе, и печатает
+время dispatch на коммит, задержку доставки p50/p99 и число resync. С --slow
+часть читателей не читает, чтобы проверить, что их очереди не растут.
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+from backend import config
+from services.stock.stock_events import RESYNC, StockEventHub, stock_event
+
+
+async def reader(subscription, latencies: list, resyncs: list):
+    while True:
+        item = await subscription.get()
+        if item is RESYNC:
+            resyncs.append(1)
+            continue
+        latencies.append(time.perf_counter() - item[0]["sent_at"])
+
+
+async def main(args: argparse.Namespace) -> int:
+    hub = StockEventHub(config.STOCK_EVENTS_QUEUE_SIZE)
+    latencies, resyncs = [], []
+    readers = []
+    for number in range(args.subscribers):
+        categories = {number % args.categories} if args.categories else None
+        subscription = hub.subscribe(categories)
+        if number < args.slow:
+            continue
+        readers.append(asyncio.create_task(reader(subscription, latencies, resyncs)))
+
+    dispatch = []
+    for _ in range(args.commits):
+        events = [
+            stock_event(
+                random.randrange(100_000),
+                random.randrange(max(args.categories, 1)),
+                random.randrange(100),
+                100.0,
+                sent_at=time.perf_counter(),
+            )
+            for _ in range(args.lines)
+        ]
+        started = time.perf_counter()
+        hub.dispatch(events)
+        dispatch.append(time.perf_counter() - started)
+        # читатели работают между коммитами, как при реальной нагрузке
+        await asyncio.sleep(0)
+
+    await asyncio.sleep(0.1)
+    for task in readers:
+        task.cancel()
+
+    latencies.sort()
+    print(
+        f"подписчиков: {args.subscribers}, категорий: {args.categories or 'все'},"
+        f" коммитов: {args.commits} по {args.lines} строк"
+    )
+    print(
+        f"dispatch: p50 {statistics.median(dispatch) * 1e6:.0f} мкс,"
+        f" максимум {max(dispatch) * 1e6:.0f} мкс"
+    )
+    if latencies:
+        print(
+            f"доставок: {len(latencies)}, задержка p50"
+            f" {statistics.median(latencies) * 1000:.2f} мс, p99"
+            f" {statistics.quantiles(latencies, n=100)[98] * 1000:.2f} мс"
+        )
+    stats = hub.stats()
+    print(
+        f"resync у читающих: {len(resyncs)}, сбросов очередей: {stats['dropped']},"
+        f" максимум в очереди: {max(s.queue.qsize() for s in hub.subscribers())}"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--subscribers", type=int, default=1000)
+    parser.add_argument("--categories", type=int, default=0)
+    parser.add_argument("--commits", type=int, default=2000)
+    parser.add_argument("--lines", type=int, default=3)
+    parser.add_argument("--slow", type=int, default=0)
+    raise SystemExit(asyncio.run(main(parser.parse_args())))
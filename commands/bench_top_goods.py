@@ -0,0 +1,135 @@
+"""Замер рейтинга товаров и ABC-анализа на синтетических продажах (только postgres)
+
+    python -m commands.bench_top_goods --sales 10000000 --goods 200000
+    python -m commands.bench_top_goods --sales 1000000 --days 30
+
+Заполняет goods, receipts, sales и дневные агрегаты product_stats внутри
+транзакции, которая в конце откатывается: --sales продаж по --goods товарам
+за последние --days дней. Затем замеряет /statistic/top-goods и
+/statistic/abc без кэша и из кэша, а для сравнения - итоги по товару через
+get_sales_totals для --baseline товаров, как при вызове /good/statistic на
+каждый товар, с пересчетом на все товары.
+"""
+
+import argparse
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend import config
+from backend.cache import catalogue_cache
+from backend.db import engine
+from crud.statistic.statistic_crud import (
+    get_abc_summary,
+    get_sales_totals,
+    get_top_goods,
+)
+
+SEED = (
+    "INSERT INTO categories (id, title) VALUES (-1, 'bench seed')",
+    "INSERT INTO goods (name, category_id, price, cost_price, stock_quantity)"
+    " SELECT 'bench seed ' || g, -1, 10, 5, 1000 FROM generate_series(1, :goods) g",
+    "INSERT INTO users (username, email) VALUES ('bench seed', 'bench@seed')",
+    "INSERT INTO receipts (user_id, created_at, closed_at, total_amount, status)"
+    " SELECT (SELECT id FROM users WHERE username = 'bench seed'), now(), now(),"
+    " 0, 'closed'",
+    # степень сдвигает распределение к первым товарам, как в реальных продажах
+    "INSERT INTO sales (receipt_id, good_id, quantity, user_id, total_price,"
+    " sales_date, price_at_sale, cost_at_sale)"
+    " SELECT r.id, g.first + floor(:goods * power(random(), 3))::int, 1, r.user_id,"
+    " 10, now() - random() * :days * interval '1 day', 10, 5"
+    " FROM generate_series(1, :sales),"
+    " (SELECT min(id) AS first FROM goods WHERE category_id = -1) g,"
+    " (SELECT id, user_id FROM receipts ORDER BY id DESC LIMIT 1) r",
+    "INSERT INTO product_stats (good_id, period, total_sales, amount, quantity, cost)"
+    " SELECT s.good_id, date_trunc('day', s.sales_date), count(*), sum(s.total_price),"
+    " sum(s.quantity), sum(s.quantity) * 5 FROM sales s"
+    " WHERE s.sales_date < date_trunc('day', now()) GROUP BY 1, 2"
+    " ON CONFLICT (good_id, period) DO UPDATE SET"
+    " total_sales = product_stats.total_sales + excluded.total_sales,"
+    " amount = product_stats.amount + excluded.amount,"
+    " quantity = product_stats.quantity + excluded.quantity,"
+    " cost = product_stats.cost + excluded.cost",
+)
+
+
+async def timed(coro) -> tuple[float, object]:
+    started = time.perf_counter()
+    result = await coro
+    return time.perf_counter() - started, result
+
+
+async def main(args: argparse.Namespace) -> int:
+    async with engine.connect() as conn:
+        if conn.dialect.name != "postgresql":
+            print("Замер работает только на postgres")
+            await engine.dispose()
+            return 1
+
+        transaction = await conn.begin()
+        params = {"goods": args.goods, "sales": args.sales, "days": args.days}
+        started = time.perf_counter()
+        for statement in SEED:
+            await conn.execute(text(statement), params)
+        await conn.execute(text("ANALYZE"))
+        print(f"заполнение: {time.perf_counter() - started:.1f} с")
+
+        db = AsyncSession(bind=conn)
+        end = datetime.now()
+        start = end - timedelta(days=args.days)
+        shares = (config.STAT_ABC_A_SHARE, config.STAT_ABC_B_SHARE)
+
+        catalogue_cache.enabled = False
+        top_time, top = await timed(
+            get_top_goods(db, start, end, None, "revenue", 20, *shares)
+        )
+        abc_time, abc = await timed(
+            get_abc_summary(db, start, end, None, "revenue", *shares)
+        )
+        catalogue_cache.enabled = True
+        await get_top_goods(db, start, end, None, "revenue", 20, *shares)
+        cached_time, _ = await timed(
+            get_top_goods(db, start, end, None, "revenue", 20, *shares)
+        )
+
+        baseline = top[: args.baseline] if top else []
+        baseline_time = 0.0
+        for good in baseline:
+            elapsed, _ = await timed(
+                get_sales_totals(db, start, end, good_id=good["good_id"])
+            )
+            baseline_time += elapsed
+
+        await db.close()
+        await transaction.rollback()
+
+    await engine.dispose()
+
+    print(f"продаж: {args.sales}, товаров: {args.goods}, дней: {args.days}")
+    print(f"top-goods без кэша: {top_time * 1000:.0f} мс")
+    print(f"abc без кэша: {abc_time * 1000:.0f} мс")
+    print(f"top-goods из кэша: {cached_time * 1e6:.0f} мкс")
+    for summary in abc:
+        print(
+            f"  класс {summary['abc_class']}: {summary['goods_count']} товаров,"
+            f" {summary['share'] * 100:.1f}% выручки"
+        )
+    if baseline:
+        per_good = baseline_time / len(baseline)
+        print(
+            f"get_sales_totals на товар: {per_good * 1000:.2f} мс,"
+            f" на все товары ~{per_good * args.goods:.0f} с"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sales", type=int, default=10_000_000)
+    parser.add_argument("--goods", type=int, default=200_000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--baseline", type=int, default=20)
+    raise SystemExit(asyncio.run(main(parser.parse_args())))
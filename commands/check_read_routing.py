@@ -0,0 +1,136 @@
+"""Проверка маршрутизации чтений между основной БД и репликой
+
+    DATABASE_URL=sqlite+aiosqlite:///primary.db alembic upgrade head
+    DATABASE_URL=sqlite+aiosqlite:///replica.db alembic upgrade head
+    DATABASE_URL=sqlite+aiosqlite:///primary.db \\
+    DATABASE_REPLICA_URL=sqlite+aiosqlite:///replica.db \\
+        python -m commands.check_read_routing
+
+Нужны две базы с одной схемой: два файла SQLite или два postgres. Файлы
+между собой не реплицируются, поэтому реплика изображает отставшую: записи
+в основную БД в ней нет. Через get_db создается категория-метка, и ответ
+получает время записи. Затем get_read_db открывается для запросов с этим
+временем в заголовке, в cookie, без него, с истекшим временем и при
+недоступной реплике. Для каждого случая печатается, куда ушло чтение и
+видна ли метка. Если чтение ушло не туда, код выхода 1. Метка в конце
+удаляется.
+"""
+
+import argparse
+import asyncio
+import time
+import uuid
+
+from fastapi import Request, Response
+from sqlalchemy import delete, select
+
+import backend.db as db_module
+from backend import config
+from backend.db import (
+    LAST_WRITE_COOKIE,
+    LAST_WRITE_HEADER,
+    ReadRouter,
+    create_engine_from_settings,
+    engine,
+    get_db,
+    get_read_db,
+    replica_engine,
+)
+from models import Category
+
+
+def request_with(headers: dict[str, str]) -> Request:
+    return Request(
+        {
+            "type": "http",
+            "headers": [
+                (name.lower().encode(), value.encode())
+                for name, value in headers.items()
+            ],
+        }
+    )
+
+
+async def read(request: Request, title: str) -> tuple[str, bool]:
+    sessions = get_read_db(request)
+    ses = await anext(sessions)
+    try:
+        target = "основная" if ses.bind is engine else "реплика"
+        found = await ses.scalar(select(Category.id).where(Category.title == title))
+        return target, found is not None
+    finally:
+        await sessions.aclose()
+
+
+async def main(args: argparse.Namespace) -> int:
+    if replica_engine is engine:
+        print("Задайте DATABASE_REPLICA_URL: проверка нужна на двух базах")
+        await engine.dispose()
+        return 1
+
+    title = f"routing check {uuid.uuid4().hex[:8]}"
+    response = Response()
+    sessions = get_db(response)
+    ses = await anext(sessions)
+    ses.add(Category(title=title))
+    await ses.commit()
+    await sessions.aclose()
+
+    last_write = response.headers[LAST_WRITE_HEADER]
+    expired = f"{time.time() - config.DB_READ_YOUR_WRITES_SECONDS - 1:.3f}"
+    cases = [
+        ("время записи в заголовке", {LAST_WRITE_HEADER: last_write}, "основная"),
+        (
+            "время записи в cookie",
+            {"Cookie": f"{LAST_WRITE_COOKIE}={last_write}"},
+            "основная",
+        ),
+        ("без записи", {}, "реплика"),
+        ("запись давно", {LAST_WRITE_HEADER: expired}, "реплика"),
+    ]
+
+    failed = 0
+    try:
+        for name, headers, expected in cases:
+            target, found = await read(request_with(headers), title)
+            failed += target != expected
+            print(
+                f"{name}: {target}, метка {'видна' if found else 'не видна'}"
+                f"{'' if target == expected else f' - ожидалась {expected}'}"
+            )
+
+        # недоступная реплика: чтения без записи уходят в основную БД
+        broken = create_engine_from_settings(args.broken_url)
+        router = db_module.read_router
+        db_module.read_router = ReadRouter(broken)
+        try:
+            target, found = await read(request_with({}), title)
+        finally:
+            db_module.read_router = router
+            await broken.dispose()
+        failed += target != "основная"
+        print(
+            f"реплика недоступна: {target}, метка {'видна' if found else 'не видна'}"
+            f"{'' if target == 'основная' else ' - ожидалась основная'}"
+        )
+    finally:
+        sessions = get_db(Response())
+        ses = await anext(sessions)
+        await ses.execute(delete(Category).where(Category.title == title))
+        await ses.commit()
+        await sessions.aclose()
+        await engine.dispose()
+        await replica_engine.dispose()
+
+    print("маршрутизация верна" if not failed else f"ошибок: {failed}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--broken-url",
+        default="sqlite+aiosqlite:////nonexistent/replica.db",
+        help="адрес, к которому нельзя подключиться - недоступная реплика",
+    )
+    raise SystemExit(asyncio.run(main(parser.parse_args())))
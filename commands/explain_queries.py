@@ -0,0 +1,196 @@
+"""Проверка планов запросов из crud/ через EXPLAIN (только postgres)
+
+    python -m commands.explain_queries
+    python -m commands.explain_queries --seed 200000
+
+--seed должен быть не меньше 1000: строки продаж ссылаются на 100 товаров.
+
+С --seed таблицы заполняются синтетическими данными внутри транзакции, которая
+в конце откатывается. Для каждого запроса ожидается индексный доступ через
+указанный индекс, иначе команда завершается с кодом 1. Индексы секций
+sales считаются по индексу родительской таблицы, из которого они созданы.
+"""
+
+import argparse
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select, text
+
+from backend.db import engine
+from models import Article, Category, GoodStat, Receipt, ReceiptItem, Sales, SellerStat
+
+INDEX_NODES = {"Index Scan", "Index Only Scan", "Bitmap Index Scan"}
+
+SEED = (
+    "INSERT INTO categories (id, title) VALUES (-1, 'explain seed')",
+    "INSERT INTO categories (title, parent_id)"
+    " SELECT 'explain seed ' || g, -1 FROM generate_series(1, :n / 100) g",
+    "INSERT INTO goods (name, category_id, price, cost_price, stock_quantity)"
+    " SELECT 'explain seed ' || g, -1, 10, 5, 1000 FROM generate_series(1, :n / 10) g",
+    "INSERT INTO users (username, email)"
+    " SELECT 'explain seed ' || g, 'explain' || g || '@seed'"
+    " FROM generate_series(1, 50) g",
+    "INSERT INTO receipts (user_id, created_at, closed_at, total_amount, status)"
+    " SELECT (SELECT min(id) FROM users), now() - g * interval '1 minute',"
+    " now() - g * interval '1 minute', 10, 'closed' FROM generate_series(1, :n / 5) g",
+    "INSERT INTO sales (receipt_id, good_id, quantity, user_id, total_price,"
+    " sales_date, price_at_sale, cost_at_sale)"
+    " SELECT r.id, (SELECT min(id) FROM goods WHERE category_id = -1) + r.id % 100,"
+    " 1, r.user_id, 10, r.created_at, 10, 5 FROM receipts r",
+    "INSERT INTO receipt_items (receipt_id, product_id, quantity, price_at_sale)"
+    " SELECT r.id, (SELECT min(id) FROM goods WHERE category_id = -1) + r.id % 100,"
+    " 1, 10 FROM receipts r",
+    "INSERT INTO product_stats (good_id, period, total_sales, amount, quantity, cost)"
+    " SELECT s.good_id, date_trunc('day', s.sales_date), count(*), sum(s.total_price),"
+    " sum(s.quantity), 0 FROM sales s GROUP BY 1, 2 ON CONFLICT DO NOTHING",
+    "INSERT INTO seller_stats (user_id, period, total_sales, total_amount, quantity, cost)"
+    " SELECT s.user_id, date_trunc('day', s.sales_date), count(*), sum(s.total_price),"
+    " sum(s.quantity), 0 FROM sales s GROUP BY 1, 2 ON CONFLICT DO NOTHING",
+)
+
+
+def checked_queries():
+    """Запросы в том виде, в котором их строит crud/, и ожидаемый индекс"""
+    day = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    start, end = day - timedelta(days=1), day
+
+    return (
+        (
+            "statistic: продажи за период",
+            select(func.sum(Sales.total_price)).where(
+                Sales.sales_date >= start, Sales.sales_date < end
+            ),
+            "ix_sales_sales_date_covering",
+        ),
+        (
+            "good: статистика товара за период",
+            select(func.sum(Sales.total_price)).where(
+                Sales.good_id == 1, Sales.sales_date >= start, Sales.sales_date < end
+            ),
+            "ix_sales_good_id_sales_date_covering",
+        ),
+        (
+            "rollup: продажи чека",
+            select(Sales).where(Sales.receipt_id == 1),
+            "ix_sales_receipt_id",
+        ),
+        (
+            "cash: строки чека",
+            select(ReceiptItem).where(
+                ReceiptItem.receipt_id == 1, ReceiptItem.product_id == 1
+            ),
+            "uq_receipt_items_receipt_product",
+        ),
+        (
+            "cash: закрытые чеки",
+            select(Receipt)
+            .where(Receipt.status == "closed")
+            .order_by(Receipt.created_at.desc(), Receipt.id.desc())
+            .limit(20),
+            "ix_receipts_closed_created_at_id",
+        ),
+        (
+            "cash: чеки продавца",
+            select(Receipt)
+            .where(Receipt.user_id == 1)
+            .order_by(Receipt.id.desc())
+            .limit(20),
+            "ix_receipts_user_id_id",
+        ),
+        (
+            "good: товары категории",
+            select(Article).where(Article.category_id == 1),
+            "ix_goods_category_id",
+        ),
+        (
+            "category: дочерние категории",
+            select(Category).where(Category.parent_id == 1),
+            "ix_categories_parent_id",
+        ),
+        (
+            "good: поиск по имени",
+            select(Article).where(Article.name.icontains("seed 12")),
+            "ix_goods_name_trgm",
+        ),
+        (
+            "statistic: агрегаты товаров за период",
+            select(func.sum(GoodStat.amount)).where(
+                GoodStat.period >= start, GoodStat.period < end
+            ),
+            "ix_product_stats_period",
+        ),
+        (
+            "statistic: агрегаты продавцов за период",
+            select(func.sum(SellerStat.total_amount)).where(
+                SellerStat.period >= start, SellerStat.period < end
+            ),
+            "ix_seller_stats_period",
+        ),
+    )
+
+
+def plan_indexes(node: dict) -> set[str]:
+    """Индексы, через которые план читает таблицы"""
+    found = set()
+    if node.get("Node Type") in INDEX_NODES:
+        found.add(node.get("Index Name"))
+    for child in node.get("Plans", ()):
+        found |= plan_indexes(child)
+    return found
+
+
+async def parent_indexes(conn) -> dict[str, str]:
+    """Индекс секции - индекс секционированной таблицы, из которого он создан"""
+    rows = await conn.execute(
+        text(
+            "SELECT c.relname, p.relname FROM pg_inherits i"
+            " JOIN pg_class c ON c.oid = i.inhrelid"
+            " JOIN pg_class p ON p.oid = i.inhparent"
+            " WHERE c.relkind = 'i'"
+        )
+    )
+    return dict(rows.all())
+
+
+async def main(args: argparse.Namespace) -> int:
+    failed = 0
+    async with engine.connect() as conn:
+        if conn.dialect.name != "postgresql":
+            print("Проверка планов работает только на postgres")
+            await engine.dispose()
+            return 1
+
+        transaction = await conn.begin()
+        if args.seed:
+            for statement in SEED:
+                await conn.execute(text(statement), {"n": args.seed})
+            await conn.execute(text("ANALYZE"))
+        parents = await parent_indexes(conn)
+
+        for title, query, index in checked_queries():
+            compiled = query.compile(conn, compile_kwargs={"literal_binds": True})
+            # литералы дат содержат ":", поэтому без разбора параметров text()
+            result = await conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}")
+            plan = result.scalar()
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            used = {parents.get(name, name) for name in plan_indexes(plan[0]["Plan"])}
+            ok = index in used
+            failed += not ok
+            print(
+                f"{'ok  ' if ok else 'FAIL'} {title}: {', '.join(used) or 'seq scan'}"
+            )
+
+        await transaction.rollback()
+
+    await engine.dispose()
+    print(f"Без ожидаемого индекса: {failed}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seed", type=int, default=0)
+    raise SystemExit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,30 @@
+"""Выгрузка закрытых чеков с продажами в gzip-файл в EXPORT_DIR
+
+    python -m commands.export_sales --start 2024-01-01 --end 2024-02-01
+    python -m commands.export_sales --start 2024-01-01 --end 2024-02-01 --format csv
+
+Конец периода не включается.
+"""
+
+import argparse
+import asyncio
+import json
+from datetime import datetime
+
+from backend.db import engine, session
+from services.cash.sales_export import export_sales_to_file
+
+
+async def main(args: argparse.Namespace) -> int:
+    result = await export_sales_to_file(session, args.start, args.end, args.format)
+    print(json.dumps(result, ensure_ascii=False))
+    await engine.dispose()
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--start", type=datetime.fromisoformat, required=True)
+    parser.add_argument("--end", type=datetime.fromisoformat, required=True)
+    parser.add_argument("--format", choices=["ndjson", "csv"], default="ndjson")
+    raise SystemExit(asyncio.run(main(parser.parse_args())))
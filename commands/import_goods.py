@@ -0,0 +1,52 @@
+"""Массовая загрузка и выгрузка каталога товаров
+
+    python -m commands.import_goods import prices.csv
+    python -m commands.import_goods import prices.ndjson --batch-size 5000
+    python -m commands.import_goods export goods.csv
+
+Формат определяется по расширению файла (.ndjson/.jsonl - NDJSON, иначе CSV)
+или задается --format.
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+from backend.db import engine, session
+from services.good.catalogue_io import (
+    FORMATS,
+    detect_format,
+    export_goods,
+    import_goods,
+)
+
+
+async def main(args: argparse.Namespace) -> int:
+    fmt = detect_format(args.path, args.format)
+    started = time.perf_counter()
+
+    if args.command == "import":
+        with open(args.path, "rb") as file:
+            async with session() as db:
+                report = await import_goods(db, file, fmt, args.batch_size)
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        result = 1 if report["errors_count"] else 0
+    else:
+        with open(args.path, "w", encoding="utf-8", newline="") as file:
+            async for chunk in export_goods(session, fmt):
+                file.write(chunk)
+        result = 0
+
+    print(f"Готово за {time.perf_counter() - started:.1f} с")
+    await engine.dispose()
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("command", choices=["import", "export"])
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=FORMATS)
+    parser.add_argument("--batch-size", type=int)
+    raise SystemExit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,244 @@
+"""Обслуживание месячных секций sales (только postgres)
+
+    python -m commands.partitions list
+    python -m commands.partitions create --months 3
+    python -m commands.partitions archive --before 2025-01
+    python -m commands.partitions check
+
+create - создает секции с текущего месяца на --months вперед (по умолчанию
+SALES_PARTITION_MONTHS_AHEAD), запускать по расписанию; строки этих месяцев,
+попавшие в sales_default, переносятся в новые секции.
+
+archive - отсоединяет секции месяцев до --before (не включая), выгружает
+каждую в <--dir>/<секция>.csv.gz через COPY и удаляет таблицу секции
+(--keep-table - оставить). Полные сутки архивных месяцев статистика
+по-прежнему берет из product_stats и seller_stats; rollups backfill за эти
+дни не запускать - он пересчитал бы агрегаты по пустым sales.
+
+check - выполняет запросы статистики из crud/ за короткий период и за
+период на стыке месяцев, для каждого запроса к sales делает EXPLAIN и
+проверяет, что читаются только секции месяцев периода. Код выхода 1 -
+запрос читает лишние секции.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import re
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend import config
+from backend.cache import catalogue_cache
+from backend.db import engine
+from crud.partition.partition_crud import (
+    add_months,
+    create_partition,
+    default_partition_name,
+    detach_partition,
+    drop_table,
+    dump_table,
+    get_partitions,
+    month_start,
+    months_between,
+    partition_name,
+)
+from crud.statistic.statistic_crud import (
+    get_sales_series_rows,
+    get_sales_totals,
+    get_seller_totals,
+    get_top_goods,
+)
+
+TABLE = "sales"
+
+
+def month_arg(value: str) -> date:
+    return datetime.strptime(value, "%Y-%m").date()
+
+
+async def list_partitions(conn) -> int:
+    for name in await get_partitions(conn, TABLE):
+        rows = await conn.scalar(text(f"SELECT count(*) FROM {name}"))
+        print(f"{name}: {rows}")
+    return 0
+
+
+async def create(conn, months: int) -> int:
+    existing = await get_partitions(conn, TABLE)
+    this_month = month_start(date.today())
+    for offset in range(months + 1):
+        month = add_months(this_month, offset)
+        if partition_name(TABLE, month) in existing:
+            continue
+        moved = await create_partition(conn, TABLE, month)
+        await conn.commit()
+        print(f"создана {partition_name(TABLE, month)}, перенесено строк: {moved}")
+    return 0
+
+
+async def archive(conn, before: date, directory: str, keep_table: bool) -> int:
+    if before > month_start(date.today()):
+        print("Текущий и будущие месяцы не архивируются")
+        return 1
+
+    os.makedirs(directory, exist_ok=True)
+    partitions = await get_partitions(conn, TABLE)
+    old = sorted(
+        (month, name) for name, month in partitions.items() if month and month < before
+    )
+    for _, name in old:
+        # после отсоединения в секцию никто не пишет, выгрузка согласована
+        await detach_partition(conn, TABLE, name)
+        await conn.commit()
+
+        path = os.path.join(directory, f"{name}.csv.gz")
+        dumped = await dump_table(conn, name, path)
+        rows = await conn.scalar(text(f"SELECT count(*) FROM {name}"))
+        if dumped != rows:
+            print(
+                f"ОШИБКА: {name} выгружено {dumped} строк из {rows}, таблица оставлена"
+            )
+            return 1
+        if not keep_table:
+            await drop_table(conn, name)
+        await conn.commit()
+        print(f"{name}: {rows} строк -> {path}")
+
+    default = default_partition_name(TABLE)
+    if default in partitions:
+        stray = await conn.scalar(
+            text(f"SELECT count(*) FROM {default} WHERE sales_date < :before"),
+            {"before": before},
+        )
+        if stray:
+            print(f"в {default} осталось строк до {before:%Y-%m}: {stray}")
+    return 0
+
+
+def plan_relations(node: dict) -> set[str]:
+    """Таблицы, которые читает план"""
+    found = {node["Relation Name"]} if "Relation Name" in node else set()
+    for child in node.get("Plans", ()):
+        found |= plan_relations(child)
+    return found
+
+
+def checked_periods() -> tuple[tuple[str, datetime, datetime], ...]:
+    now = datetime.now()
+    previous_month = datetime.combine(
+        add_months(month_start(now.date()), -1), datetime.min.time()
+    )
+    return (
+        ("последние сутки", now - timedelta(hours=36), now),
+        ("стык месяцев", previous_month + timedelta(days=20, hours=12), now),
+    )
+
+
+def checked_calls(db: AsyncSession, start: datetime, end: datetime):
+    """Запросы статистики в том виде, в котором их выполняет API"""
+    shares = (config.STAT_ABC_A_SHARE, config.STAT_ABC_B_SHARE)
+    return (
+        ("итоги за период", get_sales_totals(db, start, end)),
+        ("итоги товара", get_sales_totals(db, start, end, good_id=1)),
+        ("ряд по дням", get_sales_series_rows(db, start, end, "day", "seller")),
+        (
+            "рейтинг товаров",
+            get_top_goods(db, start, end, None, "revenue", 10, *shares),
+        ),
+        ("итоги продавцов", get_seller_totals(db, start, end)),
+        ("итоги продавцов по sales", get_seller_totals(db, start, end, raw=True)),
+    )
+
+
+async def check(conn) -> int:
+    partitions = await get_partitions(conn, TABLE)
+    db = AsyncSession(bind=conn)
+    failed = 0
+    catalogue_cache.enabled = False
+
+    for period, start, end in checked_periods():
+        expected = {
+            partition_name(TABLE, month) for month in months_between(start, end)
+        }
+        if not expected <= partitions.keys():
+            # строки месяцев без секции лежат в секции по умолчанию
+            expected = (expected & partitions.keys()) | {default_partition_name(TABLE)}
+        print(f"{period}: {start:%Y-%m-%d %H:%M} - {end:%Y-%m-%d %H:%M}")
+
+        for title, call in checked_calls(db, start, end):
+            statements = []
+
+            def capture(connection, cursor, statement, parameters, *_):
+                if re.search(rf"\b{TABLE}\b", statement):
+                    statements.append((statement, parameters))
+
+            event.listen(engine.sync_engine, "before_cursor_execute", capture)
+            try:
+                await call
+            finally:
+                event.remove(engine.sync_engine, "before_cursor_execute", capture)
+
+            for statement, parameters in statements:
+                result = await conn.exec_driver_sql(
+                    f"EXPLAIN (FORMAT JSON) {statement}", tuple(parameters)
+                )
+                plan = result.scalar()
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                read = plan_relations(plan[0]["Plan"]) & partitions.keys()
+                ok = read <= expected
+                failed += not ok
+                print(
+                    f"  {'ok  ' if ok else 'FAIL'} {title}:"
+                    f" {', '.join(sorted(read)) or 'секции отсечены'}"
+                )
+
+    catalogue_cache.enabled = True
+    await db.close()
+    print(f"Запросов с лишними секциями: {failed}")
+    return 1 if failed else 0
+
+
+async def main(args: argparse.Namespace) -> int:
+    async with engine.connect() as conn:
+        partitioned = conn.dialect.name == "postgresql" and await conn.scalar(
+            text(
+                "SELECT count(*) FROM pg_partitioned_table"
+                " WHERE partrelid = CAST(:table AS regclass)"
+            ),
+            {"table": TABLE},
+        )
+        if not partitioned:
+            print("sales не секционирована: секции есть только на postgres")
+            result = 1
+        elif args.command == "list":
+            result = await list_partitions(conn)
+        elif args.command == "create":
+            result = await create(conn, args.months)
+        elif args.command == "archive":
+            result = await archive(conn, args.before, args.dir, args.keep_table)
+        else:
+            result = await check(conn)
+            await conn.rollback()
+
+    await engine.dispose()
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("command", choices=["list", "create", "archive", "check"])
+    parser.add_argument(
+        "--months", type=int, default=config.SALES_PARTITION_MONTHS_AHEAD
+    )
+    parser.add_argument("--before", type=month_arg)
+    parser.add_argument("--dir", default=config.SALES_ARCHIVE_DIR)
+    parser.add_argument("--keep-table", action="store_true")
+    args = parser.parse_args()
+    if args.command == "archive" and args.before is None:
+        parser.error("для archive нужен --before ГГГГ-ММ")
+    raise SystemExit(asyncio.run(main(args)))
@@ -0,0 +1,148 @@
+"""Проверка идемпотентности выгрузки офлайн-чеков повторами одной пачки
+
+    python -m commands.replay_sync --receipts 20 --replays 3
+
+Создает продавца и товар с малым остатком, собирает пачку из --receipts
+чеков и отправляет ее --replays раз одновременно с одним Idempotency-Key,
+каждый раз в своей сессии, как повторы кассы после обрыва связи. Затем
+отправляет ту же пачку с новым ключом. Проверяет, что ответы совпадают,
+чеки и продажи созданы по одному разу, остаток списан один раз (не ниже
+нуля), а повтор с новым ключом отвечает duplicate по всем чекам. Созданные
+данные удаляются. Код выхода 1 - проверка не прошла.
+"""
+
+import argparse
+import asyncio
+import json
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, func, insert, select
+
+from backend.db import engine, session
+from models import Article, GoodStat, IdempotencyKey, Receipt, Sales, SellerStat, User
+from schemas.requests.receipt_sync import ReceiptSyncBatch
+from services.cash.receipt_sync import sync_offline_receipts
+
+
+async def seed(stock: int) -> tuple[int, int]:
+    async with session() as db:
+        user_id = await db.scalar(
+            insert(User)
+            .values(username=f"replay-{uuid.uuid4().hex[:8]}", is_seller=True)
+            .returning(User.id)
+        )
+        good_id = await db.scalar(
+            insert(Article)
+            .values(
+                name=f"replay good {uuid.uuid4().hex[:8]}",
+                price=10,
+                cost_price=5,
+                stock_quantity=stock,
+            )
+            .returning(Article.id)
+        )
+        await db.commit()
+        return user_id, good_id
+
+
+def build_batch(good_id: int, receipts: int) -> ReceiptSyncBatch:
+    closed_at = datetime.now() - timedelta(minutes=30)
+    return ReceiptSyncBatch.model_validate(
+        {
+            "receipts": [
+                {
+                    "client_uuid": str(uuid.uuid4()),
+                    "created_at": (closed_at - timedelta(minutes=1)).isoformat(),
+                    "closed_at": closed_at.isoformat(),
+                    "items": [{"good_id": good_id, "count": 2}],
+                }
+                for _ in range(receipts)
+            ]
+        }
+    )
+
+
+async def upload(user: dict, key: str, batch: ReceiptSyncBatch) -> dict:
+    async with session() as db:
+        return await sync_offline_receipts(db, user, key, batch)
+
+
+async def cleanup(user_id: int, good_id: int):
+    async with session() as db:
+        receipt_ids = select(Receipt.id).where(Receipt.user_id == user_id)
+        await db.execute(delete(Sales).where(Sales.receipt_id.in_(receipt_ids)))
+        await db.execute(delete(Receipt).where(Receipt.user_id == user_id))
+        await db.execute(delete(GoodStat).where(GoodStat.good_id == good_id))
+        await db.execute(delete(SellerStat).where(SellerStat.user_id == user_id))
+        await db.execute(
+            delete(IdempotencyKey).where(IdempotencyKey.user_id == user_id)
+        )
+        await db.execute(delete(Article).where(Article.id == good_id))
+        await db.execute(delete(User).where(User.id == user_id))
+        await db.commit()
+
+
+async def main(args: argparse.Namespace) -> int:
+    stock = args.receipts  # на пачку нужно вдвое больше - часть уйдет в oversold
+    user_id, good_id = await seed(stock)
+    user = {"id": user_id, "is_seller": True}
+    batch = build_batch(good_id, args.receipts)
+    failures = []
+
+    try:
+        key = uuid.uuid4().hex
+        responses = await asyncio.gather(
+            *(upload(user, key, batch) for _ in range(args.replays))
+        )
+        dumped = {json.dumps(response, sort_keys=True) for response in responses}
+        if len(dumped) != 1:
+            failures.append(f"ответы повторов различаются: {len(dumped)} вариантов")
+
+        response = responses[0]
+        statuses = [receipt["status"] for receipt in response["receipts"]]
+        if statuses != ["created"] * args.receipts:
+            failures.append(f"ожидались только created, получено {statuses}")
+        expected_oversold = [{"good_id": good_id, "count": args.receipts}]
+        if response["oversold"] != expected_oversold:
+            failures.append(f"oversold: {response['oversold']}")
+
+        renamed = await upload(user, uuid.uuid4().hex, batch)
+        if {receipt["status"] for receipt in renamed["receipts"]} != {"duplicate"}:
+            failures.append("повтор с новым ключом создал чеки заново")
+
+        async with session() as db:
+            receipts = await db.scalar(
+                select(func.count(Receipt.id)).where(Receipt.user_id == user_id)
+            )
+            sold = await db.scalar(
+                select(func.sum(Sales.quantity)).where(Sales.user_id == user_id)
+            )
+            left = await db.scalar(
+                select(Article.stock_quantity).where(Article.id == good_id)
+            )
+        if receipts != args.receipts:
+            failures.append(f"чеков {receipts}, ожидалось {args.receipts}")
+        if sold != args.receipts * 2:
+            failures.append(f"продано {sold}, ожидалось {args.receipts * 2}")
+        if left != 0:
+            failures.append(f"остаток {left}, ожидался 0")
+    finally:
+        await cleanup(user_id, good_id)
+        await engine.dispose()
+
+    for failure in failures:
+        print(f"ОШИБКА: {failure}")
+    if not failures:
+        print(
+            f"{args.replays} одновременных повтора пачки из {args.receipts} чеков"
+            " дали одинаковый ответ, данные применены один раз"
+        )
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--receipts", type=int, default=20)
+    parser.add_argument("--replays", type=int, default=3)
+    raise SystemExit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,41 @@
+"""Обслуживание дневных агрегатов продаж (product_stats, seller_stats)
+
+    python -m commands.rollups backfill --start 2024-01-01 --end 2024-02-01
+    python -m commands.rollups check --start 2024-01-01 --end 2024-02-01
+
+Периоды задаются днями, конец не включается. За месяцы, секции которых
+выгружены commands.partitions archive, backfill не запускать: в sales этих
+дней уже нет, и агрегаты обнулились бы.
+"""
+
+import argparse
+import asyncio
+from datetime import date
+
+from backend.db import engine, session
+from crud.rollup.rollup_crud import backfill_rollups, check_rollups
+
+
+async def main(args: argparse.Namespace) -> int:
+    async with session() as db:
+        if args.command == "backfill":
+            days = await backfill_rollups(db, args.start, args.end)
+            print(f"Пересчитано дней: {days}")
+            result = 0
+        else:
+            mismatches = await check_rollups(db, args.start, args.end)
+            for mismatch in mismatches:
+                print(mismatch)
+            print(f"Расхождений: {len(mismatches)}")
+            result = 1 if mismatches else 0
+
+    await engine.dispose()
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("command", choices=["backfill", "check"])
+    parser.add_argument("--start", type=date.fromisoformat, required=True)
+    parser.add_argument("--end", type=date.fromisoformat, required=True)
+    raise SystemExit(asyncio.run(main(parser.parse_args())))
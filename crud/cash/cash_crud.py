@@ -1,11 +1,20 @@
 from fastapi import status, HTTPException
-from sqlalchemy import select, update, delete
+from sqlalchemy import ARRAY, Integer, any_, bindparam, delete, func, select, update
+from sqlalchemy.dialects.postgresql import insert
 
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from models import Article, ReceiptItem, Sales
+from models import Article, ReceiptItem, Refund, Sales
+from crud.pagination import paginate
+from crud.rollup.rollup_crud import subtract_refund_from_rollups
+from crud.stock.stock_crud import release_stock, reserve_stock_batch
 from models.receipt import Receipt
 from schemas.requests.pagination import PaginationParams
+from schemas.requests.receipt_items_batch import ReceiptItemLine
+from schemas.response.receipt_items_batch import (
+    ReceiptItemsBatchResponse,
+    ReceiptLineResult,
+)
 
 
 async def check_permission_owner_or_seller(current_user: dict):
@@ -32,59 +41,119 @@ async def add_items_to_receipt(
     receipt_id: int,
     db: AsyncSession,
 ):
+    result = await add_items_batch_to_receipt(
+        current_user, [ReceiptItemLine(good_id=good_id, count=count)], receipt_id, db
+    )
+    line = result.lines[0]
 
-    await check_permission_owner_or_seller(current_user)
-
-    await check_receipt_status(db, receipt_id)
-
-    good_from_db = await db.scalar(select(Article).where(Article.id == good_id))
-
-    if not good_from_db:
+    if line.status == "not_found":
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Товара с таким id в БД не найдено",
         )
 
-    if good_from_db.stock_quantity < count:
+    if line.status == "insufficient_stock":
         raise HTTPException(
             status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-            detail=f"Товара в таком количестве нет, доступно: {good_from_db.stock_quantity}",
+            detail=f"Товара в таком количестве нет, доступно: {line.available}",
         )
 
-    await db.execute(
-        update(Article)
-        .where(Article.id == good_id)
-        .values(stock_quantity=Article.stock_quantity - count)
+    return line.name
+
+
+async def add_items_batch_to_receipt(
+    current_user: dict,
+    lines: list[ReceiptItemLine],
+    receipt_id: int,
+    db: AsyncSession,
+) -> ReceiptItemsBatchResponse:
+    """Добавляет пачку товаров в чек одним набором запросов и одним коммитом
+
+    Товары читаются одним SELECT, остатки проверяются и списываются одним
+    UPDATE ... FROM (VALUES ...), строки чека апсертятся одним INSERT,
+    сумма чека обновляется один раз. Строки, которые не удалось добавить,
+    не откатывают остальные - по каждой строке возвращается свой статус.
+    """
+
+    await check_permission_owner_or_seller(current_user)
+
+    await check_receipt_status(db, receipt_id)
+
+    # одинаковые товары внутри пачки сворачиваются в одну строку
+    counts: dict[int, int] = {}
+    for line in lines:
+        counts[line.good_id] = counts.get(line.good_id, 0) + line.count
+
+    goods_from_db = await db.execute(
+        select(Article.id, Article.name, Article.price, Article.stock_quantity).where(
+            Article.id == any_(bindparam("good_ids", list(counts), ARRAY(Integer)))
+        )
     )
+    goods = {good.id: good for good in goods_from_db}
 
-    item_from_db = await db.scalar(
-        select(ReceiptItem).where(ReceiptItem.product_id == good_id)
+    reserved = await reserve_stock_batch(
+        db, {good_id: n for good_id, n in counts.items() if good_id in goods}
     )
-    if item_from_db:
+
+    if reserved:
+        items = insert(ReceiptItem).values(
+            [
+                {
+                    "receipt_id": receipt_id,
+                    "product_id": good_id,
+                    "quantity": counts[good_id],
+                    "price_at_sale": float(goods[good_id].price),
+                }
+                for good_id in reserved
+            ]
+        )
         await db.execute(
-            update(ReceiptItem)
-            .where(ReceiptItem.product_id == good_id)
-            .values(quantity=ReceiptItem.quantity + count)
+            items.on_conflict_do_update(
+                index_elements=[ReceiptItem.receipt_id, ReceiptItem.product_id],
+                set_={"quantity": ReceiptItem.quantity + items.excluded.quantity},
+            )
+        )
+        added_amount = sum(
+            float(goods[good_id].price) * counts[good_id] for good_id in reserved
         )
+        total_amount = await db.scalar(
+            update(Receipt)
+            .where(Receipt.id == receipt_id)
+            .values(total_amount=Receipt.total_amount + added_amount)
+            .returning(Receipt.total_amount)
+        )
+        await db.commit()
     else:
-        items = ReceiptItem(
-            receipt_id=receipt_id,
-            product_id=good_id,
-            quantity=count,
-            price_at_sale=good_from_db.price,
+        total_amount = await db.scalar(
+            select(Receipt.total_amount).where(Receipt.id == receipt_id)
         )
-        db.add(items)
-    receipt_from_db: Receipt = await db.scalar(
-        select(Receipt).where(Receipt.id == receipt_id)
-    )
-    receipt_from_db.total_amount = (
-        float(receipt_from_db.total_amount) + float(good_from_db.price) * count
-    )
-
-    await db.commit()
-    await db.refresh(good_from_db)
 
-    return good_from_db.name
+    result = []
+    for good_id, count in counts.items():
+        if not (good := goods.get(good_id)):
+            result.append(
+                ReceiptLineResult(good_id=good_id, count=count, status="not_found")
+            )
+        elif good_id in reserved:
+            result.append(
+                ReceiptLineResult(
+                    good_id=good_id, count=count, status="added", name=good.name
+                )
+            )
+        else:
+            result.append(
+                ReceiptLineResult(
+                    good_id=good_id,
+                    count=count,
+                    status="insufficient_stock",
+                    name=good.name,
+                    available=good.stock_quantity,
+                )
+            )
+
+    return ReceiptItemsBatchResponse(
+        receipt_id=receipt_id, total_amount=total_amount or 0.0, lines=result
+    )
 
 
 async def get_all_receipts(
@@ -93,11 +162,8 @@ async def get_all_receipts(
 
     await check_permission_owner_or_seller(current_user)
 
-    if not (
-        receipts_from_db := await db.scalar(
-            select(Receipt).offset(pagination.offset).limit(pagination.size)
-        )
-    ):
+    receipts_from_db = await paginate(db, select(Receipt), pagination, [Receipt.id])
+    if not (pagination.is_keyset or receipts_from_db):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Чеков не создано"
         )
@@ -105,9 +171,16 @@ async def get_all_receipts(
 
 
 async def check_receipt_status(db, receipt_id):
-    receipt_from_db = await db.scalar(select(Receipt).where(Receipt.id == receipt_id))
+    receipt_status = await db.scalar(
+        select(Receipt.status).where(Receipt.id == receipt_id)
+    )
+
+    if receipt_status is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Чека с таким id - нет"
+        )
 
-    if receipt_from_db.status == "closed":
+    if receipt_status == "closed":
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Чек закрыт")
 
 
@@ -133,7 +206,9 @@ async def delete_product_from_receipt(
     receipt_from_db: Receipt = await check_receipt_in_db(db, receipt_id, current_user)
 
     product_from_db: ReceiptItem = await db.scalar(
-        select(ReceiptItem).where(ReceiptItem.product_id == product_id)
+        select(ReceiptItem).where(
+            ReceiptItem.receipt_id == receipt_id, ReceiptItem.product_id == product_id
+        )
     )
     if not product_from_db:
         raise HTTPException(
@@ -146,20 +221,14 @@ async def delete_product_from_receipt(
     product_from_db.quantity -= count
 
     if product_from_db.quantity <= 0:
-        await db.execute(
-            delete(ReceiptItem).where(ReceiptItem.product_id == product_id)
-        )
+        await db.delete(product_from_db)
 
     receipt_from_db.total_amount = (
         float(receipt_from_db.total_amount) - product_from_db.price_at_sale * count
     )
 
     # вовзрат в товаров в БД
-    await db.execute(
-        update(Article)
-        .where(Article.id == product_id)
-        .values(stock_quantity=Article.stock_quantity + product_from_db.quantity)
-    )
+    await release_stock(db, product_id, count)
     await db.commit()
     return True
 
@@ -187,48 +256,110 @@ async def del_items_from_receipt_items_table(receipt_id: int, db: AsyncSession):
 async def receipt_from_sales_table(db: AsyncSession, receipt_id):
     if receipt := await db.scalar(select(Sales).where(Sales.receipt_id == receipt_id)):
         return receipt
-    raise HTTPException(status=status.HTTP_404_NOT_FOUND, detail="Такого чека нет!")
+    raise HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND, detail="Такого чека нет!"
+    )
 
 
 async def del_items_from_sales_table(
-    product_id: int, quantity: int, db: AsyncSession, receipt_id: int
+    product_id: int, quantity: int, db: AsyncSession, receipt_id: int, user_id: int
 ):
-    sale_prod: Sales = await db.scalar(
-        select(Sales).where(
-            Sales.receipt_id == receipt_id and Sales.good_id == product_id
-        )
-    )
+    """Уменьшает строку чека в sales на quantity и записывает возврат
 
-    sale_prod.quantity -= quantity
-    if sale_prod.quantity == 0:
-        await db.delete(sale_prod)
+    Количество проверяется в самом UPDATE: параллельный возврат той же
+    строки дождется блокировки и не пройдет условие, если товара уже не
+    хватает. Коммит - на стороне вызывающего, вместе с возвратом остатка.
+    """
 
-    await db.commit()
+    unit_price = func.coalesce(Sales.price_at_sale, Sales.total_price / Sales.quantity)
+    sale = (
+        await db.execute(
+            update(Sales)
+            .where(
+                Sales.receipt_id == receipt_id,
+                Sales.good_id == product_id,
+                Sales.quantity >= quantity,
+            )
+            .values(
+                quantity=Sales.quantity - quantity,
+                total_price=Sales.total_price - unit_price * quantity,
+                price_at_sale=unit_price,
+            )
+            .returning(
+                Sales.id,
+                Sales.receipt_id,
+                Sales.good_id,
+                Sales.user_id,
+                Sales.sales_date,
+                Sales.quantity,
+                Sales.price_at_sale,
+                Sales.cost_at_sale,
+            )
+        )
+    ).first()
+    if sale is None:
+        if await db.scalar(
+            select(Sales.id).where(
+                Sales.receipt_id == receipt_id, Sales.good_id == product_id
+            )
+        ):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Слишком много товаров",
+            )
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Такого товара в чеке - нет",
+        )
+
+    refund_amount = sale.price_at_sale * quantity
+    refund_id = await db.scalar(
+        insert(Refund)
+        .values(
+            receipt_id=receipt_id,
+            good_id=product_id,
+            user_id=user_id,
+            quantity=quantity,
+            amount=refund_amount,
+        )
+        .returning(Refund.id)
+    )
+    await subtract_refund_from_rollups(
+        db,
+        sale,
+        quantity,
+        refund_amount,
+        removed=sale.quantity == 0,
+        refund_id=refund_id,
+    )
+    if sale.quantity == 0:
+        await db.execute(
+            delete(Sales).where(
+                Sales.id == sale.id, Sales.sales_date == sale.sales_date
+            )
+        )
 
 
 async def get_all_sold_receipts(
     db: AsyncSession, current_user: dict, pagination: PaginationParams
 ):
-    query = (
-        select(Receipt)
-        .where(Receipt.status == "closed")
-        .order_by(Receipt.created_at.desc())  # Сортировка по дате
-        .limit(pagination.size)
-        .offset(pagination.offset)
+    # Сортировка по дате, id - для однозначного порядка чеков с одинаковой датой
+    return await paginate(
+        db,
+        select(Receipt).where(Receipt.status == "closed"),
+        pagination,
+        [Receipt.created_at, Receipt.id],
+        descending=True,
     )
-    result = await db.scalars(query)
-    receipts = result.all()
-
-    return receipts
 
 
 async def get_user_receipts_from_db(
     db: AsyncSession, current_user: dict, pagination: PaginationParams
 ):
-    results = await db.scalars(
-        select(Receipt)
-        .limit(pagination.size)
-        .offset(pagination.offset)
-        .where(Receipt.user_id == current_user.get("id"))
+    return await paginate(
+        db,
+        select(Receipt).where(Receipt.user_id == current_user.get("id")),
+        pagination,
+        [Receipt.id],
+        descending=True,
     )
-    return results.all()
@@ -0,0 +1,106 @@
+from datetime import datetime, timedelta
+
+from fastapi import HTTPException, status
+from sqlalchemy import delete, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import IdempotencyKey, Receipt, Sales
+
+
+async def claim_idempotency_key(
+    db: AsyncSession, user_id: int, key: str, request_hash: str
+) -> dict | None:
+    """Занимает ключ идемпотентности в текущей транзакции
+
+    Если ключ занят незакоммиченной транзакцией, INSERT ... ON CONFLICT ждет
+    ее завершения, поэтому параллельные повторы выполняются по очереди.
+
+    Returns:
+        dict | None: None, если ключ новый, иначе сохраненный ответ
+    """
+
+    claimed = await db.scalar(
+        insert(IdempotencyKey)
+        .values(user_id=user_id, key=key, request_hash=request_hash)
+        .on_conflict_do_nothing(
+            index_elements=[IdempotencyKey.user_id, IdempotencyKey.key]
+        )
+        .returning(IdempotencyKey.id)
+    )
+    if claimed is not None:
+        return None
+
+    stored = (
+        await db.execute(
+            select(IdempotencyKey.request_hash, IdempotencyKey.response).where(
+                IdempotencyKey.user_id == user_id, IdempotencyKey.key == key
+            )
+        )
+    ).first()
+    if stored.request_hash != request_hash:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Ключ идемпотентности уже использован для другого запроса",
+        )
+    return stored.response
+
+
+async def save_idempotent_response(
+    db: AsyncSession, user_id: int, key: str, response: dict
+):
+    await db.execute(
+        update(IdempotencyKey)
+        .where(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+        .values(response=response)
+    )
+
+
+async def purge_idempotency_keys(db: AsyncSession, user_id: int, ttl: timedelta):
+    """Удаляет ключи пользователя старше ttl - повторов после этого не ждем"""
+
+    await db.execute(
+        delete(IdempotencyKey).where(
+            IdempotencyKey.user_id == user_id,
+            IdempotencyKey.created_at < datetime.now() - ttl,
+        )
+    )
+
+
+async def insert_offline_receipts(
+    db: AsyncSession, user_id: int, receipts: list[dict]
+) -> dict[str, int]:
+    """Вставляет закрытые офлайн-чеки, пропуская уже выгруженные client_uuid
+
+    Returns:
+        dict[str, int]: client_uuid - id только что созданных чеков
+    """
+
+    created = await db.execute(
+        insert(Receipt)
+        .values(
+            [
+                {**receipt, "user_id": user_id, "status": "closed"}
+                for receipt in receipts
+            ]
+        )
+        .on_conflict_do_nothing(index_elements=[Receipt.client_uuid])
+        .returning(Receipt.client_uuid, Receipt.id)
+    )
+    return dict(created.all())
+
+
+async def get_receipts_by_client_uuid(
+    db: AsyncSession, client_uuids: list[str]
+) -> dict[str, tuple[int, float]]:
+    rows = await db.execute(
+        select(Receipt.client_uuid, Receipt.id, Receipt.total_amount).where(
+            Receipt.client_uuid.in_(client_uuids)
+        )
+    )
+    return {client_uuid: (receipt_id, total) for client_uuid, receipt_id, total in rows}
+
+
+async def insert_offline_sales(db: AsyncSession, sales: list[dict]):
+    if sales:
+        await db.execute(insert(Sales).values(sales))
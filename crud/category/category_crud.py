@@ -1,10 +1,23 @@
 from fastapi import HTTPException, status
-from sqlalchemy import select, update, delete
+from sqlalchemy import delete, exists, func, or_, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from models import Category
+from backend.cache import as_dict, catalogue_cache
+from crud.pagination import paginate
+from models import (
+    Article,
+    BackgroundJob,
+    Category,
+    GoodStat,
+    Notification,
+    Purchase,
+    ReceiptItem,
+    Refund,
+    Sales,
+)
 from schemas.requests.CategoryRequest import CategoryRequest
 from schemas.requests.pagination import PaginationParams
+from services.category.category_tree import CategoryTree
 
 
 async def category_in_db(db: AsyncSession, category_name: str):
@@ -29,9 +42,14 @@ async def create_category(
             detail="Категория с таким именем уже создана",
         )
     new_category = Category(
-        title=category_from_user.name, parent_id=category_from_user.parent_id
+        title=category_from_user.name,
+        parent_id=category_from_user.parent_id,
+        low_stock_threshold=category_from_user.low_stock_threshold,
     )
     db.add(new_category)
+    catalogue_cache.invalidate_on_commit(
+        db, "category:tree", "category:stock_thresholds"
+    )
     await db.commit()
     return True
 
@@ -39,11 +57,9 @@ async def create_category(
 async def get_categories(db: AsyncSession, pagination: PaginationParams):
     """Возвращает список категорий с нужным оффсетом"""
 
-    categories_from_db = await db.scalars(
-        select(Category).offset(pagination.offset).limit(pagination.size)
-    )
+    result = await paginate(db, select(Category), pagination, [Category.id])
 
-    if not (result := categories_from_db.all()):
+    if not (pagination.is_keyset or result):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Категорий в БД не найдено!"
         )
@@ -54,15 +70,70 @@ async def get_categories(db: AsyncSession, pagination: PaginationParams):
 async def get_category_by_id(category_id: int, db: AsyncSession):
     """Возвращает категорию по id"""
 
-    if not (
-        category := await db.scalar(select(Category).where(Category.id == category_id))
-    ):
+    async def load():
+        if not (
+            category := await db.scalar(
+                select(Category).where(Category.id == category_id)
+            )
+        ):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Категории с таким id не существует!",
+            )
+        return as_dict(category)
+
+    return await catalogue_cache.get_or_load(f"category:{category_id}", load, db)
+
+
+async def get_category_tree(db: AsyncSession) -> CategoryTree:
+    """Дерево всех категорий из кэша; перестраивается после изменения категорий"""
+
+    async def load():
+        rows = await db.execute(select(Category.id, Category.parent_id, Category.title))
+        return CategoryTree(rows.all())
+
+    return await catalogue_cache.get_or_load("category:tree", load, db)
+
+
+async def get_category_stock_thresholds(db: AsyncSession) -> dict[int, int]:
+    """Порог низкого остатка по категориям с учетом наследования
+
+    Категория без своего порога берет порог ближайшего предка; категории,
+    для которых порога нет ни у кого из предков, в результат не попадают.
+    """
+
+    async def load():
+        tree = await get_category_tree(db)
+        own = dict(
+            (
+                await db.execute(
+                    select(Category.id, Category.low_stock_threshold).where(
+                        Category.low_stock_threshold.is_not(None)
+                    )
+                )
+            ).all()
+        )
+        thresholds = {}
+        # в порядке обхода в глубину родитель идет раньше потомков
+        for category_id in tree.order:
+            threshold = own.get(category_id, thresholds.get(tree.parents[category_id]))
+            if threshold is not None:
+                thresholds[category_id] = threshold
+        return thresholds
+
+    return await catalogue_cache.get_or_load("category:stock_thresholds", load, db)
+
+
+async def get_category_subtree(
+    db: AsyncSession, root_id: int | None = None, depth: int | None = None
+) -> list[dict]:
+    tree = await get_category_tree(db)
+    if root_id is not None and root_id not in tree:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Категории с таким id не существует!",
         )
-
-    return category
+    return tree.as_nested(root_id, depth)
 
 
 async def put_category_by_id(
@@ -79,29 +150,109 @@ async def put_category_by_id(
     await db.execute(
         update(Category)
         .where(Category.id == category_id)
-        .values(parent_id=category.parent_id, title=category.name)
+        .values(
+            parent_id=category.parent_id,
+            title=category.name,
+            low_stock_threshold=category.low_stock_threshold,
+        )
+    )
+    catalogue_cache.invalidate_on_commit(
+        db,
+        f"category:{category_id}",
+        "category:tree",
+        "category:stock_thresholds",
+        prefixes=("goods:category:",),
     )
     await db.commit()
     return True
 
 
-async def delete_category(
-    db: AsyncSession,
-    category_id: int,
-    current_user: dict,
-):
-    if not (current_user.get("is_owner")):
+async def get_job(db: AsyncSession, job_id: int) -> dict:
+    if not (
+        job := await db.scalar(select(BackgroundJob).where(BackgroundJob.id == job_id))
+    ):
         raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="У вас нет доступа к этой операции!",
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Задача не найдена",
         )
+    return as_dict(job)
 
-    if not await get_category_by_id(category_id, db):
-        return True
 
-    await db.execute(delete(Category).where(Category.id == category_id))
-    await db.commit()
-    return True
+async def count_goods_in_categories(db: AsyncSession, category_ids: list[int]) -> int:
+    return await db.scalar(
+        select(func.count(Article.id)).where(Article.category_id.in_(category_ids))
+    )
+
+
+# ссылки на товар без ondelete: товар с такой историей удалить нельзя
+GOOD_HISTORY = (
+    Sales.good_id,
+    Refund.good_id,
+    ReceiptItem.product_id,
+    Purchase.good_id,
+    GoodStat.good_id,
+)
+
+
+async def goods_have_history(db: AsyncSession, category_ids: list[int]) -> bool:
+    """Есть ли у товаров категорий продажи, возвраты, строки чеков и т.п."""
+
+    goods = select(Article.id).where(Article.category_id.in_(category_ids))
+    return await db.scalar(
+        select(or_(*(exists().where(column.in_(goods)) for column in GOOD_HISTORY)))
+    )
+
+
+async def remove_goods_batch(
+    db: AsyncSession,
+    category_ids: list[int],
+    batch_size: int,
+    move_to: int | None = None,
+) -> int:
+    """Переносит в move_to или удаляет до batch_size товаров из категорий"""
+
+    batch = (
+        select(Article.id)
+        .where(Article.category_id.in_(category_ids))
+        .limit(batch_size)
+        .scalar_subquery()
+    )
+    if move_to is not None:
+        statement = (
+            update(Article)
+            .where(Article.id.in_(batch))
+            .values(category_id=move_to)
+            .returning(Article.id)
+        )
+    else:
+        await db.execute(
+            update(Notification)
+            .where(Notification.good_id.in_(batch))
+            .values(good_id=None)
+        )
+        statement = delete(Article).where(Article.id.in_(batch)).returning(Article.id)
+
+    processed = (await db.scalars(statement)).all()
+    catalogue_cache.invalidate_on_commit(
+        db, *(f"good:{good_id}" for good_id in processed), prefixes=("goods:",)
+    )
+    return len(processed)
+
+
+async def delete_categories_batch(db: AsyncSession, category_ids: list[int]) -> int:
+    """Удаляет категории, в которых уже нет товаров"""
+
+    processed = len(
+        (
+            await db.scalars(
+                delete(Category)
+                .where(Category.id.in_(category_ids))
+                .returning(Category.id)
+            )
+        ).all()
+    )
+    catalogue_cache.invalidate_on_commit(db, prefixes=("category:", "goods:category:"))
+    return processed
 
 
 async def sell_receipt(receipt_id: int, current_user: dict, db: AsyncSession): ...
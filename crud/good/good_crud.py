@@ -1,17 +1,57 @@
 from datetime import datetime
 
 from fastapi import HTTPException, status
-from sqlalchemy import select, update, func
+from sqlalchemy import delete, literal, literal_column, or_, select, update, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from models import Category, Sales
+from backend.cache import as_dict, catalogue_cache
+from crud.category.category_crud import get_category_tree
+from crud.pagination import keyset_page
+from crud.statistic.statistic_crud import get_sales_totals
+from crud.stock.stock_crud import EVENT_COLUMNS, change_stock
+from models import Category, Notification
 from models.article import Article
 from schemas.requests.good_from_user import GoodFromUser
 from schemas.response.good_statistic import GoodStat
+from schemas.response.page import Page
+from services.search.ngram_index import NGramIndex
+from services.stock.stock_events import publish_on_commit, stock_event
 
 
-async def get_goods_by_name(db: AsyncSession, name: str):
-    data = await db.scalar(select(Article).where(Article.name.ilike(f"%{name}%")))
+async def get_goods_by_name(db: AsyncSession, name: str, limit: int = 10):
+    """Ищет товары по части имени с учетом опечаток
+
+    В Postgres поиск идет по GIN-индексу pg_trgm: подстрока или похожее
+    слово, сначала совпадения по началу названия, затем по похожести.
+    Для остальных баз используется триграммный индекс в памяти.
+    """
+
+    if db.bind.dialect.name == "postgresql":
+        rank = func.greatest(
+            func.similarity(Article.name, name),
+            func.word_similarity(name, Article.name),
+        )
+        data = await db.scalars(
+            select(Article)
+            .where(
+                or_(
+                    Article.name.icontains(name, autoescape=True),
+                    literal(name).op("<%")(Article.name),
+                )
+            )
+            .order_by(
+                Article.name.istartswith(name, autoescape=True).desc(),
+                rank.desc(),
+                Article.name,
+            )
+            .limit(limit)
+        )
+        data = [as_dict(good) for good in data.all()]
+    else:
+        data = await search_goods_in_memory(db, name, limit)
+
     if not data:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -20,14 +60,31 @@ async def get_goods_by_name(db: AsyncSession, name: str):
     return data
 
 
-async def get_good_by_id(good_id: int, db: AsyncSession):
-    good_from_db = await db.scalar(select(Article).where(Article.id == good_id))
-    if not good_from_db:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Товар в БД не найден",
-        )
-    return good_from_db
+async def search_goods_in_memory(db: AsyncSession, name: str, limit: int):
+    async def load():
+        goods_from_db = await db.execute(select(Article.id, Article.name))
+        return NGramIndex({good.id: good.name for good in goods_from_db})
+
+    index = await catalogue_cache.get_or_load("goods:search_index", load, db)
+    if not (found := index.search(name, limit)):
+        return []
+
+    goods_from_db = await db.scalars(select(Article).where(Article.id.in_(found)))
+    goods = {good.id: as_dict(good) for good in goods_from_db}
+    return [goods[good_id] for good_id in found if good_id in goods]
+
+
+async def get_good_by_id(good_id: int, db: AsyncSession) -> dict:
+    async def load():
+        good_from_db = await db.scalar(select(Article).where(Article.id == good_id))
+        if not good_from_db:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Товар в БД не найден",
+            )
+        return as_dict(good_from_db)
+
+    return await catalogue_cache.get_or_load(f"good:{good_id}", load, db)
 
 
 async def add_good(good: GoodFromUser, db: AsyncSession):
@@ -55,10 +112,21 @@ async def add_good(good: GoodFromUser, db: AsyncSession):
         price=good.price,
         cost_price=good.cost_price,
         stock_quantity=good.stock_quantity,
+        low_stock_threshold=good.low_stock_threshold,
         created_at=datetime.now(),
     )
 
     db.add(good_for_db)
+    await db.flush()
+    catalogue_cache.invalidate_on_commit(db, prefixes=("goods:",))
+    publish_on_commit(
+        db,
+        [
+            stock_event(
+                good_for_db.id, good.category_id, good.stock_quantity, good.price
+            )
+        ],
+    )
     await db.commit()
 
     return {
@@ -67,17 +135,98 @@ async def add_good(good: GoodFromUser, db: AsyncSession):
     }
 
 
-async def get_all_goods(db: AsyncSession, skip, limit):
+# колонки, которые импорт всегда перезаписывает у существующего товара
+UPSERT_COLUMNS = ("category_id", "price", "cost_price", "stock_quantity")
+
+
+async def upsert_goods_batch(
+    db: AsyncSession, goods: list[GoodFromUser]
+) -> tuple[int, int]:
+    """Вставляет или обновляет пачку товаров одним INSERT ... ON CONFLICT (name)
+
+    Имена в пачке должны быть уникальны. Порог низкого остатка обновляется
+    только у строк, где он передан: файл без этой колонки не сбрасывает
+    настроенные пороги (такие строки идут отдельным запросом).
+    Возвращает (вставлено, обновлено).
+    """
+
+    with_threshold = [
+        good for good in goods if "low_stock_threshold" in good.model_fields_set
+    ]
+    without_threshold = [
+        good for good in goods if "low_stock_threshold" not in good.model_fields_set
+    ]
+
+    rows = []
+    for part, columns in (
+        (with_threshold, UPSERT_COLUMNS + ("low_stock_threshold",)),
+        (without_threshold, UPSERT_COLUMNS),
+    ):
+        if not part:
+            continue
+        statement = insert(Article).values(
+            [{**good.model_dump(), "created_at": datetime.now()} for good in part]
+        )
+        statement = statement.on_conflict_do_update(
+            index_elements=[Article.name],
+            set_={column: statement.excluded[column] for column in columns},
+        ).returning(literal_column("xmax = 0"), *EVENT_COLUMNS)
+        rows += (await db.execute(statement)).all()
+
+    inserted = sum(row[0] for row in rows)
+    catalogue_cache.invalidate_on_commit(
+        db, *(f"good:{row.id}" for row in rows), prefixes=("goods:",)
+    )
+    publish_on_commit(db, [stock_event(*row[1:]) for row in rows])
+    return inserted, len(goods) - inserted
+
+
+async def get_goods_by_ids(db: AsyncSession, good_ids: list[int]) -> list[dict]:
+    """Товары по списку id в том же порядке
+
+    Берутся из записей good:{id} кэша, промахи загружаются одним запросом.
+    Списки товаров кэшируют только id, поэтому изменение остатка сбрасывает
+    одну запись товара, а не все списки. Удаленные товары пропускаются.
+    """
+
+    async def load(keys: list[str]) -> dict[str, dict]:
+        ids = [int(key.removeprefix("good:")) for key in keys]
+        goods_from_db = await db.scalars(select(Article).where(Article.id.in_(ids)))
+        return {f"good:{good.id}": as_dict(good) for good in goods_from_db}
+
+    keys = [f"good:{good_id}" for good_id in good_ids]
+    goods = await catalogue_cache.get_many_or_load(keys, load, db)
+    return [goods[key] for key in keys if key in goods]
+
+
+async def get_all_goods(db: AsyncSession, skip, limit, cursor: str | None = None):
     """
     Возвращает список из всех goods в БД
+
+    С cursor возвращает страницу по курсору (id > последнего id) вместо skip
     """
 
-    data = await db.scalars(select(Article).offset(skip).limit(limit))
-    if not (goods_from_db := data.all()):
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="База данных пуста"
+    async def load():
+        if cursor is not None:
+            page = await keyset_page(db, select(Article), limit, cursor, [Article.id])
+            return [good["id"] for good in page.items], page.next_cursor
+
+        good_ids = await db.scalars(
+            select(Article.id).order_by(Article.id).offset(skip).limit(limit)
         )
-    return goods_from_db
+        if not (good_ids := good_ids.all()):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="База данных пуста"
+            )
+        return good_ids, None
+
+    good_ids, next_cursor = await catalogue_cache.get_or_load(
+        f"goods:all:{skip}:{limit}:{cursor}", load, db
+    )
+    goods = await get_goods_by_ids(db, good_ids)
+    if cursor is not None:
+        return Page(items=goods, next_cursor=next_cursor)
+    return goods
 
 
 async def update_good(good_id: int, good: GoodFromUser, db: AsyncSession):
@@ -97,29 +246,63 @@ async def update_good(good_id: int, good: GoodFromUser, db: AsyncSession):
             detail="Категории с таким id не существует",
         )
 
-    await db.execute(
-        update(Article)
-        .where(Article.id == good_id)
-        .values(
-            name=good.name,
-            category_id=good.category_id,
-            price=good.price,
-            cost_price=good.cost_price,
-            stock_quantity=good.stock_quantity,
+    row = (
+        await db.execute(
+            update(Article)
+            .where(Article.id == good_id)
+            .values(
+                name=good.name,
+                category_id=good.category_id,
+                price=good.price,
+                cost_price=good.cost_price,
+                stock_quantity=good.stock_quantity,
+                low_stock_threshold=good.low_stock_threshold,
+            )
+            .returning(*EVENT_COLUMNS)
         )
-    )
+    ).first()
+    catalogue_cache.invalidate_on_commit(db, f"good:{good_id}", prefixes=("goods:",))
+    if row is not None:
+        publish_on_commit(db, [stock_event(*row)])
     await db.commit()
     return good.name
 
 
 async def delete_product_by_id(product_id: int, db: AsyncSession):
-    if not (good := await get_good_by_id(product_id, db)):
+    """Удаляет товар без истории
+
+    Уведомления о товаре отвязываются, как раньше при удалении через ORM.
+    Продажи, возвраты, строки чеков, закупки и агрегаты ссылаются на товар
+    без ondelete - такой товар не удаляется, ответ 409.
+    """
+
+    await db.execute(
+        update(Notification)
+        .where(Notification.good_id == product_id)
+        .values(good_id=None)
+    )
+    try:
+        row = (
+            await db.execute(
+                delete(Article)
+                .where(Article.id == product_id)
+                .returning(*EVENT_COLUMNS)
+            )
+        ).first()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Товар есть в продажах, чеках или возвратах, удалить его нельзя",
+        )
+    if not row:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Товар в БД не найден",
         )
 
-    await db.delete(good)
+    catalogue_cache.invalidate_on_commit(db, f"good:{product_id}", prefixes=("goods:",))
+    publish_on_commit(db, [stock_event(*row, deleted=True)])
     await db.commit()
     return {
         "message": "Товар успешно удален",
@@ -133,47 +316,80 @@ async def get_products_by_category(
     max_price,
     min_stock_quantity,
     max_stock_quantity,
+    include_descendants: bool = False,
 ):
-    if not (
-        get_category := await db.scalar(
-            select(Category).where(Category.id == category_id)
-        )
-    ):
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Такой категории не существует",
-        )
-
-    query = select(Article).where(Article.category_id == category_id)
+    """Товары категории; с include_descendants - и всех ее подкатегорий
 
-    if min_price is not None:
-        query = query.where(Article.price >= min_price)
-    if max_price is not None:
-        query = query.where(Article.price <= max_price)
-    if min_stock_quantity is not None:
-        query = query.where(Article.stock_quantity >= min_stock_quantity)
-    if max_stock_quantity is not None:
-        query = query.where(Article.stock_quantity <= max_stock_quantity)
-
-    products_from_db = await db.scalars(query)
+    id подкатегорий берутся из дерева категорий в кэше, так что товары
+    поддерева выбираются одним запросом. В кэше хранится только список id;
+    выборка с фильтром по остатку не кэшируется - ее состав меняет каждая
+    продажа.
+    """
 
-    if not (products_from_db := products_from_db.all()):
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Такие товары не найдены",
+    async def load():
+        if include_descendants:
+            tree = await get_category_tree(db)
+            if category_id not in tree:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Такой категории не существует",
+                )
+            query = select(Article.id).where(
+                Article.category_id.in_(tree.descendants(category_id))
+            )
+        else:
+            if not (
+                get_category := await db.scalar(
+                    select(Category).where(Category.id == category_id)
+                )
+            ):
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Такой категории не существует",
+                )
+            query = select(Article.id).where(Article.category_id == category_id)
+
+        if min_price is not None:
+            query = query.where(Article.price >= min_price)
+        if max_price is not None:
+            query = query.where(Article.price <= max_price)
+        if min_stock_quantity is not None:
+            query = query.where(Article.stock_quantity >= min_stock_quantity)
+        if max_stock_quantity is not None:
+            query = query.where(Article.stock_quantity <= max_stock_quantity)
+
+        good_ids = await db.scalars(query.order_by(Article.id))
+
+        if not (good_ids := good_ids.all()):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Такие товары не найдены",
+            )
+
+        return good_ids
+
+    if min_stock_quantity is not None or max_stock_quantity is not None:
+        good_ids = await load()
+    else:
+        key = (
+            f"goods:category:{category_id}:{include_descendants}:"
+            f"{min_price}:{max_price}"
         )
-
-    return products_from_db
+        good_ids = await catalogue_cache.get_or_load(key, load, db)
+    return await get_goods_by_ids(db, good_ids)
 
 
 async def update_stock_quantity(good_id: int, quantity_change: int, db: AsyncSession):
-    good = await db.scalar(select(Article).where(Article.id == good_id))
-    if not good:
+    if await change_stock(db, good_id, quantity_change) is None:
+        if not await db.scalar(select(Article.id).where(Article.id == good_id)):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Товар не найден",
+            )
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Товар не найден",
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Остаток товара не может стать отрицательным",
         )
-    good.stock_quantity += quantity_change
     await db.commit()
 
 
@@ -193,27 +409,15 @@ async def get_prod_stat(
     # 2) Берём товар
     product = await get_good_by_id(product_id, db)
 
-    # 3) Запрос агрегатов
-    stmt = select(
-        func.count().label("sales_count"),
-        func.coalesce(func.sum(Sales.total_price), 0).label("revenue"),
-        func.coalesce(func.sum(Sales.quantity * product.cost_price), 0).label(
-            "total_cost"
-        ),
-    ).where(
-        Sales.good_id == product_id,
-        Sales.sales_date.between(start_date, end_date),
-    )
-    result = await db.execute(stmt)
-    row = result.mappings().first()
-    print(row)
-    profit = float(row["revenue"]) - float(row["total_cost"])
+    # 3) Агрегаты: дневные итоги + сырые продажи за неполные дни
+    totals = await get_sales_totals(db, start_date, end_date, good_id=product_id)
+    profit = totals["revenue"] - totals["cost"]
 
     return GoodStat(
         product_id=product_id,
-        product_name=product.name,
-        product_sales_count=row["sales_count"],
-        product_revenue=row["revenue"],
+        product_name=product["name"],
+        product_sales_count=totals["sales_count"],
+        product_revenue=totals["revenue"],
         profit=profit,
-        product_quantity=product.stock_quantity,
+        product_quantity=product["stock_quantity"],
     )
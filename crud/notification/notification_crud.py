@@ -0,0 +1,23 @@
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.cache import as_dict
+from models import Notification
+
+
+async def get_notifications_after(
+    db: AsyncSession, after_id: int, limit: int
+) -> list[dict]:
+    """Уведомления с id больше after_id в порядке создания"""
+
+    notifications = await db.scalars(
+        select(Notification)
+        .where(Notification.id > after_id)
+        .order_by(Notification.id)
+        .limit(limit)
+    )
+    return [as_dict(notification) for notification in notifications]
+
+
+async def get_latest_notification_id(db: AsyncSession) -> int:
+    return await db.scalar(select(func.coalesce(func.max(Notification.id), 0)))
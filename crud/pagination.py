@@ -0,0 +1,118 @@
+import base64
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from fastapi import HTTPException, status
+from sqlalchemy import Column, Select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.cache import as_dict
+from schemas.requests.pagination import PaginationParams
+from schemas.response.page import Page
+
+
+def encode_cursor(values: list) -> str:
+    """Упаковывает значения ключа сортировки последней строки в непрозрачный курсор"""
+
+    raw = json.dumps(
+        [
+            value.isoformat() if isinstance(value, datetime) else value
+            for value in values
+        ]
+    )
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _cursor_value(value, column: Column):
+    """Значение курсора, приведенное к типу колонки; ValueError - если тип не тот"""
+
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        return value
+
+    if issubclass(python_type, date):
+        if not isinstance(value, str):
+            raise ValueError
+        parse = datetime if issubclass(python_type, datetime) else date
+        return parse.fromisoformat(value)
+    if python_type in (float, Decimal) and type(value) in (int, float):
+        return python_type(str(value))
+    # bool - подкласс int, но в целочисленную колонку не подходит
+    if type(value) is bool and python_type is not bool:
+        raise ValueError
+    if not isinstance(value, python_type):
+        raise ValueError
+    return value
+
+
+def decode_cursor(cursor: str, columns: list[Column]) -> list:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError
+        return [_cursor_value(value, column) for value, column in zip(values, columns)]
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Неверный курсор"
+        )
+
+
+async def paginate(
+    db: AsyncSession,
+    query: Select,
+    pagination: PaginationParams,
+    order_by: list[Column],
+    descending: bool = False,
+):
+    """Выполняет запрос постранично в порядке order_by
+
+    В режиме курсора следующая страница начинается строго после ключа
+    (order_by) последней строки - это диапазонное сканирование индекса
+    по тем же колонкам вместо OFFSET. Без курсора работает старый режим
+    со страницами и возвращается просто список.
+    """
+
+    ordering = [column.desc() if descending else column for column in order_by]
+
+    if not pagination.is_keyset:
+        result = await db.scalars(
+            query.order_by(*ordering).offset(pagination.offset).limit(pagination.size)
+        )
+        return result.all()
+
+    return await keyset_page(
+        db, query, pagination.size, pagination.cursor, order_by, descending
+    )
+
+
+async def keyset_page(
+    db: AsyncSession,
+    query: Select,
+    size: int,
+    cursor: str,
+    order_by: list[Column],
+    descending: bool = False,
+) -> Page:
+    """Страница из size строк после курсора (пустой курсор - первая страница)"""
+
+    ordering = [column.desc() if descending else column for column in order_by]
+
+    if cursor:
+        key = tuple_(*order_by)
+        after = tuple_(*decode_cursor(cursor, order_by))
+        query = query.where(key < after if descending else key > after)
+
+    result = await db.scalars(query.order_by(*ordering).limit(size + 1))
+    rows = result.all()
+
+    next_cursor = None
+    if len(rows) > size:
+        rows = rows[:size]
+        next_cursor = encode_cursor(
+            [getattr(rows[-1], column.key) for column in order_by]
+        )
+
+    return Page(items=[as_dict(row) for row in rows], next_cursor=next_cursor)
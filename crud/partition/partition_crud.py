@@ -0,0 +1,150 @@
+import gzip
+import os
+import re
+from datetime import date, datetime
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+# секционированные по месяцам таблицы и их ключ секционирования
+PARTITIONED = {"sales": "sales_date"}
+
+
+def month_start(moment: date) -> date:
+    return date(moment.year, moment.month, 1)
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_p{month:%Y_%m}"
+
+
+def default_partition_name(table: str) -> str:
+    return f"{table}_default"
+
+
+def partition_month(table: str, name: str) -> date | None:
+    """Месяц секции по ее имени; None для секции по умолчанию"""
+
+    matched = re.fullmatch(rf"{table}_p(\d{{4}})_(\d{{2}})", name)
+    if matched is None:
+        return None
+    return date(int(matched[1]), int(matched[2]), 1)
+
+
+def months_between(start: datetime, end: datetime) -> list[date]:
+    """Месяцы, которые задевает период [start, end]"""
+
+    months = [month_start(start)]
+    while months[-1] < month_start(end):
+        months.append(add_months(months[-1], 1))
+    return months
+
+
+async def get_partitions(conn: AsyncConnection, table: str) -> dict[str, date | None]:
+    """Присоединенные секции таблицы: имя - месяц (None у секции по умолчанию)"""
+
+    rows = await conn.execute(
+        text(
+            "SELECT c.relname FROM pg_inherits i"
+            " JOIN pg_class c ON c.oid = i.inhrelid"
+            " WHERE i.inhparent = CAST(:table AS regclass)"
+            " ORDER BY c.relname"
+        ),
+        {"table": table},
+    )
+    return {name: partition_month(table, name) for name in rows.scalars()}
+
+
+async def oldest_partition_month(conn: AsyncConnection, table: str) -> date | None:
+    months = [month for month in (await get_partitions(conn, table)).values() if month]
+    return min(months, default=None)
+
+
+async def create_partition(conn: AsyncConnection, table: str, month: date) -> int:
+    """Создает секцию месяца и переносит в нее строки из секции по умолчанию
+
+    CREATE TABLE ... PARTITION OF не проходит, если в секции по умолчанию уже
+    есть строки этого месяца, поэтому секция собирается отдельной таблицей,
+    строки переносятся DELETE ... RETURNING и таблица присоединяется. Индексы
+    родительской таблицы создаются на секции при присоединении. Выполнять в
+    транзакции.
+
+    Returns:
+        int: сколько строк перенесено из секции по умолчанию
+    """
+
+    name = partition_name(table, month)
+    column = PARTITIONED[table]
+    bounds = {"start": month, "end": add_months(month, 1)}
+
+    await conn.execute(
+        text(
+            f"CREATE TABLE {name}"
+            f" (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+        )
+    )
+    moved = await conn.execute(
+        text(
+            f"WITH moved AS (DELETE FROM {default_partition_name(table)}"
+            f" WHERE {column} >= :start AND {column} < :end RETURNING *)"
+            f" INSERT INTO {name} SELECT * FROM moved"
+        ),
+        bounds,
+    )
+    # границы секции - литералы DDL, параметры в ATTACH не принимаются
+    await conn.execute(
+        text(
+            f"ALTER TABLE {table} ATTACH PARTITION {name}"
+            f" FOR VALUES FROM ('{bounds['start']}') TO ('{bounds['end']}')"
+        )
+    )
+    return moved.rowcount
+
+
+async def detach_partition(conn: AsyncConnection, table: str, name: str):
+    """Отсоединяет секцию: запросы к таблице ее больше не видят, данные
+    остаются в отдельной таблице name. Выполнять в транзакции.
+
+    На время команды sales блокируется целиком: DETACH ... CONCURRENTLY
+    postgres не разрешает, пока у таблицы есть секция по умолчанию.
+    """
+
+    await conn.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name}"))
+
+
+async def dump_table(conn: AsyncConnection, name: str, path: str) -> int:
+    """Выгружает таблицу в path (CSV с заголовком, gzip) через COPY TO STDOUT
+
+    Файл пишется во временный и переименовывается после записи, поэтому
+    по пути path не бывает недописанной выгрузки. Загрузить обратно:
+    gunzip -c path | psql -c "COPY name FROM STDIN WITH (FORMAT csv, HEADER)".
+
+    Returns:
+        int: количество выгруженных строк
+    """
+
+    raw = await conn.get_raw_connection()
+    partial = f"{path}.partial"
+    with open(partial, "wb") as file:
+        with gzip.GzipFile(fileobj=file, mode="wb") as archive:
+
+            async def write(chunk: bytes):
+                archive.write(chunk)
+
+            status = await raw.driver_connection.copy_from_table(
+                name, output=write, format="csv", header=True
+            )
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(partial, path)
+    # статус COPY - "COPY <строк>"
+    return int(status.split()[-1])
+
+
+async def drop_table(conn: AsyncConnection, name: str):
+    await conn.execute(text(f"DROP TABLE {name}"))
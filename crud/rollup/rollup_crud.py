@@ -0,0 +1,310 @@
+from datetime import date, datetime, time, timedelta
+
+from sqlalchemy import and_, delete, distinct, exists, func, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.cache import catalogue_cache
+from models import GoodStat, Refund, Sales, SellerStat
+
+# (таблица агрегата, ее ключ, ключ в sales, колонка выручки,
+#  дополнительные колонки агрегата и их выражения по sales)
+ROLLUPS = (
+    (GoodStat, GoodStat.good_id, Sales.good_id, GoodStat.amount, ()),
+    (
+        SellerStat,
+        SellerStat.user_id,
+        Sales.user_id,
+        SellerStat.total_amount,
+        # все строки чека продаются в один момент, поэтому чек попадает
+        # ровно в одни сутки и суммы по чекам за разные дни складываются
+        (("receipts_count", func.count(distinct(Sales.receipt_id))),),
+    ),
+)
+
+
+def as_datetime(moment: date | datetime) -> datetime:
+    if isinstance(moment, datetime):
+        return moment
+    return datetime.combine(moment, time.min)
+
+
+def day_start(moment: datetime) -> datetime:
+    return datetime.combine(moment.date(), time.min)
+
+
+def split_range(
+    start: datetime, end: datetime
+) -> tuple[tuple[datetime, datetime] | None, list[tuple[datetime, datetime, bool]]]:
+    """Делит период [start, end] на полные прошедшие сутки и сырые края
+
+    Полные сутки до сегодняшних берутся из агрегатов, неполные сутки
+    на краях и сегодняшний день - из sales.
+
+    Returns:
+        tuple: [from, to) для агрегатов или None и список (from, to, to включительно)
+    """
+
+    full_from = day_start(start)
+    if full_from < start:
+        full_from += timedelta(days=1)
+    full_to = min(day_start(end), day_start(datetime.now()))
+
+    if full_from >= full_to:
+        return None, [(start, end, True)]
+
+    raw_ranges = [(full_to, end, True)]
+    if start < full_from:
+        raw_ranges.insert(0, (start, full_from, False))
+    return (full_from, full_to), raw_ranges
+
+
+def stats_cache_prefix(end: datetime) -> str:
+    """Префикс кэша рейтингов: периоды, захватывающие сегодня, сбрасываются
+    каждой продажей, прошедшие - только при изменении продаж прошлых дней"""
+
+    return "stat:live:" if end >= day_start(datetime.now()) else "stat:past:"
+
+
+def invalidate_sales_stats(db: AsyncSession, past: bool = True):
+    catalogue_cache.invalidate_on_commit(
+        db, prefixes=("stat:live:", "stat:past:") if past else ("stat:live:",)
+    )
+
+
+def raw_range_condition(
+    raw_ranges: list[tuple[datetime, datetime, bool]], column=Sales.sales_date
+):
+    return [
+        and_(
+            column >= range_from,
+            column <= range_to if to_inclusive else column < range_to,
+        )
+        for range_from, range_to, to_inclusive in raw_ranges
+    ]
+
+
+async def _add_sales_to_rollups(db: AsyncSession, *conditions):
+    period = func.date_trunc("day", Sales.sales_date)
+
+    for model, key, sales_key, amount, extra in ROLLUPS:
+        rows = (
+            select(
+                sales_key,
+                period,
+                func.count(Sales.id),
+                func.sum(Sales.quantity),
+                func.sum(Sales.total_price),
+                func.sum(Sales.quantity * Sales.cost_at_sale),
+                *(expression for _, expression in extra),
+            )
+            .where(*conditions)
+            .group_by(sales_key, period)
+            # строки агрегата блокируются в порядке ключа: параллельные чеки
+            # с общими товарами не блокируют их навстречу друг другу
+            .order_by(sales_key, period)
+        )
+        columns = ["total_sales", "quantity", amount.key, "cost"]
+        columns += [column for column, _ in extra]
+        stmt = insert(model).from_select([key.key, "period", *columns], rows)
+        await db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[key, model.period],
+                set_={
+                    column: getattr(model, column) + stmt.excluded[column]
+                    for column in columns
+                },
+            )
+        )
+
+
+async def _add_refunds_to_seller_stats(db: AsyncSession, *conditions):
+    """Добавляет возвраты в агрегат продавца, оформившего их, за день возврата"""
+
+    period = func.date_trunc("day", Refund.created_at)
+    rows = (
+        select(Refund.user_id, period, func.count(Refund.id), func.sum(Refund.amount))
+        .where(*conditions)
+        .group_by(Refund.user_id, period)
+        .order_by(Refund.user_id, period)
+    )
+    stmt = insert(SellerStat).from_select(
+        ["user_id", "period", "refunds_count", "refund_amount"], rows
+    )
+    await db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[SellerStat.user_id, SellerStat.period],
+            set_={
+                column: getattr(SellerStat, column) + stmt.excluded[column]
+                for column in ("refunds_count", "refund_amount")
+            },
+        )
+    )
+
+
+async def add_receipt_to_rollups(db: AsyncSession, receipt_id: int):
+    """Добавляет проданный чек в дневные агрегаты в той же транзакции"""
+
+    await _add_sales_to_rollups(db, Sales.receipt_id == receipt_id)
+    # чек на кассе продан сегодня
+    invalidate_sales_stats(db, past=False)
+
+
+async def add_receipts_to_rollups(db: AsyncSession, receipt_ids: list[int]):
+    """То же для нескольких чеков одним запросом на агрегат"""
+
+    if receipt_ids:
+        await _add_sales_to_rollups(db, Sales.receipt_id.in_(receipt_ids))
+        # офлайн-чеки могут быть пробиты в прошлые дни
+        invalidate_sales_stats(db)
+
+
+async def subtract_refund_from_rollups(
+    db: AsyncSession,
+    sale: Sales,
+    quantity: int,
+    refund_amount: float,
+    removed: bool,
+    refund_id: int,
+):
+    """Вычитает возврат части строки sales из агрегатов дня продажи
+
+    removed - строка sales удаляется целиком, тогда уменьшается и число продаж,
+    а если это была последняя строка чека - и число чеков продавца, как
+    считает count(distinct receipt_id) при сверке и пересчете.
+    Сам возврат refund_id учитывается у оформившего его продавца за сегодня.
+    """
+
+    receipt_emptied = removed and not await db.scalar(
+        select(exists().where(Sales.receipt_id == sale.receipt_id, Sales.id != sale.id))
+    )
+    refund_cost = (sale.cost_at_sale or 0) * quantity
+    for model, key, sales_key, amount, _ in ROLLUPS:
+        values = {
+            model.total_sales: model.total_sales - int(removed),
+            model.quantity: model.quantity - quantity,
+            amount: amount - refund_amount,
+            model.cost: model.cost - refund_cost,
+        }
+        if model is SellerStat and receipt_emptied:
+            values[SellerStat.receipts_count] = SellerStat.receipts_count - 1
+        await db.execute(
+            update(model)
+            .where(
+                key == getattr(sale, sales_key.key),
+                model.period == day_start(sale.sales_date),
+            )
+            .values(values)
+        )
+    await _add_refunds_to_seller_stats(db, Refund.id == refund_id)
+    invalidate_sales_stats(db, past=sale.sales_date < day_start(datetime.now()))
+
+
+async def backfill_rollups(db: AsyncSession, day_from: date, day_to: date) -> int:
+    """Пересчитывает агрегаты за дни [day_from, day_to) из sales и refunds
+
+    Каждый день пересчитывается в своей короткой транзакции.
+
+    Returns:
+        int: количество пересчитанных дней
+    """
+
+    day = as_datetime(day_from)
+    days = 0
+    while day < as_datetime(day_to):
+        next_day = day + timedelta(days=1)
+        for model, *_ in ROLLUPS:
+            await db.execute(delete(model).where(model.period == day))
+        await _add_sales_to_rollups(
+            db, Sales.sales_date >= day, Sales.sales_date < next_day
+        )
+        await _add_refunds_to_seller_stats(
+            db, Refund.created_at >= day, Refund.created_at < next_day
+        )
+        invalidate_sales_stats(db)
+        await db.commit()
+        day = next_day
+        days += 1
+    return days
+
+
+async def check_rollups(db: AsyncSession, day_from: date, day_to: date) -> list[dict]:
+    """Сверяет агрегаты за дни [day_from, day_to) с sales и refunds
+
+    Returns:
+        list[dict]: расхождения: таблица, ключ, день, значения в агрегате и в sales
+    """
+
+    day_from, day_to = as_datetime(day_from), as_datetime(day_to)
+    period = func.date_trunc("day", Sales.sales_date)
+    mismatches = []
+
+    # (таблица, запрос по сырым данным, запрос по агрегату) с одинаковыми колонками
+    checks = [
+        (
+            model.__tablename__,
+            select(
+                sales_key,
+                period,
+                func.count(Sales.id),
+                func.sum(Sales.quantity),
+                func.sum(Sales.total_price),
+                func.sum(Sales.quantity * Sales.cost_at_sale),
+                *(expression for _, expression in extra),
+            )
+            .where(Sales.sales_date >= day_from, Sales.sales_date < day_to)
+            .group_by(sales_key, period),
+            select(
+                key,
+                model.period,
+                model.total_sales,
+                model.quantity,
+                amount,
+                model.cost,
+                *(getattr(model, column) for column, _ in extra),
+            ).where(model.period >= day_from, model.period < day_to),
+        )
+        for model, key, sales_key, amount, extra in ROLLUPS
+    ]
+    refund_period = func.date_trunc("day", Refund.created_at)
+    checks.append(
+        (
+            f"{SellerStat.__tablename__} (refunds)",
+            select(
+                Refund.user_id,
+                refund_period,
+                func.count(Refund.id),
+                func.sum(Refund.amount),
+            )
+            .where(Refund.created_at >= day_from, Refund.created_at < day_to)
+            .group_by(Refund.user_id, refund_period),
+            select(
+                SellerStat.user_id,
+                SellerStat.period,
+                SellerStat.refunds_count,
+                SellerStat.refund_amount,
+            ).where(SellerStat.period >= day_from, SellerStat.period < day_to),
+        )
+    )
+
+    for table, raw_query, rolled_query in checks:
+        raw_values = {(row[0], row[1]): row[2:] for row in await db.execute(raw_query)}
+        rolled_values = {
+            (row[0], row[1]): row[2:] for row in await db.execute(rolled_query)
+        }
+        empty = (0,) * (len(raw_query.selected_columns) - 2)
+        for row_key in raw_values.keys() | rolled_values.keys():
+            expected = [float(value or 0) for value in raw_values.get(row_key, empty)]
+            actual = [float(value or 0) for value in rolled_values.get(row_key, empty)]
+            if any(abs(left - right) > 0.01 for left, right in zip(expected, actual)):
+                mismatches.append(
+                    {
+                        "table": table,
+                        "key": row_key[0],
+                        "period": row_key[1],
+                        "rollup": actual,
+                        "raw": expected,
+                    }
+                )
+
+    return mismatches
@@ -1,43 +1,81 @@
 import datetime
 
-from fastapi import HTTPException, status
-
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import delete, insert, literal, select, update
 
-from models import ReceiptItem
+from models import Article, Receipt, ReceiptItem
 from models.sales import Sales
 
 
 async def add_items_to_sales_table(
-    items_from_receipt: list[ReceiptItem],
     db: AsyncSession,
     user_id: int,
     receipt_id: int,
-):
-    if not items_from_receipt:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="Корзина пуста"
-        )
+    sales_date: datetime.datetime,
+) -> int:
+    """Переносит строки чека из receipt_items в sales одним запросом
+
+    DELETE ... RETURNING из receipt_items подается прямо в INSERT ... SELECT,
+    поэтому стоимость не зависит от размера корзины. Цена и себестоимость
+    единицы на момент продажи сохраняются в строке sales. Возвращает
+    количество перенесенных строк.
+    """
 
-    # создание новых объектов sales
-    sales_objects = []
-    for item in items_from_receipt:
-        total_price = item.price_at_sale * item.quantity
-        new_sales_obj = Sales(
-            good_id=item.product_id,
-            quantity=item.quantity,
-            user_id=user_id,
-            total_price=total_price,
-            receipt_id=receipt_id,
+    moved = (
+        delete(ReceiptItem)
+        .where(ReceiptItem.receipt_id == receipt_id)
+        .returning(
+            ReceiptItem.product_id, ReceiptItem.quantity, ReceiptItem.price_at_sale
         )
-        sales_objects.append(new_sales_obj)
+        .cte("moved")
+    )
+    result = await db.execute(
+        insert(Sales)
+        .from_select(
+            [
+                "good_id",
+                "quantity",
+                "user_id",
+                "total_price",
+                "receipt_id",
+                "sales_date",
+                "price_at_sale",
+                "cost_at_sale",
+            ],
+            select(
+                moved.c.product_id,
+                moved.c.quantity,
+                literal(user_id),
+                moved.c.price_at_sale * moved.c.quantity,
+                literal(receipt_id),
+                literal(sales_date),
+                moved.c.price_at_sale,
+                Article.cost_price,
+            ).select_from(moved.outerjoin(Article, Article.id == moved.c.product_id)),
+        )
+        .add_cte(moved)
+        .returning(Sales.id)
+    )
+    return len(result.scalars().all())
 
-    db.add_all(sales_objects)
 
-    # Коммит
+async def set_closed_status_for_receipt(
+    db: AsyncSession, receipt_id: int, user_id: int
+) -> datetime.datetime | None:
+    """Закрывает открытый чек пользователя
 
+    Условие status = 'open' в самом UPDATE не дает продать чек дважды:
+    параллельный запрос дождется блокировки строки и не найдет открытый чек.
+    Возвращает время закрытия или None, если закрывать было нечего.
+    """
 
-async def set_closed_status_for_receipt(db, receipt_from_db):
-    receipt_from_db.closed_at = datetime.datetime.now()
-    receipt_from_db.status = "closed"
+    return await db.scalar(
+        update(Receipt)
+        .where(
+            Receipt.id == receipt_id,
+            Receipt.status == "open",
+            Receipt.user_id == user_id,
+        )
+        .values(status="closed", closed_at=datetime.datetime.now())
+        .returning(Receipt.closed_at)
+    )
@@ -1,40 +1,504 @@
 from datetime import datetime, date
 
-from sqlalchemy import select, func
+from sqlalchemy import DateTime, case, distinct, null, select, func, or_, union_all
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from backend.cache import catalogue_cache
+from crud.rollup.rollup_crud import (
+    as_datetime,
+    raw_range_condition,
+    split_range,
+    stats_cache_prefix,
+)
+from models import GoodStat, Refund, SellerStat, User
 from models.article import Article
 from models.sales import Sales
 
 
-async def get_sales_stats(db: AsyncSession, start_date: datetime, end_date: date):
-    result = await db.execute(
-        select(
-            func.sum(Sales.total_price).label("total_revenue"),
-            func.sum(Sales.quantity * Article.cost_price).label("total_cost"),
-            (
-                func.sum(Sales.total_price)
-                - func.sum(Sales.quantity * Article.cost_price)
-            ).label("total_profit"),
-            func.count(Sales.id).label("sales_count"),
-        )
-        .join(Article, Sales.good_id == Article.id)
-        .where(Sales.sales_date >= start_date)
-        .where(Sales.sales_date <= end_date)
-    )
+async def get_sales_totals(
+    db: AsyncSession, start_date: datetime, end_date: datetime, good_id: int = None
+) -> dict:
+    """Выручка, себестоимость и число продаж за период [start_date, end_date]
+
+    Полные прошедшие сутки берутся из дневных агрегатов product_stats,
+    из sales читаются только неполные сутки на краях периода и сегодняшний день.
+    """
+
+    rollup_range, raw_ranges = split_range(start_date, end_date)
+    revenue = cost = 0.0
+    sales_count = 0
 
-    stats = result.one()  # Получаем единственную строку с агрегированными данными
+    if rollup_range:
+        rollup_query = select(
+            func.coalesce(func.sum(GoodStat.amount), 0),
+            func.coalesce(func.sum(GoodStat.cost), 0),
+            func.coalesce(func.sum(GoodStat.total_sales), 0),
+        ).where(GoodStat.period >= rollup_range[0], GoodStat.period < rollup_range[1])
+        if good_id is not None:
+            rollup_query = rollup_query.where(GoodStat.good_id == good_id)
+        rollup = (await db.execute(rollup_query)).one()
+        revenue += float(rollup[0])
+        cost += float(rollup[1])
+        sales_count += int(rollup[2])
+
+    raw_query = select(
+        func.coalesce(func.sum(Sales.total_price), 0),
+        func.coalesce(func.sum(Sales.quantity * Sales.cost_at_sale), 0),
+        func.count(),
+    ).where(or_(*raw_range_condition(raw_ranges)))
+    if good_id is not None:
+        raw_query = raw_query.where(Sales.good_id == good_id)
+    raw = (await db.execute(raw_query)).one()
+    revenue += float(raw[0])
+    cost += float(raw[1])
+    sales_count += int(raw[2])
+
+    return {"revenue": revenue, "cost": cost, "sales_count": sales_count}
+
+
+async def get_sales_stats(db: AsyncSession, start_date: datetime, end_date: date):
+    totals = await get_sales_totals(db, start_date, as_datetime(end_date))
+    total_profit = totals["revenue"] - totals["cost"]
 
     return {
         "period_start": start_date,
         "period_end": end_date,
-        "total_revenue": float(stats.total_revenue),
-        "total_cost": float(stats.total_cost),
-        "total_profit": float(stats.total_profit),
-        "sales_count": stats.sales_count,
+        "total_revenue": totals["revenue"],
+        "total_cost": totals["cost"],
+        "total_profit": total_profit,
+        "sales_count": totals["sales_count"],
         "profit_margin": (
-            float(stats.total_profit / stats.total_revenue * 100)
-            if stats.total_revenue
-            else 0
+            total_profit / totals["revenue"] * 100 if totals["revenue"] else 0
         ),
     }
+
+
+# (агрегат, ключ группы в агрегате, выручка в агрегате, ключ группы в sales)
+SERIES_SOURCES = {
+    None: (GoodStat, None, GoodStat.amount, None),
+    "category": (GoodStat, Article.category_id, GoodStat.amount, Article.category_id),
+    "seller": (SellerStat, SellerStat.user_id, SellerStat.total_amount, Sales.user_id),
+}
+
+
+async def get_sales_series_rows(
+    db: AsyncSession,
+    start_date: datetime,
+    end_date: datetime,
+    bucket: str,
+    group_by: str | None = None,
+) -> dict[tuple[datetime, int | None], list]:
+    """Выручка, себестоимость и число продаж по интервалам date_trunc(bucket)
+
+    Весь ряд считается двумя запросами с GROUP BY вместо запроса на интервал:
+    полные прошедшие сутки - из дневных агрегатов (для bucket от суток),
+    остальное - из sales. Пустые интервалы в результат не попадают.
+
+    Returns:
+        dict: (начало интервала, ключ группы) - [выручка, себестоимость, продаж]
+    """
+
+    model, rollup_key, amount, sales_key = SERIES_SOURCES[group_by]
+    rows: dict[tuple[datetime, int | None], list] = {}
+
+    def add(result):
+        for period, key, revenue, cost, count in result:
+            totals = rows.setdefault((period, key), [0.0, 0.0, 0])
+            totals[0] += float(revenue or 0)
+            totals[1] += float(cost or 0)
+            totals[2] += int(count or 0)
+
+    if bucket == "hour":
+        rollup_range, raw_ranges = None, [(start_date, end_date, True)]
+    else:
+        rollup_range, raw_ranges = split_range(start_date, end_date)
+
+    if rollup_range:
+        period = func.date_trunc(bucket, model.period, type_=DateTime)
+        keys = [rollup_key] if rollup_key is not None else []
+        rollup_query = (
+            select(
+                period,
+                *keys or [null()],
+                func.sum(amount),
+                func.sum(model.cost),
+                func.sum(model.total_sales),
+            )
+            .where(model.period >= rollup_range[0], model.period < rollup_range[1])
+            .group_by(period, *keys)
+        )
+        if group_by == "category":
+            rollup_query = rollup_query.join(Article, GoodStat.good_id == Article.id)
+        add(await db.execute(rollup_query))
+
+    period = func.date_trunc(bucket, Sales.sales_date, type_=DateTime)
+    keys = [sales_key] if sales_key is not None else []
+    raw_query = (
+        select(
+            period,
+            *keys or [null()],
+            func.sum(Sales.total_price),
+            func.sum(Sales.quantity * Sales.cost_at_sale),
+            func.count(),
+        )
+        .where(or_(*raw_range_condition(raw_ranges)))
+        .group_by(period, *keys)
+    )
+    if group_by == "category":
+        raw_query = raw_query.join(Article, Sales.good_id == Article.id)
+    add(await db.execute(raw_query))
+    return rows
+
+
+def _goods_totals(
+    start_date: datetime, end_date: datetime, category_ids: list[int] | None
+):
+    """Подзапрос итогов по товарам за период: агрегаты за полные сутки и
+    sales за края периода, каждая часть заранее сгруппирована по товару"""
+
+    rollup_range, raw_ranges = split_range(start_date, end_date)
+    parts = [
+        select(
+            Sales.good_id.label("good_id"),
+            func.sum(Sales.total_price).label("revenue"),
+            func.sum(Sales.quantity * Sales.cost_at_sale).label("cost"),
+            func.sum(Sales.quantity).label("quantity"),
+            func.count().label("sales_count"),
+        )
+        .where(or_(*raw_range_condition(raw_ranges)))
+        .group_by(Sales.good_id)
+    ]
+    if rollup_range:
+        parts.append(
+            select(
+                GoodStat.good_id,
+                func.sum(GoodStat.amount),
+                func.sum(GoodStat.cost),
+                func.sum(GoodStat.quantity),
+                func.sum(GoodStat.total_sales),
+            )
+            .where(
+                GoodStat.period >= rollup_range[0], GoodStat.period < rollup_range[1]
+            )
+            .group_by(GoodStat.good_id)
+        )
+    if category_ids is not None:
+        goods = select(Article.id).where(Article.category_id.in_(category_ids))
+        parts[0] = parts[0].where(Sales.good_id.in_(goods))
+        parts[1:] = [part.where(GoodStat.good_id.in_(goods)) for part in parts[1:]]
+
+    totals = union_all(*parts).subquery()
+    return (
+        select(
+            totals.c.good_id,
+            func.sum(totals.c.revenue).label("revenue"),
+            func.sum(totals.c.cost).label("cost"),
+            func.sum(totals.c.quantity).label("quantity"),
+            func.sum(totals.c.sales_count).label("sales_count"),
+        )
+        .group_by(totals.c.good_id)
+        .subquery()
+    )
+
+
+def _ranked_goods(
+    start_date: datetime,
+    end_date: datetime,
+    category_ids: list[int] | None,
+    metric: str,
+    a_share: float,
+    b_share: float,
+):
+    """Товары с местом, накопленной долей метрики и классом ABC
+
+    Все считается оконными функциями в одном запросе. Класс определяется
+    накопленной долей до товара: товар, на котором доля переходит порог,
+    остается в старшем классе.
+    """
+
+    goods = _goods_totals(start_date, end_date, category_ids)
+    value = {
+        "revenue": goods.c.revenue,
+        "profit": goods.c.revenue - goods.c.cost,
+        "quantity": goods.c.quantity,
+    }[metric]
+    cumulative = func.sum(value).over(
+        order_by=(value.desc(), goods.c.good_id), rows=(None, 0)
+    )
+    total = func.sum(value).over()
+    return (
+        select(
+            goods.c.good_id,
+            Article.name,
+            Article.category_id,
+            goods.c.revenue,
+            goods.c.cost,
+            goods.c.quantity,
+            goods.c.sales_count,
+            value.label("value"),
+            func.rank().over(order_by=value.desc()).label("rank"),
+            cumulative.label("cumulative"),
+            total.label("total"),
+            case(
+                (cumulative - value < total * a_share, "A"),
+                (cumulative - value < total * b_share, "B"),
+                else_="C",
+            ).label("abc_class"),
+        )
+        .join(Article, Article.id == goods.c.good_id)
+        .subquery()
+    )
+
+
+def _ranked_row(row) -> dict:
+    revenue, cost, total = float(row.revenue or 0), float(row.cost or 0), row.total
+    return {
+        "rank": row.rank,
+        "good_id": row.good_id,
+        "name": row.name,
+        "category_id": row.category_id,
+        "revenue": revenue,
+        "cost": cost,
+        "profit": revenue - cost,
+        "quantity": int(row.quantity or 0),
+        "sales_count": int(row.sales_count or 0),
+        "share": float(row.value / total) if total else 0.0,
+        "cumulative_share": float(row.cumulative / total) if total else 0.0,
+        "abc_class": row.abc_class,
+    }
+
+
+def _ranking_key(kind: str, start_date, end_date, category_ids, *params) -> str:
+    categories = ",".join(map(str, sorted(category_ids))) if category_ids else "-"
+    return (
+        f"{stats_cache_prefix(end_date)}{kind}:{start_date.isoformat()}:"
+        f"{end_date.isoformat()}:{categories}:" + ":".join(map(str, params))
+    )
+
+
+async def get_top_goods(
+    db: AsyncSession,
+    start_date: datetime,
+    end_date: datetime,
+    category_ids: list[int] | None,
+    metric: str,
+    limit: int,
+    a_share: float,
+    b_share: float,
+) -> list[dict]:
+    """Первые limit товаров по метрике за период; доли - от всех товаров
+    периода (в пределах категорий category_ids)"""
+
+    async def load():
+        ranked = _ranked_goods(
+            start_date, end_date, category_ids, metric, a_share, b_share
+        )
+        rows = await db.execute(
+            select(ranked).order_by(ranked.c.rank, ranked.c.good_id).limit(limit)
+        )
+        return [_ranked_row(row) for row in rows]
+
+    key = _ranking_key(
+        "top", start_date, end_date, category_ids, metric, limit, a_share, b_share
+    )
+    return await catalogue_cache.get_or_load(key, load, db)
+
+
+async def get_abc_summary(
+    db: AsyncSession,
+    start_date: datetime,
+    end_date: datetime,
+    category_ids: list[int] | None,
+    metric: str,
+    a_share: float,
+    b_share: float,
+) -> list[dict]:
+    """Число товаров, сумма метрики и выручка по классам ABC"""
+
+    async def load():
+        ranked = _ranked_goods(
+            start_date, end_date, category_ids, metric, a_share, b_share
+        )
+        rows = await db.execute(
+            select(
+                ranked.c.abc_class,
+                func.count(),
+                func.sum(ranked.c.value),
+                func.sum(ranked.c.revenue),
+                func.max(ranked.c.total),
+            )
+            .group_by(ranked.c.abc_class)
+            .order_by(ranked.c.abc_class)
+        )
+        return [
+            {
+                "abc_class": abc_class,
+                "goods_count": count,
+                "value": float(value or 0),
+                "revenue": float(revenue or 0),
+                "share": float(value / total) if total else 0.0,
+            }
+            for abc_class, count, value, revenue, total in rows
+        ]
+
+    key = _ranking_key(
+        "abc", start_date, end_date, category_ids, metric, a_share, b_share
+    )
+    return await catalogue_cache.get_or_load(key, load, db)
+
+
+async def get_abc_goods(
+    db: AsyncSession,
+    start_date: datetime,
+    end_date: datetime,
+    category_ids: list[int] | None,
+    metric: str,
+    a_share: float,
+    b_share: float,
+    abc_class: str,
+    skip: int,
+    limit: int,
+) -> list[dict]:
+    """Страница товаров одного класса ABC в порядке места"""
+
+    async def load():
+        ranked = _ranked_goods(
+            start_date, end_date, category_ids, metric, a_share, b_share
+        )
+        rows = await db.execute(
+            select(ranked)
+            .where(ranked.c.abc_class == abc_class)
+            .order_by(ranked.c.rank, ranked.c.good_id)
+            .offset(skip)
+            .limit(limit)
+        )
+        return [_ranked_row(row) for row in rows]
+
+    key = _ranking_key(
+        "abc_goods",
+        start_date,
+        end_date,
+        category_ids,
+        metric,
+        a_share,
+        b_share,
+        abc_class,
+        skip,
+        limit,
+    )
+    return await catalogue_cache.get_or_load(key, load, db)
+
+
+SELLER_TOTALS = (
+    "sales_count",
+    "items",
+    "revenue",
+    "cost",
+    "receipts_count",
+    "refunds_count",
+    "refund_amount",
+)
+
+
+async def get_seller_totals(
+    db: AsyncSession,
+    start_date: datetime,
+    end_date: datetime,
+    user_id: int | None = None,
+    raw: bool = False,
+) -> dict[int, dict]:
+    """Итоги продавцов за период [start_date, end_date]
+
+    Полные прошедшие сутки берутся из seller_stats, из sales и refunds
+    читаются только края периода, поэтому время ответа не зависит от длины
+    истории. raw - все из sales и refunds, для сверки с агрегатами.
+
+    Returns:
+        dict[int, dict]: id продавца - значения SELLER_TOTALS
+    """
+
+    if raw:
+        rollup_range, raw_ranges = None, [(start_date, end_date, True)]
+    else:
+        rollup_range, raw_ranges = split_range(start_date, end_date)
+    totals: dict[int, dict] = {}
+
+    def add(rows, columns):
+        for seller_id, *values in rows:
+            seller = totals.setdefault(seller_id, dict.fromkeys(SELLER_TOTALS, 0))
+            for column, value in zip(columns, values):
+                if column in ("revenue", "cost", "refund_amount"):
+                    seller[column] += float(value or 0)
+                else:
+                    seller[column] += int(value or 0)
+
+    if rollup_range:
+        rollup_query = (
+            select(
+                SellerStat.user_id,
+                func.sum(SellerStat.total_sales),
+                func.sum(SellerStat.quantity),
+                func.sum(SellerStat.total_amount),
+                func.sum(SellerStat.cost),
+                func.sum(SellerStat.receipts_count),
+                func.sum(SellerStat.refunds_count),
+                func.sum(SellerStat.refund_amount),
+            )
+            .where(
+                SellerStat.period >= rollup_range[0],
+                SellerStat.period < rollup_range[1],
+            )
+            .group_by(SellerStat.user_id)
+        )
+        if user_id is not None:
+            rollup_query = rollup_query.where(SellerStat.user_id == user_id)
+        add(await db.execute(rollup_query), SELLER_TOTALS)
+
+    sales_query = (
+        select(
+            Sales.user_id,
+            func.count(),
+            func.sum(Sales.quantity),
+            func.sum(Sales.total_price),
+            func.sum(Sales.quantity * Sales.cost_at_sale),
+            func.count(distinct(Sales.receipt_id)),
+        )
+        .where(or_(*raw_range_condition(raw_ranges)))
+        .group_by(Sales.user_id)
+    )
+    refunds_query = (
+        select(Refund.user_id, func.count(Refund.id), func.sum(Refund.amount))
+        .where(or_(*raw_range_condition(raw_ranges, Refund.created_at)))
+        .group_by(Refund.user_id)
+    )
+    if user_id is not None:
+        sales_query = sales_query.where(Sales.user_id == user_id)
+        refunds_query = refunds_query.where(Refund.user_id == user_id)
+    add(await db.execute(sales_query), SELLER_TOTALS[:5])
+    add(await db.execute(refunds_query), SELLER_TOTALS[5:])
+    return totals
+
+
+async def get_seller_leaderboard(
+    db: AsyncSession, start_date: datetime, end_date: datetime, raw: bool = False
+) -> dict[int, dict]:
+    """get_seller_totals по всем продавцам; без raw - через кэш статистики"""
+
+    if raw:
+        return await get_seller_totals(db, start_date, end_date, raw=True)
+
+    async def load():
+        return await get_seller_totals(db, start_date, end_date)
+
+    key = (
+        f"{stats_cache_prefix(end_date)}sellers:{start_date.isoformat()}:"
+        f"{end_date.isoformat()}"
+    )
+    return await catalogue_cache.get_or_load(key, load, db)
+
+
+async def get_usernames(db: AsyncSession, user_ids) -> dict[int, str]:
+    rows = await db.execute(
+        select(User.id, User.username).where(User.id.in_(list(user_ids)))
+    )
+    return dict(rows.all())
@@ -0,0 +1,181 @@
+from sqlalchemy import Integer, column, func, select, update, values
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.cache import catalogue_cache
+from models.article import Article
+from services.stock.low_stock import low_stock_monitor
+from services.stock.stock_events import publish_on_commit, stock_event
+
+# колонки для проверки порога низкого остатка без отдельного запроса
+LOW_STOCK_COLUMNS = (Article.name, Article.category_id, Article.low_stock_threshold)
+# колонки события об изменении товара для подписчиков
+EVENT_COLUMNS = (Article.id, Article.category_id, Article.stock_quantity, Article.price)
+
+
+async def change_stock(db: AsyncSession, good_id: int, delta: int) -> int | None:
+    """Атомарно меняет остаток товара на delta
+
+    Проверка и изменение делаются одним условным UPDATE, поэтому остаток
+    не уходит в минус даже при параллельных кассах и строка не блокируется
+    дольше одного запроса. Если остаток опустился до порога, после коммита
+    создается уведомление о низком остатке, подписчики получают новый остаток.
+
+    Returns:
+        int | None: новый остаток или None, если товара нет или остатка не хватает
+    """
+
+    row = (
+        await db.execute(
+            update(Article)
+            .where(Article.id == good_id, Article.stock_quantity >= -delta)
+            .values(stock_quantity=Article.stock_quantity + delta)
+            .returning(Article.stock_quantity, *LOW_STOCK_COLUMNS, Article.price)
+        )
+    ).first()
+    if row is None:
+        return None
+
+    stock_quantity, name, category_id, threshold, price = row
+    # списки товаров кэшируют только id, остаток лежит в записи товара
+    catalogue_cache.invalidate_on_commit(db, f"good:{good_id}")
+    publish_on_commit(db, [stock_event(good_id, category_id, stock_quantity, price)])
+    await low_stock_monitor.check(
+        db,
+        [
+            (
+                good_id,
+                name,
+                category_id,
+                threshold,
+                stock_quantity - delta,
+                stock_quantity,
+            )
+        ],
+    )
+    return stock_quantity
+
+
+async def reserve_stock(db: AsyncSession, good_id: int, count: int) -> int | None:
+    """Списывает count единиц товара, если их хватает"""
+
+    return await change_stock(db, good_id, -count)
+
+
+async def release_stock(db: AsyncSession, good_id: int, count: int) -> int | None:
+    """Возвращает count единиц товара на склад"""
+
+    return await change_stock(db, good_id, count)
+
+
+async def reserve_stock_batch(
+    db: AsyncSession, counts: dict[int, int]
+) -> dict[int, int]:
+    """Списывает остатки сразу по нескольким товарам одним UPDATE ... FROM (VALUES ...)
+
+    Каждая строка списывается только если остатка хватает, остальные строки
+    от этого не зависят. Строки блокируются заранее в порядке id: порядок
+    UPDATE ... FROM не задан, и корзины с общими товарами иначе могли бы
+    блокировать их навстречу друг другу и попадать в дедлок.
+
+    Returns:
+        dict[int, int]: id списанных товаров и их новый остаток
+    """
+
+    if not counts:
+        return {}
+
+    await db.execute(
+        select(Article.id)
+        .where(Article.id.in_(counts))
+        .order_by(Article.id)
+        .with_for_update()
+    )
+    lines = values(
+        column("good_id", Integer), column("count", Integer), name="lines"
+    ).data(sorted(counts.items()))
+    reserved = await db.execute(
+        update(Article)
+        .where(Article.id == lines.c.good_id, Article.stock_quantity >= lines.c.count)
+        .values(stock_quantity=Article.stock_quantity - lines.c.count)
+        .returning(
+            Article.id, Article.stock_quantity, Article.price, *LOW_STOCK_COLUMNS
+        )
+    )
+    rows = reserved.all()
+    await _after_batch_update(
+        db, rows, {row.id: row.stock_quantity + counts[row.id] for row in rows}
+    )
+    return {row.id: row.stock_quantity for row in rows}
+
+
+async def consume_stock_batch(
+    db: AsyncSession, counts: dict[int, int]
+) -> dict[int, tuple[int, int]]:
+    """Списывает товары, уже проданные офлайн
+
+    Продажа состоялась, поэтому строка не отклоняется при нехватке: остаток
+    уменьшается до нуля, а нехватка возвращается вызывающему. Строки товаров
+    блокируются в порядке id, так что параллельные выгрузки не дают дедлоков,
+    а итоговый остаток не зависит от порядка их применения.
+
+    Returns:
+        dict[int, tuple[int, int]]: id товара - (новый остаток, продано сверх остатка)
+    """
+
+    if not counts:
+        return {}
+
+    locked = await db.execute(
+        select(Article.id, Article.stock_quantity)
+        .where(Article.id.in_(counts))
+        .order_by(Article.id)
+        .with_for_update()
+    )
+    before = {good_id: stock_quantity or 0 for good_id, stock_quantity in locked}
+    lines = values(
+        column("good_id", Integer), column("count", Integer), name="lines"
+    ).data([(good_id, counts[good_id]) for good_id in sorted(before)])
+    consumed = await db.execute(
+        update(Article)
+        .where(Article.id == lines.c.good_id)
+        .values(stock_quantity=func.greatest(Article.stock_quantity - lines.c.count, 0))
+        .returning(
+            Article.id, Article.stock_quantity, Article.price, *LOW_STOCK_COLUMNS
+        )
+    )
+    rows = consumed.all()
+    await _after_batch_update(db, rows, before)
+    return {
+        row.id: (row.stock_quantity, max(counts[row.id] - before[row.id], 0))
+        for row in rows
+    }
+
+
+async def _after_batch_update(db: AsyncSession, rows, before: dict[int, int]):
+    """Кэш, подписчики и низкий остаток для строк UPDATE ... RETURNING"""
+
+    if not rows:
+        return
+
+    catalogue_cache.invalidate_on_commit(db, *(f"good:{row.id}" for row in rows))
+    publish_on_commit(
+        db,
+        [
+            stock_event(row.id, row.category_id, row.stock_quantity, row.price)
+            for row in rows
+        ],
+    )
+    await low_stock_monitor.check(
+        db,
+        [
+            (
+                row.id,
+                row.name,
+                row.category_id,
+                row.low_stock_threshold,
+                before[row.id],
+                row.stock_quantity,
+            )
+            for row in rows
+        ],
+    )
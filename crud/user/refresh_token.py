@@ -0,0 +1,103 @@
+import hashlib
+import secrets
+from datetime import datetime, timedelta
+
+from fastapi import HTTPException, status
+from sqlalchemy import insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend import config
+from models import RefreshToken, User
+
+
+def hash_refresh_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+async def issue_refresh_token(
+    db: AsyncSession, user_id: int, family_id: str | None = None
+) -> str:
+    """Создает refresh-токен; без family_id начинается новое семейство (новый вход)"""
+
+    token = secrets.token_urlsafe(32)
+    await db.execute(
+        insert(RefreshToken).values(
+            user_id=user_id,
+            token_hash=hash_refresh_token(token),
+            family_id=family_id or secrets.token_hex(16),
+            expires_at=datetime.now() + timedelta(days=config.JWT_REFRESH_TOKEN_DAYS),
+        )
+    )
+    return token
+
+
+async def revoke_family(db: AsyncSession, family_id: str):
+    await db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.family_id == family_id, RefreshToken.revoked_at.is_(None))
+        .values(revoked_at=datetime.now())
+    )
+
+
+async def rotate_refresh_token(db: AsyncSession, token: str) -> tuple[User, str]:
+    """Погашает refresh-токен и выдает следующий из того же семейства
+
+    Токен гасится одним условным UPDATE по уникальному индексу token_hash, без
+    bcrypt. Если токен уже был использован, это повторное предъявление
+    украденного токена - отзывается всё семейство.
+    """
+
+    token_hash = hash_refresh_token(token)
+    now = datetime.now()
+    used = (
+        await db.execute(
+            update(RefreshToken)
+            .where(
+                RefreshToken.token_hash == token_hash,
+                RefreshToken.used_at.is_(None),
+                RefreshToken.revoked_at.is_(None),
+                RefreshToken.expires_at > now,
+            )
+            .values(used_at=now)
+            .returning(RefreshToken.user_id, RefreshToken.family_id)
+        )
+    ).first()
+
+    if used is None:
+        stored = await db.scalar(
+            select(RefreshToken).where(RefreshToken.token_hash == token_hash)
+        )
+        if stored is not None and stored.used_at is not None:
+            await revoke_family(db, stored.family_id)
+            await db.commit()
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Refresh-токен недействителен",
+        )
+
+    user = await db.scalar(select(User).where(User.id == used.user_id))
+    if user is None or not user.is_active:
+        await revoke_family(db, used.family_id)
+        await db.commit()
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Пользователь заблокирован",
+        )
+
+    new_token = await issue_refresh_token(db, user.id, used.family_id)
+    await db.commit()
+    await db.refresh(user)
+    return user, new_token
+
+
+async def revoke_refresh_token(db: AsyncSession, token: str):
+    """Выход: отзывает семейство, к которому относится токен"""
+
+    family_id = await db.scalar(
+        select(RefreshToken.family_id).where(
+            RefreshToken.token_hash == hash_refresh_token(token)
+        )
+    )
+    if family_id is not None:
+        await revoke_family(db, family_id)
+        await db.commit()
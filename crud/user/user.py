@@ -1,17 +1,14 @@
 from fastapi import HTTPException, status
 
 from sqlalchemy.ext.asyncio import AsyncSession
-from passlib.context import CryptContext
 
+from backend.passwords import password_hasher
 from models.user import User
 from crud.user.utils import get_user_by_email, get_user_by_username
 from schemas.requests.user_from_user import CreateUser
 from schemas.response.user_for_user import UserGet
 
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-
 async def create_user(db: AsyncSession, user: CreateUser):
     if await get_user_by_email(db, user.email):
         raise HTTPException(
@@ -27,7 +24,7 @@ async def create_user(db: AsyncSession, user: CreateUser):
     db_user = User(
         username=user.username,
         email=user.email,
-        hashed_password=pwd_context.hash(user.password),
+        hashed_password=await password_hasher.hash(user.password),
         first_name=user.first_name,
         last_name=user.last_name,
     )
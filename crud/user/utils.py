@@ -1,26 +1,16 @@
 from typing import Annotated
 
-from dotenv import load_dotenv
-import os
-
 from fastapi import Depends, HTTPException, status
-from passlib.context import CryptContext
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from backend.db import get_db
+from backend.passwords import password_hasher
 from models import User
 
-load_dotenv()
-SECRET_KEY = os.getenv("SECRET_KEY")
-ALGORITHM = os.getenv("ALGORITHM")
-
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
-
-def verify_password(password_from_user, password_from_db):
-    return pwd_context.verify(password_from_user, password_from_db)
+async def verify_password(password_from_user, password_from_db):
+    return await password_hasher.verify(password_from_user, password_from_db)
 
 
 async def get_user_by_email(db: AsyncSession, email: str) -> User | None:
@@ -43,9 +33,16 @@ async def authenticate_user(
             detail="Пользователя с таким username не найден",
         )
 
-    if not verify_password(password, user.hashed_password):
+    verified, new_hash = await verify_password(password, user.hashed_password)
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Пароль неправильный!"
         )
 
+    # хэш с устаревшими параметрами (например, BCRYPT_ROUNDS) пересчитан при проверке
+    if new_hash is not None:
+        user.hashed_password = new_hash
+        await db.commit()
+        await db.refresh(user)
+
     return user
@@ -1,5 +1,14 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 
+from backend.db import engine, replica_engine, warm_up_pool
+from backend.passwords import password_hasher
+from services.auth.permission_watch import permission_watcher
+from services.jobs.job_runner import job_runner
+from services.stock.low_stock import low_stock_monitor
+from services.stock.stock_events import stock_bridge
+
 from routers.user.user_router import router
 from routers.good.good import router as good_router
 from routers.auth.auth import router as token_router
@@ -7,9 +16,30 @@ from routers.cash.cash import router as cash_router
 from routers.permission.permission import router as permission_router
 from routers.category.category import router as category_router
 from routers.statistic.statistic_router import router as statistic_router
+from routers.metrics.metrics import router as metrics_router
+from routers.notification.notification import router as notification_router
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await warm_up_pool()
+    if replica_engine is not engine:
+        await warm_up_pool(replica_engine)
+    await permission_watcher.start()
+    await job_runner.start_sweeper()
+    await low_stock_monitor.start()
+    await stock_bridge.start()
+    yield
+    await stock_bridge.stop()
+    await low_stock_monitor.stop()
+    await job_runner.stop()
+    await permission_watcher.stop()
+    password_hasher.shutdown()
+    await engine.dispose()
+    await replica_engine.dispose()
 
 
-app = FastAPI(title="Best Project in the world")
+app = FastAPI(title="Best Project in the world", lifespan=lifespan)
 
 app.include_router(router)
 app.include_router(good_router)
@@ -18,3 +48,5 @@ app.include_router(cash_router)
 app.include_router(permission_router)
 app.include_router(category_router)
 app.include_router(statistic_router)
+app.include_router(metrics_router)
+app.include_router(notification_router)
@@ -0,0 +1,62 @@
+"""hot path indexes
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 13:50:12.104228
+
+Индексы под условия из crud/: диапазоны sales_date в статистике, внешние
+ключи, по которым идут выборки и каскадные удаления, и period в агрегатах.
+На postgres строятся CONCURRENTLY, чтобы не блокировать запись в рабочей базе.
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, Sequence[str], None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+INDEXES = (
+    ("ix_sales_sales_date", "sales", ["sales_date"]),
+    ("ix_sales_good_id_sales_date", "sales", ["good_id", "sales_date"]),
+    ("ix_sales_user_id_sales_date", "sales", ["user_id", "sales_date"]),
+    ("ix_sales_receipt_id", "sales", ["receipt_id"]),
+    ("ix_receipt_items_product_id", "receipt_items", ["product_id"]),
+    ("ix_goods_category_id", "goods", ["category_id"]),
+    ("ix_categories_parent_id", "categories", ["parent_id"]),
+    ("ix_product_stats_period", "product_stats", ["period"]),
+    ("ix_seller_stats_period", "seller_stats", ["period"]),
+)
+
+
+def _concurrently() -> dict:
+    if op.get_context().dialect.name == "postgresql":
+        return {"postgresql_concurrently": True}
+    return {}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CREATE INDEX CONCURRENTLY нельзя выполнять внутри транзакции
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(
+                name,
+                table,
+                columns,
+                unique=False,
+                if_not_exists=True,
+                **_concurrently()
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, if_exists=True, **_concurrently())
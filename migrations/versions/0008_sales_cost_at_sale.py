@@ -0,0 +1,110 @@
+"""sales cost at sale
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18 14:40:02.518342
+
+Цена и себестоимость единицы в каждой строке sales, чтобы статистика не
+соединяла sales с goods и не пересчитывала историю по текущей себестоимости.
+Старые строки заполняются пачками по id, каждая пачка в своей транзакции
+(в alembic upgrade --sql - одним UPDATE):
+цена - из total_price / quantity, себестоимость - текущая из goods (другой
+истории нет). Индексы по sales_date и good_id заменяются покрывающими.
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "0008"
+down_revision: Union[str, Sequence[str], None] = "0007"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 50_000
+
+BACKFILL = (
+    "UPDATE sales SET"
+    " cost_at_sale = (SELECT cost_price FROM goods WHERE goods.id = sales.good_id),"
+    " price_at_sale = CASE WHEN quantity > 0 THEN total_price / quantity END"
+    " WHERE cost_at_sale IS NULL"
+)
+
+OLD_INDEXES = (
+    ("ix_sales_sales_date", ["sales_date"]),
+    ("ix_sales_good_id_sales_date", ["good_id", "sales_date"]),
+)
+NEW_INDEXES = (
+    (
+        "ix_sales_sales_date_covering",
+        ["sales_date"],
+        ["good_id", "user_id", "receipt_id", "quantity", "total_price", "cost_at_sale"],
+    ),
+    (
+        "ix_sales_good_id_sales_date_covering",
+        ["good_id", "sales_date"],
+        ["quantity", "total_price", "cost_at_sale"],
+    ),
+)
+
+
+def _concurrently() -> dict:
+    if op.get_context().dialect.name == "postgresql":
+        return {"postgresql_concurrently": True}
+    return {}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("sales", sa.Column("price_at_sale", sa.Float(), nullable=True))
+    op.add_column("sales", sa.Column("cost_at_sale", sa.Float(), nullable=True))
+
+    # короткие транзакции не держат блокировки строк на время всей миграции
+    with op.get_context().autocommit_block():
+        if context.is_offline_mode():
+            # в --sql границ id не узнать - заполнение одним UPDATE
+            op.execute(BACKFILL)
+        else:
+            bind = op.get_bind()
+            low, high = bind.execute(
+                sa.text("SELECT min(id), max(id) FROM sales")
+            ).one()
+            batch = sa.text(f"{BACKFILL} AND id >= :low AND id < :high")
+            while low is not None and low <= high:
+                bind.execute(batch, {"low": low, "high": low + BATCH_SIZE})
+                low += BATCH_SIZE
+
+        for name, columns, include in NEW_INDEXES:
+            op.create_index(
+                name,
+                "sales",
+                columns,
+                unique=False,
+                if_not_exists=True,
+                postgresql_include=include,
+                **_concurrently(),
+            )
+        for name, _ in OLD_INDEXES:
+            op.drop_index(name, table_name="sales", if_exists=True, **_concurrently())
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, columns in OLD_INDEXES:
+            op.create_index(
+                name,
+                "sales",
+                columns,
+                unique=False,
+                if_not_exists=True,
+                **_concurrently(),
+            )
+        for name, *_ in NEW_INDEXES:
+            op.drop_index(name, table_name="sales", if_exists=True, **_concurrently())
+
+    op.drop_column("sales", "cost_at_sale")
+    op.drop_column("sales", "price_at_sale")
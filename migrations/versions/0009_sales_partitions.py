@@ -0,0 +1,168 @@
+"""sales partitions
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18 16:05:41.730215
+
+На postgres sales становится секционированной по месяцам sales_date:
+запросы за период читают только секции своих месяцев, а старые месяцы
+отсоединяются и выгружаются в файлы (commands.partitions archive) без
+массового DELETE и последующего VACUUM. Секционированную таблицу нельзя
+получить из обычной через ALTER, поэтому строки копируются в новую таблицу;
+миграция держит sales заблокированной до конца и выполняется в окно
+обслуживания. Первичный ключ становится (id, sales_date) - уникальность
+на секционированной таблице должна включать ключ секционирования.
+Создаются секции от первого месяца продаж до MONTHS_AHEAD месяцев вперед
+и sales_default для строк вне секций, к индексам добавляется BRIN по
+sales_date.
+
+На других СУБД секционирования нет: sales_date становится NOT NULL и
+добавляется индекс ix_sales_sales_date_brin (обычный).
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "0009"
+down_revision: Union[str, Sequence[str], None] = "0008"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+MONTHS_AHEAD = 3
+
+COLUMNS = (
+    "id, receipt_id, good_id, quantity, user_id, total_price,"
+    " price_at_sale, cost_at_sale"
+)
+FOREIGN_KEYS = (
+    ("receipt_id", "receipts"),
+    ("good_id", "goods"),
+    ("user_id", "users"),
+)
+INDEXES = (
+    ("ix_sales_id", ["id"], {}),
+    (
+        "ix_sales_sales_date_covering",
+        ["sales_date"],
+        {
+            "postgresql_include": [
+                "good_id",
+                "user_id",
+                "receipt_id",
+                "quantity",
+                "total_price",
+                "cost_at_sale",
+            ]
+        },
+    ),
+    (
+        "ix_sales_good_id_sales_date_covering",
+        ["good_id", "sales_date"],
+        {"postgresql_include": ["quantity", "total_price", "cost_at_sale"]},
+    ),
+    ("ix_sales_user_id_sales_date", ["user_id", "sales_date"], {}),
+    ("ix_sales_receipt_id", ["receipt_id"], {}),
+)
+BRIN_INDEX = ("ix_sales_sales_date_brin", ["sales_date"], {"postgresql_using": "brin"})
+
+FILL_SALES_DATE = sa.text(
+    "UPDATE sales SET sales_date = COALESCE("
+    "(SELECT COALESCE(closed_at, created_at) FROM receipts"
+    " WHERE receipts.id = sales.receipt_id), CURRENT_TIMESTAMP)"
+    " WHERE sales_date IS NULL"
+)
+
+
+def _copy_table(source: str, target: str):
+    op.execute(
+        f"INSERT INTO {target} ({COLUMNS}, sales_date)"
+        f" SELECT {COLUMNS}, sales_date FROM {source}"
+    )
+    # иначе последовательность id удалится вместе с исходной таблицей
+    op.execute(
+        "DO $$ BEGIN EXECUTE format('ALTER SEQUENCE %s OWNED BY %s.id',"
+        f" pg_get_serial_sequence('{source}', 'id'), '{target}'); END $$"
+    )
+
+
+def _create_indexes(indexes):
+    for name, columns, kwargs in indexes:
+        op.create_index(name, "sales", columns, unique=False, **kwargs)
+
+
+def _add_foreign_keys():
+    for column, referred in FOREIGN_KEYS:
+        op.create_foreign_key(
+            f"sales_{column}_fkey", "sales", referred, [column], ["id"]
+        )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(FILL_SALES_DATE)
+
+    if op.get_context().dialect.name != "postgresql":
+        with op.batch_alter_table("sales") as batch_op:
+            batch_op.alter_column(
+                "sales_date", existing_type=sa.DateTime(), nullable=False
+            )
+        _create_indexes([BRIN_INDEX])
+        return
+
+    op.execute("ALTER TABLE sales RENAME TO sales_unpartitioned")
+    op.execute("ALTER INDEX sales_pkey RENAME TO sales_unpartitioned_pkey")
+    op.execute(
+        "CREATE TABLE sales (LIKE sales_unpartitioned INCLUDING DEFAULTS)"
+        " PARTITION BY RANGE (sales_date)"
+    )
+    op.execute("ALTER TABLE sales ALTER COLUMN sales_date SET NOT NULL")
+    op.execute("ALTER TABLE sales ADD PRIMARY KEY (id, sales_date)")
+    _add_foreign_keys()
+
+    # секции от первого месяца продаж (не позже текущего) до MONTHS_AHEAD
+    # месяцев вперед; циклом в DO, чтобы миграция работала и в --sql
+    op.execute(
+        "DO $$ DECLARE month_start date := date_trunc('month', least("
+        "(SELECT min(sales_date) FROM sales_unpartitioned), localtimestamp))::date;"
+        " BEGIN WHILE month_start <= (date_trunc('month', localtimestamp)"
+        f" + interval '{MONTHS_AHEAD} months')::date LOOP"
+        " EXECUTE format('CREATE TABLE %I PARTITION OF sales"
+        " FOR VALUES FROM (%L) TO (%L)', 'sales_p' || to_char(month_start, 'YYYY_MM'),"
+        " month_start, (month_start + interval '1 month')::date);"
+        " month_start := (month_start + interval '1 month')::date;"
+        " END LOOP; END $$"
+    )
+    op.execute("CREATE TABLE sales_default PARTITION OF sales DEFAULT")
+
+    # индексы строятся после копирования - так быстрее, чем обновлять их
+    # на каждую вставленную строку
+    _copy_table("sales_unpartitioned", "sales")
+    _create_indexes(INDEXES + (BRIN_INDEX,))
+    op.execute("ANALYZE sales")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_context().dialect.name != "postgresql":
+        op.drop_index(BRIN_INDEX[0], table_name="sales")
+        with op.batch_alter_table("sales") as batch_op:
+            batch_op.alter_column(
+                "sales_date", existing_type=sa.DateTime(), nullable=True
+            )
+        return
+
+    # отсоединенные и выгруженные секции в таблицу не возвращаются
+    op.execute("ALTER TABLE sales RENAME TO sales_partitioned")
+    op.execute("ALTER INDEX sales_pkey RENAME TO sales_partitioned_pkey")
+    for name, *_ in INDEXES + (BRIN_INDEX,):
+        op.drop_index(name, table_name="sales_partitioned")
+    op.execute("CREATE TABLE sales (LIKE sales_partitioned INCLUDING DEFAULTS)")
+    op.execute("ALTER TABLE sales ALTER COLUMN sales_date DROP NOT NULL")
+    op.execute("ALTER TABLE sales ADD PRIMARY KEY (id)")
+    _add_foreign_keys()
+    _copy_table("sales_partitioned", "sales")
+    _create_indexes(INDEXES)
@@ -0,0 +1,49 @@
+"""receipt items unique
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-18 17:20:14.305112
+
+Уникальный ключ (receipt_id, product_id) в receipt_items - на нем держится
+INSERT ... ON CONFLICT при добавлении товаров в чек. Строки одного товара в
+чеке, накопившиеся до ключа, сливаются в строку с меньшим id: количества
+складываются, цена остается у этой строки.
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0010"
+down_revision: Union[str, Sequence[str], None] = "0009"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SAME_ITEM = (
+    "d.receipt_id = receipt_items.receipt_id"
+    " AND d.product_id = receipt_items.product_id"
+)
+FIRST_IDS = "SELECT min(id) FROM receipt_items GROUP BY receipt_id, product_id"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(
+        "UPDATE receipt_items SET quantity = (SELECT sum(d.quantity)"
+        f" FROM receipt_items d WHERE {SAME_ITEM})"
+        f" WHERE id IN ({FIRST_IDS} HAVING count(*) > 1)"
+    )
+    op.execute(f"DELETE FROM receipt_items WHERE id NOT IN ({FIRST_IDS})")
+
+    with op.batch_alter_table("receipt_items") as batch_op:
+        batch_op.create_unique_constraint(
+            "uq_receipt_items_receipt_product", ["receipt_id", "product_id"]
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table("receipt_items") as batch_op:
+        batch_op.drop_constraint("uq_receipt_items_receipt_product", type_="unique")
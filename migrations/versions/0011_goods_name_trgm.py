@@ -0,0 +1,55 @@
+"""goods name trigram index
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-18 17:21:40.918273
+
+GIN-индекс pg_trgm по goods.name для поиска по части имени и по похожести
+в /good/by_name. На postgres ставится расширение pg_trgm, индекс строится
+CONCURRENTLY; на других СУБД это обычный индекс по name.
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0011"
+down_revision: Union[str, Sequence[str], None] = "0010"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _concurrently() -> dict:
+    if op.get_context().dialect.name == "postgresql":
+        return {"postgresql_concurrently": True}
+    return {}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_context().dialect.name == "postgresql":
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    # CREATE INDEX CONCURRENTLY нельзя выполнять внутри транзакции
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_goods_name_trgm",
+            "goods",
+            ["name"],
+            unique=False,
+            if_not_exists=True,
+            postgresql_using="gin",
+            postgresql_ops={"name": "gin_trgm_ops"},
+            **_concurrently(),
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # расширение остается: им могут пользоваться и другие объекты базы
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_goods_name_trgm", table_name="goods", if_exists=True, **_concurrently()
+        )
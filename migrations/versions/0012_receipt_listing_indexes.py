@@ -0,0 +1,59 @@
+"""receipt listing indexes
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2026-10-18 17:23:02.661509
+
+Индексы курсорной выдачи чеков: закрытые чеки по (created_at, id) по
+убыванию - частичный индекс по status = 'closed' - и чеки продавца по
+(user_id, id). На postgres строятся CONCURRENTLY.
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "0012"
+down_revision: Union[str, Sequence[str], None] = "0011"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _concurrently() -> dict:
+    if op.get_context().dialect.name == "postgresql":
+        return {"postgresql_concurrently": True}
+    return {}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_receipts_closed_created_at_id",
+            "receipts",
+            [sa.literal_column("created_at DESC"), sa.literal_column("id DESC")],
+            unique=False,
+            if_not_exists=True,
+            postgresql_where=sa.text("status = 'closed'"),
+            **_concurrently(),
+        )
+        op.create_index(
+            "ix_receipts_user_id_id",
+            "receipts",
+            ["user_id", sa.literal_column("id DESC")],
+            unique=False,
+            if_not_exists=True,
+            **_concurrently(),
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name in ("ix_receipts_user_id_id", "ix_receipts_closed_created_at_id"):
+            op.drop_index(
+                name, table_name="receipts", if_exists=True, **_concurrently()
+            )
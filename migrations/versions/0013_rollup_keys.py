@@ -0,0 +1,86 @@
+"""rollup keys
+
+Revision ID: 0013
+Revises: 0012
+Create Date: 2026-10-18 17:25:37.120846
+
+Дневные агрегаты product_stats и seller_stats получают колонки quantity и
+cost и уникальные ключи (товар или продавец, сутки), на которых держатся
+upsert-ы агрегатов. Строки с одинаковым ключом, накопившиеся до этого,
+сливаются в строку с меньшим id. quantity и cost уже накопленных строк
+остаются пустыми: историю пересчитывает
+``python -m commands.rollups backfill --start ... --end ...``.
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "0013"
+down_revision: Union[str, Sequence[str], None] = "0012"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# таблица, ключ, суммируемые при слиянии колонки, имя уникального ключа
+ROLLUPS = (
+    (
+        "product_stats",
+        "good_id",
+        ("total_sales", "amount"),
+        "uq_product_stats_good_period",
+    ),
+    (
+        "seller_stats",
+        "user_id",
+        (
+            "total_sales",
+            "total_amount",
+            "receipts_count",
+            "refunds_count",
+            "refund_amount",
+        ),
+        "uq_seller_stats_user_period",
+    ),
+)
+
+
+def _merge_duplicates(table: str, key: str, columns: tuple[str, ...]):
+    # строки с NULL в ключе уникальный ключ не нарушают и не трогаются
+    first_ids = (
+        f"SELECT min(id) FROM {table}"
+        f" WHERE {key} IS NOT NULL AND period IS NOT NULL GROUP BY {key}, period"
+    )
+    same_key = f"d.{key} = {table}.{key} AND d.period = {table}.period"
+    sums = ", ".join(
+        f"{column} = (SELECT sum(d.{column}) FROM {table} d WHERE {same_key})"
+        for column in columns
+    )
+    op.execute(
+        f"UPDATE {table} SET {sums} WHERE id IN ({first_ids} HAVING count(*) > 1)"
+    )
+    op.execute(
+        f"DELETE FROM {table} WHERE {key} IS NOT NULL AND period IS NOT NULL"
+        f" AND id NOT IN ({first_ids})"
+    )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table, key, columns, constraint in ROLLUPS:
+        op.add_column(table, sa.Column("quantity", sa.Integer(), nullable=True))
+        op.add_column(table, sa.Column("cost", sa.Float(), nullable=True))
+        _merge_duplicates(table, key, columns)
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.create_unique_constraint(constraint, [key, "period"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table, _, _, constraint in reversed(ROLLUPS):
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_constraint(constraint, type_="unique")
+            batch_op.drop_column("cost")
+            batch_op.drop_column("quantity")
@@ -10,3 +10,7 @@ from models.seller_stat import SellerStat
 from models.purchase import Purchase
 from models.receipt_items import ReceiptItem
 from models.receipt import Receipt
+from models.refresh_token import RefreshToken
+from models.background_job import BackgroundJob
+from models.idempotency_key import IdempotencyKey
+from models.refund import Refund
@@ -1,5 +1,15 @@
 from backend.db import Base
-from sqlalchemy import Column, Integer, String, ForeignKey, DECIMAL, DateTime
+from sqlalchemy import (
+    DDL,
+    Column,
+    Integer,
+    String,
+    ForeignKey,
+    DECIMAL,
+    DateTime,
+    Index,
+    event,
+)
 from datetime import datetime
 
 from sqlalchemy.orm import relationship
@@ -7,6 +17,17 @@ from sqlalchemy.orm import relationship
 
 class Article(Base):
     __tablename__ = "goods"
+    __table_args__ = (
+        # поиск по части имени и по похожести в /good/by_name
+        Index(
+            "ix_goods_name_trgm",
+            "name",
+            postgresql_using="gin",
+            postgresql_ops={"name": "gin_trgm_ops"},
+        ),
+        # товары категории и каскадное удаление
+        Index("ix_goods_category_id", "category_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, unique=True)
@@ -14,6 +35,8 @@ class Article(Base):
     price = Column(DECIMAL)
     cost_price = Column(DECIMAL)
     stock_quantity = Column(Integer)
+    # порог низкого остатка; без него действует порог категории
+    low_stock_threshold = Column(Integer, nullable=True)
     created_at = Column(DateTime, default=datetime.now)
 
     category = relationship("Category", back_populates="articles")
@@ -22,3 +45,10 @@ class Article(Base):
     notifications = relationship("Notification", back_populates="goods")
     good_stats = relationship("GoodStat", back_populates="goods")
     receipt_items = relationship("ReceiptItem", back_populates="product")
+
+
+event.listen(
+    Article.__table__,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
@@ -0,0 +1,25 @@
+from sqlalchemy import JSON, Column, DateTime, Integer, String
+from sqlalchemy.sql import func
+
+from backend.db import Base
+
+
+class BackgroundJob(Base):
+    """Фоновая задача; прогресс сохраняется в той же транзакции, что и пачка
+    работы, поэтому после падения процесса задача продолжается с места остановки
+    """
+
+    __tablename__ = "background_jobs"
+
+    id = Column(Integer, primary_key=True)
+    kind = Column(String(50), nullable=False)
+    # pending, running, done, failed
+    status = Column(String(20), nullable=False, default="pending", index=True)
+    params = Column(JSON, nullable=False, default=dict)
+    progress = Column(JSON, nullable=False, default=dict)
+    error = Column(String, nullable=True)
+    created_by = Column(Integer, nullable=True)
+    created_at = Column(DateTime, server_default=func.now())
+    # обновляется после каждой пачки; по нему находятся брошенные задачи
+    heartbeat_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey
+from sqlalchemy import Column, Integer, String, ForeignKey, Index
 from sqlalchemy.orm import relationship
 
 from backend.db import Base
@@ -6,12 +6,18 @@ from backend.db import Base
 
 class Category(Base):
     __tablename__ = "categories"
+    __table_args__ = (
+        # дочерние категории и каскадное удаление
+        Index("ix_categories_parent_id", "parent_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     parent_id = Column(
         Integer, ForeignKey("categories.id", ondelete="CASCADE"), nullable=True
     )
     title = Column(String, unique=True)
+    # порог низкого остатка для товаров категории и подкатегорий без своего порога
+    low_stock_threshold = Column(Integer, nullable=True)
 
     articles = relationship("Article", back_populates="category", cascade="all, delete")
     parent = relationship(
@@ -1,5 +1,13 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, ForeignKey, Float, DateTime
+from sqlalchemy import (
+    Column,
+    Integer,
+    ForeignKey,
+    Float,
+    DateTime,
+    UniqueConstraint,
+    Index,
+)
 
 from sqlalchemy.orm import relationship
 
@@ -7,12 +15,24 @@ from backend.db import Base
 
 
 class GoodStat(Base):
+    """Дневной агрегат продаж товара, ведется при продаже и возврате"""
+
     __tablename__ = "product_stats"
+    __table_args__ = (
+        UniqueConstraint("good_id", "period", name="uq_product_stats_good_period"),
+        # суммы за период по всем товарам
+        Index("ix_product_stats_period", "period"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     good_id = Column(Integer, ForeignKey("goods.id"))
-    total_sales = Column(Integer)
-    amount = Column(Float)
+    # количество строк sales
+    total_sales = Column(Integer, default=0)
+    # выручка
+    amount = Column(Float, default=0)
+    quantity = Column(Integer, default=0)
+    cost = Column(Float, default=0)
+    # начало суток
     period = Column(DateTime)
 
     goods = relationship("Article", back_populates="good_stats")
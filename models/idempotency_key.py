@@ -0,0 +1,35 @@
+from sqlalchemy import (
+    JSON,
+    Column,
+    DateTime,
+    ForeignKey,
+    Integer,
+    String,
+    UniqueConstraint,
+)
+from sqlalchemy.sql import func
+
+from backend.db import Base
+
+
+class IdempotencyKey(Base):
+    """Ключ идемпотентности запроса и сохраненный ответ на него
+
+    Строка вставляется в транзакции самого запроса, поэтому повтор с тем же
+    ключом ждет ее коммита и получает тот же ответ, а не выполняется снова.
+    """
+
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (
+        UniqueConstraint("user_id", "key", name="uq_idempotency_keys_user_key"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(
+        Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False
+    )
+    key = Column(String(100), nullable=False)
+    # sha256 тела запроса: тот же ключ с другим телом - ошибка клиента
+    request_hash = Column(String(64), nullable=False)
+    response = Column(JSON, nullable=True)
+    created_at = Column(DateTime, server_default=func.now(), index=True)
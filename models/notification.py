@@ -1,6 +1,6 @@
 from datetime import datetime
 
-from sqlalchemy import Column, Integer, ForeignKey, Float, String, DateTime
+from sqlalchemy import Column, Integer, ForeignKey, Float, String, DateTime, Index
 
 from sqlalchemy.orm import relationship
 
@@ -9,6 +9,10 @@ from backend.db import Base
 
 class Notification(Base):
     __tablename__ = "notifications"
+    __table_args__ = (
+        # проверка, было ли уведомление по товару за окно дедупликации
+        Index("ix_notifications_good_id_date", "good_id", "date"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     good_id = Column(Integer, ForeignKey("goods.id"))
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, Float, DateTime, ForeignKey, String
+from sqlalchemy import Column, Integer, Float, DateTime, ForeignKey, String, Index
 
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -15,9 +15,24 @@ class Receipt(Base):
     closed_at = Column(DateTime, nullable=True)
     total_amount = Column(Float(precision=2), default=0.0)
     status = Column(String(20), default="open")
+    # UUID, который касса присваивает чеку офлайн; по нему повторная
+    # выгрузка чека не создает его второй раз
+    client_uuid = Column(String(36), nullable=True)
 
     user = relationship("User", back_populates="receipts")
     items = relationship(
         "ReceiptItem", back_populates="cash", cascade="all, delete-orphan"
     )
     sales = relationship("Sales", back_populates="receipt")
+
+
+# Курсорная выдача: закрытые чеки по дате и чеки продавца по id
+Index(
+    "ix_receipts_closed_created_at_id",
+    Receipt.created_at.desc(),
+    Receipt.id.desc(),
+    postgresql_where=Receipt.status == "closed",
+)
+Index("ix_receipts_user_id_id", Receipt.user_id, Receipt.id.desc())
+# повторная выгрузка офлайн-чека упирается в этот индекс (ON CONFLICT)
+Index("uq_receipts_client_uuid", Receipt.client_uuid, unique=True)
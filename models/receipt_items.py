@@ -1,4 +1,13 @@
-from sqlalchemy import Column, Integer, Float, DateTime, ForeignKey, String
+from sqlalchemy import (
+    Column,
+    Integer,
+    Float,
+    DateTime,
+    ForeignKey,
+    String,
+    UniqueConstraint,
+    Index,
+)
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from backend.db import Base
@@ -6,6 +15,14 @@ from backend.db import Base
 
 class ReceiptItem(Base):
     __tablename__ = "receipt_items"
+    __table_args__ = (
+        # одна строка на товар в чеке - на ней держится upsert при добавлении товаров
+        UniqueConstraint(
+            "receipt_id", "product_id", name="uq_receipt_items_receipt_product"
+        ),
+        # внешний ключ на goods - удаление товара и поиск чеков с товаром
+        Index("ix_receipt_items_product_id", "product_id"),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     receipt_id = Column(Integer, ForeignKey("receipts.id"), nullable=False)
@@ -0,0 +1,31 @@
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Float, ForeignKey, Index, Integer
+
+from backend.db import Base
+
+
+class Refund(Base):
+    """Возврат части строки чека
+
+    Строка sales при возврате уменьшается или удаляется, поэтому сами
+    возвраты видны только здесь: по этой таблице считаются возвраты
+    в seller_stats и сверка агрегатов.
+    """
+
+    __tablename__ = "refunds"
+    __table_args__ = (
+        # возвраты продавца за смену
+        Index("ix_refunds_user_id_created_at", "user_id", "created_at"),
+        # пересчет и сверка агрегатов за день
+        Index("ix_refunds_created_at", "created_at"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    receipt_id = Column(Integer, ForeignKey("receipts.id"), nullable=False)
+    good_id = Column(Integer, ForeignKey("goods.id"))
+    # кто оформил возврат
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    quantity = Column(Integer, nullable=False)
+    amount = Column(Float, nullable=False)
+    created_at = Column(DateTime, default=datetime.now)
@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, ForeignKey, Float, DateTime
+from sqlalchemy import Column, Integer, ForeignKey, Float, DateTime, Index
 
 from sqlalchemy.orm import relationship
 
@@ -8,14 +8,52 @@ from backend.db import Base
 
 class Sales(Base):
     __tablename__ = "sales"
+    __table_args__ = (
+        # диапазоны дат в статистике и отчетах; покрывающий, чтобы суммы
+        # за период читались из индекса без обращения к таблице
+        Index(
+            "ix_sales_sales_date_covering",
+            "sales_date",
+            postgresql_include=[
+                "good_id",
+                "user_id",
+                "receipt_id",
+                "quantity",
+                "total_price",
+                "cost_at_sale",
+            ],
+        ),
+        # статистика по товару за период
+        Index(
+            "ix_sales_good_id_sales_date_covering",
+            "good_id",
+            "sales_date",
+            postgresql_include=["quantity", "total_price", "cost_at_sale"],
+        ),
+        # продажи продавца за период
+        Index("ix_sales_user_id_sales_date", "user_id", "sales_date"),
+        # возврат и перенос строк чека
+        Index("ix_sales_receipt_id", "receipt_id"),
+        # длинные периоды: BRIN на каждой секции занимает несколько страниц
+        # и отсекает блоки по времени, строки в которые идут по порядку дат
+        Index("ix_sales_sales_date_brin", "sales_date", postgresql_using="brin"),
+        # на postgres таблица секционирована по месяцам sales_date, секции
+        # создает и архивирует commands.partitions; первичный ключ включает
+        # ключ секционирования, как требует postgres
+        {"postgresql_partition_by": "RANGE (sales_date)"},
+    )
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
     receipt_id = Column(Integer, ForeignKey("receipts.id"), nullable=False)
     good_id = Column(Integer, ForeignKey("goods.id"))
     quantity = Column(Integer)
     user_id = Column(Integer, ForeignKey("users.id"))
     total_price = Column(Float)
-    sales_date = Column(DateTime, default=datetime.now)
+    # цена и себестоимость единицы на момент продажи: статистика считает
+    # прибыль по ним, а не по текущим ценам товара
+    price_at_sale = Column(Float)
+    cost_at_sale = Column(Float)
+    sales_date = Column(DateTime, primary_key=True, default=datetime.now)
 
     user = relationship("User", back_populates="sales")
     goods = relationship("Article", back_populates="sales")
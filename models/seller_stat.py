@@ -1,5 +1,13 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, ForeignKey, Float, DateTime
+from sqlalchemy import (
+    Column,
+    Integer,
+    ForeignKey,
+    Float,
+    DateTime,
+    UniqueConstraint,
+    Index,
+)
 
 from sqlalchemy.orm import relationship
 
@@ -7,12 +15,31 @@ from backend.db import Base
 
 
 class SellerStat(Base):
+    """Дневной агрегат продаж продавца, ведется при продаже и возврате"""
+
     __tablename__ = "seller_stats"
+    __table_args__ = (
+        UniqueConstraint("user_id", "period", name="uq_seller_stats_user_period"),
+        # суммы за период по всем продавцам
+        Index("ix_seller_stats_period", "period"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
-    total_sales = Column(Integer)
-    total_amount = Column(Float)
+    # количество строк sales
+    total_sales = Column(Integer, default=0)
+    # выручка
+    total_amount = Column(Float, default=0)
+    quantity = Column(Integer, default=0)
+    cost = Column(Float, default=0)
+    # чеков, проданных за сутки, у которых остались строки sales:
+    # возврат последней строки чека уменьшает счетчик
+    receipts_count = Column(Integer, default=0, server_default="0")
+    # возвраты, оформленные продавцом за сутки (по refunds); выручка
+    # total_amount уже уменьшена на возвраты в день продажи
+    refunds_count = Column(Integer, default=0, server_default="0")
+    refund_amount = Column(Float, default=0, server_default="0")
+    # начало суток
     period = Column(DateTime)
 
     users = relationship("User", back_populates="seller_stats")
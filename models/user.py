@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean
+from sqlalchemy import Column, Integer, String, Boolean, DateTime
 from sqlalchemy.orm import relationship
 
 from backend.db import Base
@@ -17,7 +17,13 @@ class User(Base):
     is_seller = Column(Boolean, default=True)
     is_warehouse_worker = Column(Boolean, default=False)
     is_active = Column(Boolean, default=True)
+    # растет при каждом изменении прав; токены со старой версией не принимаются
+    permission_version = Column(Integer, default=0, server_default="0", nullable=False)
+    permission_changed_at = Column(DateTime, nullable=True, index=True)
 
     sales = relationship("Sales", back_populates="user")
     seller_stats = relationship("SellerStat", back_populates="users")
     receipts = relationship("Receipt", back_populates="user")
+    refresh_tokens = relationship(
+        "RefreshToken", back_populates="user", passive_deletes=True
+    )
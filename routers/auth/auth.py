@@ -1,7 +1,5 @@
-import os
 from datetime import timedelta
 
-from dotenv import load_dotenv
 from fastapi import APIRouter, HTTPException, status
 
 from fastapi.security import OAuth2PasswordRequestForm
@@ -9,7 +7,13 @@ from sqlalchemy import select, update
 
 from models import User
 from routers.auth.utils import create_access_token, get_current_user
+from crud.user.refresh_token import (
+    issue_refresh_token,
+    revoke_refresh_token,
+    rotate_refresh_token,
+)
 from crud.user.utils import authenticate_user
+from schemas.requests.refresh_token import RefreshTokenRequest
 from schemas.response.jwt_token import Token
 from typing import Annotated
 
@@ -17,14 +21,23 @@ from typing import Annotated
 from fastapi import Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from backend import config
 from backend.db import get_db
+from routers.auth.keys import keyring
 
-load_dotenv()
-SECRET_KEY = os.getenv("SECRET_KEY")
-ALGORITHM = os.getenv("ALGORITHM")
+router = APIRouter(prefix="/auth", tags=["Auth"])
 
 
-router = APIRouter(prefix="/auth", tags=["Auth"])
+async def access_token_for(user: User) -> str:
+    return await create_access_token(
+        username=user.username,
+        user_id=user.id,
+        is_owner=user.is_owner,
+        is_seller=user.is_seller,
+        is_warehouse_worker=user.is_warehouse_worker,
+        expires_delta=timedelta(minutes=config.JWT_ACCESS_TOKEN_MINUTES),
+        permission_version=user.permission_version,
+    )
 
 
 @router.post("/token")
@@ -34,15 +47,50 @@ async def token(
 ):
     user = await authenticate_user(db, form_data.username, form_data.password)
 
+    access_token = await access_token_for(user)
+    refresh_token = await issue_refresh_token(db, user.id)
+    await db.commit()
+
     token_res = Token(
-        access_token=await create_access_token(
-            username=user.username,
-            user_id=user.id,
-            is_owner=user.is_owner,
-            is_seller=user.is_seller,
-            is_warehouse_worker=user.is_warehouse_worker,
-            expires_delta=timedelta(minutes=30),
-        ),
+        access_token=access_token,
         token_type="bearer",
+        refresh_token=refresh_token,
     )
     return token_res
+
+
+@router.post("/refresh", response_model=Token)
+async def refresh(
+    db: Annotated[AsyncSession, Depends(get_db)],
+    body: RefreshTokenRequest,
+):
+    """Выдает новую пару токенов по refresh-токену, без проверки пароля
+
+    Права в access-токене берутся из базы, поэтому изменения прав
+    применяются при первом же обновлении.
+    """
+
+    user, refresh_token = await rotate_refresh_token(db, body.refresh_token)
+
+    return Token(
+        access_token=await access_token_for(user),
+        token_type="bearer",
+        refresh_token=refresh_token,
+    )
+
+
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+async def logout(
+    db: Annotated[AsyncSession, Depends(get_db)],
+    body: RefreshTokenRequest,
+):
+    """Отзывает refresh-токен и все токены этого входа"""
+
+    await revoke_refresh_token(db, body.refresh_token)
+
+
+@router.get("/jwks")
+async def jwks():
+    """Открытые ключи подписи токенов (пусто для HS256)"""
+
+    return keyring.jwks()
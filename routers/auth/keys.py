@@ -0,0 +1,112 @@
+import json
+from pathlib import Path
+
+import jwt
+from jwt.algorithms import get_default_algorithms
+
+from backend import config
+
+SYMMETRIC_ALGORITHMS = {"HS256", "HS384", "HS512"}
+# kid токенов, выпущенных до появления кольца ключей
+LEGACY_KID = "default"
+
+
+class KeyRing:
+    """Ключи подписи JWT с ротацией по kid
+
+    Токен подписывается активным ключом, kid пишется в заголовок. Проверка
+    принимает любой ключ кольца, поэтому новый ключ вводится раньше, чем
+    перестает действовать старый.
+    """
+
+    def __init__(
+        self,
+        algorithm: str,
+        signing_keys: dict,
+        verifying_keys: dict,
+        active_kid: str,
+    ):
+        if active_kid not in signing_keys:
+            raise RuntimeError(f"Нет ключа подписи JWT для kid={active_kid!r}")
+
+        self.algorithm = algorithm
+        self.signing_keys = signing_keys
+        self.verifying_keys = verifying_keys
+        self.active_kid = active_kid
+
+    def sign(self, payload: dict) -> str:
+        return jwt.encode(
+            payload,
+            self.signing_keys[self.active_kid],
+            self.algorithm,
+            headers={"kid": self.active_kid},
+        )
+
+    def verify(self, token: str) -> dict:
+        kid = jwt.get_unverified_header(token).get("kid", LEGACY_KID)
+        if (key := self.verifying_keys.get(kid)) is None:
+            raise jwt.InvalidKeyError(f"Неизвестный kid {kid!r}")
+
+        return jwt.decode(
+            token,
+            key,
+            algorithms=[self.algorithm],
+            options={"require": ["exp", "sub"]},
+        )
+
+    def jwks(self) -> dict:
+        """Открытые ключи для проверки токенов другими сервисами"""
+
+        if self.algorithm in SYMMETRIC_ALGORITHMS:
+            return {"keys": []}
+
+        jwk_algorithm = get_default_algorithms()[self.algorithm]
+        keys = []
+        for kid, key in self.verifying_keys.items():
+            jwk = json.loads(jwk_algorithm.to_jwk(key))
+            jwk.update({"kid": kid, "alg": self.algorithm, "use": "sig"})
+            keys.append(jwk)
+        return {"keys": keys}
+
+
+def _load_secret_keys() -> dict[str, str]:
+    keys = {}
+    for item in config.JWT_SECRET_KEYS.split(","):
+        if item.strip():
+            kid, _, secret = item.strip().partition(":")
+            keys[kid] = secret
+    if config.SECRET_KEY:
+        keys.setdefault(LEGACY_KID, config.SECRET_KEY)
+    return keys
+
+
+def _load_key_files(algorithm: str) -> tuple[dict, dict]:
+    jwk_algorithm = get_default_algorithms()[algorithm]
+    signing, verifying = {}, {}
+    for path in sorted(Path(config.JWT_KEYS_DIR).glob("*.key")):
+        signing[path.stem] = jwk_algorithm.prepare_key(path.read_bytes())
+        verifying[path.stem] = signing[path.stem].public_key()
+    for path in sorted(Path(config.JWT_KEYS_DIR).glob("*.pub")):
+        verifying[path.stem] = jwk_algorithm.prepare_key(path.read_bytes())
+    return signing, verifying
+
+
+def load_keyring() -> KeyRing:
+    algorithm = config.JWT_ALGORITHM
+    if algorithm in SYMMETRIC_ALGORITHMS:
+        signing = verifying = _load_secret_keys()
+    elif config.JWT_KEYS_DIR:
+        signing, verifying = _load_key_files(algorithm)
+    else:
+        raise RuntimeError(f"Для {algorithm} нужен каталог ключей JWT_KEYS_DIR")
+
+    if not signing:
+        raise RuntimeError("Не заданы ключи подписи JWT")
+
+    active_kid = config.JWT_ACTIVE_KID or (
+        LEGACY_KID if LEGACY_KID in signing else max(signing)
+    )
+    return KeyRing(algorithm, signing, verifying, active_kid)
+
+
+keyring = load_keyring()
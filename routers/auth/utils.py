@@ -1,17 +1,22 @@
+import hashlib
+import time
 from datetime import datetime, timedelta, timezone
 from typing import Annotated
 
 import jwt
-from dotenv import load_dotenv
-import os
 
 from fastapi import Depends, HTTPException, status
 
+from backend import config
+from backend.cache import MISSING, TTLCache
+from routers.auth.keys import keyring
 from routers.auth.security import oauth2_scheme
+from services.auth.permission_watch import permission_watcher
 
-load_dotenv()
-SECRET_KEY = os.getenv("SECRET_KEY")
-ALGORITHM = os.getenv("ALGORITHM")
+# пользователь из уже проверенного токена; запись живет до exp токена
+token_cache = TTLCache(
+    config.JWT_TOKEN_CACHE_MAXSIZE, config.JWT_ACCESS_TOKEN_MINUTES * 60
+)
 
 
 async def create_access_token(
@@ -21,6 +26,7 @@ async def create_access_token(
     is_seller: bool,
     is_warehouse_worker: bool,
     expires_delta: timedelta,
+    permission_version: int = 0,
 ):
     payload = {
         "sub": username,
@@ -28,57 +34,71 @@ async def create_access_token(
         "is_owner": is_owner,
         "is_seller": is_seller,
         "is_warehouse_worker": is_warehouse_worker,
+        "pv": permission_version,
         "exp": int((datetime.now(timezone.utc) + expires_delta).timestamp()),
     }
-    return jwt.encode(payload, SECRET_KEY, ALGORITHM)
+    return keyring.sign(payload)
 
 
-async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)]):
+def token_key(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def decode_user(token: str) -> tuple[dict, int]:
+    """Проверяет подпись и срок токена, возвращает пользователя и exp"""
+
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str | None = payload.get("sub")
-        user_id: int | None = payload.get("id")
-        is_owner: bool | None = payload.get("is_owner")
-        is_seller: bool | None = payload.get("is_seller")
-        is_warehouse_worker: bool | None = payload.get("is_warehouse_worker")
-        expire: int | None = payload.get("exp")
-
-        if username is None or user_id is None:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Could not validate user",
-            )
-        if expire is None:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="No access token supplied",
-            )
-
-        if not isinstance(expire, int):
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid token format"
-            )
-
-        # Проверка срока действия токена
-        current_time = datetime.now(timezone.utc).timestamp()
-
-        if expire < current_time:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED, detail="Token expired!"
-            )
-
-        return {
-            "username": username,
-            "id": user_id,
-            "is_owner": is_owner,
-            "is_seller": is_seller,
-            "is_warehouse_worker": is_warehouse_worker,
-        }
+        payload = keyring.verify(token)
     except jwt.ExpiredSignatureError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Token expired!"
         )
-    except jwt.exceptions:
+    except jwt.PyJWTError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Could not validate user"
         )
+
+    username: str | None = payload.get("sub")
+    user_id: int | None = payload.get("id")
+    expire = payload.get("exp")
+
+    if username is None or user_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate user",
+        )
+    if not isinstance(expire, int):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid token format"
+        )
+
+    user = {
+        "username": username,
+        "id": user_id,
+        "is_owner": payload.get("is_owner"),
+        "is_seller": payload.get("is_seller"),
+        "is_warehouse_worker": payload.get("is_warehouse_worker"),
+        "permission_version": payload.get("pv", 0),
+    }
+    return user, expire
+
+
+def check_permission_version(user: dict) -> dict:
+    if permission_watcher.is_stale(user["id"], user["permission_version"]):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Права пользователя изменились, обновите токен",
+        )
+    return {key: value for key, value in user.items() if key != "permission_version"}
+
+
+async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)]):
+    key = token_key(token)
+    if (user := token_cache.get(key)) is not MISSING:
+        return check_permission_version(user)
+
+    user, expire = decode_user(token)
+    # кэш живет по monotonic-часам, exp задан по часам UTC
+    if (ttl := expire - time.time()) > 0:
+        token_cache.set(key, user, ttl)
+    return check_permission_version(user)
@@ -1,12 +1,25 @@
+from datetime import datetime
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, Body, status, Query, Path
+from fastapi import (
+    APIRouter,
+    Depends,
+    Body,
+    Header,
+    HTTPException,
+    Request,
+    status,
+    Query,
+    Path,
+)
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from backend.db import get_db
+from backend.db import choose_read_session, get_db, get_read_db
 from crud.cash.cash_crud import (
     create_receipt,
     add_items_to_receipt,
+    add_items_batch_to_receipt,
     get_all_receipts,
     delete_product_from_receipt,
     get_check_info,
@@ -14,9 +27,15 @@ from crud.cash.cash_crud import (
 )
 from schemas.requests.good_for_refund import GoodForRefund
 from services.cash.cash_service import sell_receipt, refund_good, get_user_receipts
+from services.cash.receipt_sync import sync_offline_receipts
+from services.cash.sales_export import export_sales, export_sales_to_file
 from routers.auth.utils import get_current_user
 from schemas.requests.pagination import PaginationParams
+from schemas.requests.receipt_items_batch import ReceiptItemsBatch
+from schemas.requests.receipt_sync import ReceiptSyncBatch
+from schemas.response.receipt_items_batch import ReceiptItemsBatchResponse
 from schemas.response.receipt_responce import ReceiptResponse
+from schemas.response.receipt_sync import ReceiptSyncResponse
 from schemas.response.sell_receipt import SellReceiptResponse
 
 router = APIRouter(prefix="/cash", tags=["Логика Кассы"])
@@ -50,7 +69,7 @@ async def get_all_receipts_endpoint(
 async def add_items_to_receipt_endpoint(
     current_user: Annotated[dict, Depends(get_current_user)],
     good_id: int,
-    count: int,
+    count: Annotated[int, Query(gt=0)],
     purchase_id: Annotated[int, Body(gt=0)],
     db: Annotated[AsyncSession, Depends(get_db)],
 ):
@@ -60,6 +79,24 @@ async def add_items_to_receipt_endpoint(
         return {"detail": f"{good} в количестве {count}, добавлен в чек"}
 
 
+@router.post(
+    "/receipts/{receipt_id}/items:batch",
+    summary="Добавить пачку товаров в чек",
+    description="Добавляет список товаров (good_id, count) в чек за один запрос,"
+    " возвращает результат по каждой строке",
+    response_model=ReceiptItemsBatchResponse,
+    status_code=status.HTTP_200_OK,
+)
+async def add_items_batch_to_receipt_endpoint(
+    receipt_id: Annotated[int, Path(gt=0)],
+    batch: ReceiptItemsBatch,
+    current_user: Annotated[dict, Depends(get_current_user)],
+    db: Annotated[AsyncSession, Depends(get_db)],
+) -> ReceiptItemsBatchResponse:
+    res = await add_items_batch_to_receipt(current_user, batch.items, receipt_id, db)
+    return res
+
+
 @router.delete(
     "/receipts/{receipt_id}/delete/{product_id}",
     summary="Удаляет товар из корзины",
@@ -119,7 +156,7 @@ async def refund_goods_endpoint(
 
 @router.get("/sales/receipts")
 async def get_all_sold_receipts_endpoint(
-    db: Annotated[AsyncSession, Depends(get_db)],
+    db: Annotated[AsyncSession, Depends(get_read_db)],
     current_user: Annotated[dict, Depends(get_current_user)],
     paginations: Annotated[PaginationParams, Query(...)],
 ):
@@ -127,6 +164,58 @@ async def get_all_sold_receipts_endpoint(
     return res
 
 
+@router.get("/sales/export", summary="Выгружает закрытые чеки с продажами за период")
+async def export_sales_endpoint(
+    request: Request,
+    current_user: Annotated[dict, Depends(get_current_user)],
+    start_date: Annotated[datetime, Query(...)],
+    end_date: Annotated[datetime, Query(...)],
+    format: Annotated[str, Query(pattern="^(csv|ndjson)$")] = "ndjson",
+    to_file: Annotated[bool, Query()] = False,
+):
+    """Отдает закрытые чеки и их строки продаж потоком, без постраничной выдачи
+
+    Args:
+        request (Request): запрос, по нему выбирается реплика или основная БД
+        current_user (dict): текущий пользователь
+        start_date (datetime): начало периода (включительно)
+        end_date (datetime): конец периода (не включается)
+        format (str): ndjson - объект на чек, csv - строка на продажу
+        to_file (bool): записать gzip-файл в EXPORT_DIR вместо ответа
+
+    Returns:
+        StreamingResponse | dict: выгрузка или путь к файлу со статистикой
+
+    Raises:
+        HTTPException: 403, если пользователь не владелец;
+            400, если start_date >= end_date
+    """
+
+    if not current_user.get("is_owner", False):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="У вас нет доступа к этой операции!",
+        )
+
+    if start_date >= end_date:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Дата начала должна быть раньше даты окончания",
+        )
+
+    factory, _ = await choose_read_session(request)
+    if to_file:
+        return await export_sales_to_file(factory, start_date, end_date, format)
+
+    return StreamingResponse(
+        export_sales(factory, start_date, end_date, format),
+        media_type="text/csv" if format == "csv" else "application/x-ndjson",
+        headers={
+            "Content-Disposition": f'attachment; filename="sales.{format}"',
+        },
+    )
+
+
 @router.get(
     "/sales/receipts/my_receipts}", summary="Возвращает все чеки текущего пользователя"
 )
@@ -137,3 +226,20 @@ async def get_all_receipts(
 ):
     res = await get_user_receipts(db, current_user, pagination)
     return res
+
+
+@router.post(
+    "/sync",
+    summary="Выгружает чеки, пробитые кассой без связи",
+    description="Принимает пачку закрытых чеков с client_uuid и применяет ее одной"
+    " транзакцией. Повтор с тем же Idempotency-Key возвращает тот же ответ",
+    response_model=ReceiptSyncResponse,
+    status_code=status.HTTP_200_OK,
+)
+async def sync_offline_receipts_endpoint(
+    batch: ReceiptSyncBatch,
+    idempotency_key: Annotated[str, Header(min_length=1, max_length=100)],
+    current_user: Annotated[dict, Depends(get_current_user)],
+    db: Annotated[AsyncSession, Depends(get_db)],
+):
+    return await sync_offline_receipts(db, current_user, idempotency_key, batch)
@@ -1,21 +1,25 @@
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, status, Path
+from fastapi import APIRouter, Depends, Query, status, Path
 
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from backend.db import get_db
+from backend.db import get_db, get_read_db
 from crud.category.category_crud import (
     create_category,
     get_categories,
     get_category_by_id,
+    get_category_subtree,
     put_category_by_id,
-    delete_category,
 )
 from routers.auth.utils import get_current_user
 from schemas.requests.CategoryRequest import CategoryRequest
 from schemas.requests.pagination import PaginationParams
 from schemas.response.category_for_user import CategoryResponse
+from services.category.category_delete import (
+    get_category_delete_job,
+    start_category_delete,
+)
 
 router = APIRouter(tags=["Категории товаров"], prefix="/category")
 
@@ -37,6 +41,35 @@ async def create_category_endpoint(
         }
 
 
+@router.get(
+    "/tree",
+    summary="Возвращает дерево категорий",
+    status_code=status.HTTP_200_OK,
+)
+async def get_category_tree_endpoint(
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+    current_user: Annotated[dict, Depends(get_current_user)],
+    root_id: Annotated[int | None, Query(gt=0)] = None,
+    depth: Annotated[int | None, Query(ge=0)] = None,
+):
+    """Возвращает категории вложенными списками children
+
+    Args:
+        db (AsyncSession): сессия с БД
+        current_user (dict): текущий пользователь
+        root_id (int | None): вернуть только поддерево этой категории
+        depth (int | None): сколько уровней вложенности вернуть
+
+    Returns:
+        list[dict]: корни дерева с вложенными children
+
+    Raises:
+        HTTPException: 404, если категории root_id нет
+    """
+
+    return await get_category_subtree(db, root_id, depth)
+
+
 @router.get(
     "/{category_id}",
     summary="Возвращает категорию по id",
@@ -59,7 +92,7 @@ async def get_category_by_id_endpoint(
     status_code=status.HTTP_200_OK,
 )
 async def get_all_categories_endpoint(
-    db: Annotated[AsyncSession, Depends(get_db)],
+    db: Annotated[AsyncSession, Depends(get_read_db)],
     current_user: Annotated[dict, Depends(get_current_user)],
     pagination: Annotated[PaginationParams, Depends()],
 ):
@@ -82,13 +115,35 @@ async def put_category_by_id_endpoint(
 
 @router.delete(
     "/{category_id}",
-    status_code=status.HTTP_200_OK,
+    status_code=status.HTTP_202_ACCEPTED,
     summary="Удаляет категорию вместе со всеми товарами и под категориями",
 )
 async def delete_category_endpoint(
     db: Annotated[AsyncSession, Depends(get_db)],
     category_id: int,
     current_user: Annotated[dict, Depends(get_current_user)],
+    move_goods_to: Annotated[int | None, Query(gt=0)] = None,
+):
+    """Запускает фоновое удаление категории и ее подкатегорий
+
+    Товары удаляются или, если передан move_goods_to, переносятся в эту
+    категорию небольшими пачками. Ход удаления - GET /category/jobs/{job_id}.
+    Товары с продажами, чеками или возвратами не удаляются: без
+    move_goods_to такой запрос получает 409.
+    """
+
+    job_id = await start_category_delete(db, category_id, current_user, move_goods_to)
+    return {"detail": "Удаление категории запущено", "job_id": job_id}
+
+
+@router.get(
+    "/jobs/{job_id}",
+    summary="Возвращает состояние фоновой задачи",
+    status_code=status.HTTP_200_OK,
+)
+async def get_job_endpoint(
+    job_id: Annotated[int, Path(gt=0)],
+    db: Annotated[AsyncSession, Depends(get_db)],
+    current_user: Annotated[dict, Depends(get_current_user)],
 ):
-    if await delete_category(db, category_id, current_user):
-        return {"detail": "Категория успешно удалена"}
+    return await get_category_delete_job(db, job_id, current_user)
@@ -1,12 +1,21 @@
 from datetime import datetime, timedelta, date
 from typing import Annotated
 
-from fastapi import APIRouter, status, Path
+from fastapi import (
+    APIRouter,
+    HTTPException,
+    Request,
+    status,
+    Path,
+    UploadFile,
+    WebSocket,
+)
+from fastapi.responses import StreamingResponse
 
 from fastapi.params import Depends, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from backend.db import get_db
+from backend.db import choose_read_session, get_db, get_read_db, session
 from crud.good.good_crud import (
     add_good,
     get_all_goods,
@@ -18,10 +27,17 @@ from crud.good.good_crud import (
     update_stock_quantity,
     get_prod_stat,
 )
+from routers.auth.utils import check_permission_version, decode_user, get_current_user
 from schemas.requests.good_from_user import GoodFromUser
 from schemas.response.good_statistic import GoodStat
 from schemas.response.good_for_user_by_id import GoodAnswerId
 from schemas.response.good_for_user_by_name import GoodAnswer
+from services.good.catalogue_io import detect_format, export_goods, import_goods
+from services.stock.stock_feed import (
+    resolve_categories,
+    serve_stock_websocket,
+    stream_stock_events,
+)
 
 router = APIRouter(prefix="/good", tags=["Товар"])
 
@@ -32,15 +48,22 @@ router = APIRouter(prefix="/good", tags=["Товар"])
     status_code=status.HTTP_200_OK,
 )
 async def get_goods_by_category(
-    db: Annotated[AsyncSession, Depends(get_db)],
+    db: Annotated[AsyncSession, Depends(get_read_db)],
     category_id: Annotated[int, Query(...)],
     min_price: Annotated[int, Query(ge=0)] = 0,
     max_price: Annotated[int, Query(ge=1)] = None,
     min_stock_quantity: Annotated[int, Query(ge=0)] = None,
     max_stock_quantity: Annotated[int, Query(ge=0)] = None,
+    include_descendants: Annotated[bool, Query()] = False,
 ):
     products_from_db = await get_products_by_category(
-        category_id, db, min_price, max_price, min_stock_quantity, max_stock_quantity
+        category_id,
+        db,
+        min_price,
+        max_price,
+        min_stock_quantity,
+        max_stock_quantity,
+        include_descendants,
     )
 
     return products_from_db
@@ -76,9 +99,10 @@ async def get_prod_by_id(
     status_code=status.HTTP_200_OK,
 )
 async def get_goods(
-    db: Annotated[AsyncSession, Depends(get_db)],
+    db: Annotated[AsyncSession, Depends(get_read_db)],
     skip: Annotated[int, Query(ge=0)] = 0,
     limit: Annotated[int, Query(ge=1)] = 100,
+    cursor: Annotated[str | None, Query()] = None,
 ):
     """Возвращает список всех товаров
 
@@ -86,40 +110,45 @@ async def get_goods(
         db (AsyncSession): объект сессии бд
         skip (int): От какого по счету товара возвращать (по умолчанию 0)
         limit (int): До какого товара возвращать (по умолчанию 100)
+        cursor (str | None): Курсор из next_cursor, пустая строка - первая страница.
+            Если передан, skip не используется
 
     Returns:
-        list[dict]: Список товаров
+        list[dict] | Page: Список товаров или страница с next_cursor
 
     Raises:
         HttpException: 404 если товары не найдены
     """
 
-    data = await get_all_goods(db, skip, limit)
+    data = await get_all_goods(db, skip, limit, cursor)
     return data
 
 
 @router.get(
     "/by_name",
-    summary="Ищет товар по части имени и если нашел, то возвращает его",
+    summary="Ищет товары по части имени и возвращает самые похожие",
     status_code=status.HTTP_200_OK,
 )
 async def get_good_by_name(
-    name: Annotated[str, Query(...)], db: Annotated[AsyncSession, Depends(get_db)]
+    name: Annotated[str, Query(..., min_length=1)],
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+    limit: Annotated[int, Query(ge=1, le=50)] = 10,
 ):
-    """Возвращает товар. чье имя наиболее похоже на введенное
+    """Возвращает товары, чьи имена наиболее похожи на введенное
 
     Args:
-        name (str): Имя товара
+        name (str): Имя товара или его часть, допускаются опечатки
         db (AsyncSession): Сессия с БД
+        limit (int): Сколько товаров вернуть (по умолчанию 10)
 
     Returns:
-        dict: JSON информация о товаре
+        list[dict]: товары, отсортированные по похожести
 
     Raises:
         HttpExcepion: 404, если товар не найден
     """
 
-    data = await get_goods_by_name(db, name.strip())
+    data = await get_goods_by_name(db, name.strip(), limit)
     return data
 
 
@@ -144,6 +173,76 @@ async def add_new_good(
     return data
 
 
+@router.post(
+    "/import",
+    summary="Массово загружает товары из CSV или NDJSON",
+    status_code=status.HTTP_200_OK,
+)
+async def import_goods_file(
+    file: UploadFile,
+    db: Annotated[AsyncSession, Depends(get_db)],
+    current_user: Annotated[dict, Depends(get_current_user)],
+    format: Annotated[str | None, Query(pattern="^(csv|ndjson)$")] = None,
+):
+    """Загружает товары из файла пачками: новые создаются, существующие
+    (по названию) обновляются
+
+    Args:
+        file (UploadFile): CSV с заголовком или NDJSON с полями GoodFromUser
+        db (AsyncSession): Сессия с БД
+        current_user (dict): владелец; цены и остатки меняются по всему каталогу
+        format (str | None): csv или ndjson, по умолчанию - по расширению файла
+
+    Returns:
+        dict: количество созданных и обновленных товаров и ошибки по строкам
+    """
+
+    if not current_user.get("is_owner", False):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="У вас нет доступа к этой операции!",
+        )
+
+    fmt = detect_format(file.filename, format)
+    return await import_goods(db, file.file, fmt)
+
+
+@router.get(
+    "/export",
+    summary="Выгружает все товары в CSV или NDJSON",
+    status_code=status.HTTP_200_OK,
+)
+async def export_goods_file(
+    request: Request,
+    current_user: Annotated[dict, Depends(get_current_user)],
+    format: Annotated[str, Query(pattern="^(csv|ndjson)$")] = "csv",
+):
+    """Отдает все товары потоком, не загружая каталог в память
+
+    Args:
+        request (Request): запрос, по нему выбирается реплика или основная БД
+        current_user (dict): владелец; в выгрузке есть себестоимость
+        format (str): csv или ndjson
+
+    Returns:
+        StreamingResponse: файл с товарами
+    """
+
+    if not current_user.get("is_owner", False):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="У вас нет доступа к этой операции!",
+        )
+
+    factory, _ = await choose_read_session(request)
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        export_goods(factory, format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="goods.{format}"'},
+    )
+
+
 @router.put(
     "/{good_id}", summary="Обновляет продукт в БД", status_code=status.HTTP_200_OK
 )
@@ -232,7 +331,7 @@ async def del_product(
     response_model=GoodStat,
 )
 async def get_product_statistic(
-    db: Annotated[AsyncSession, Depends(get_db)],
+    db: Annotated[AsyncSession, Depends(get_read_db)],
     product_id: Annotated[int, Path(...)],
     start_date: Annotated[datetime, Query(...)] = datetime.now() - timedelta(days=30),
     end_date: Annotated[datetime, Query()] = datetime.now(),
@@ -256,3 +355,56 @@ async def get_product_statistic(
 
     response = await get_prod_stat(db, product_id, start_date, end_date)
     return response
+
+
+@router.get(
+    "/stock/stream",
+    summary="Поток изменений остатков и цен (Server-Sent Events)",
+    status_code=status.HTTP_200_OK,
+)
+async def stock_stream(
+    request: Request,
+    current_user: Annotated[dict, Depends(get_current_user)],
+    category_id: Annotated[list[int] | None, Query()] = None,
+    include_descendants: Annotated[bool, Query()] = False,
+):
+    """Отдает изменения товаров по мере коммитов вместо опроса /good/by_id
+
+    Args:
+        category_id (list[int] | None): только товары этих категорий
+        include_descendants (bool): вместе с подкатегориями
+
+    Returns:
+        StreamingResponse: text/event-stream с событиями stock и resync;
+        по resync клиент заново запрашивает товары
+    """
+
+    categories = await resolve_categories(session, category_id, include_descendants)
+    return StreamingResponse(
+        stream_stock_events(request, categories),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.websocket("/stock/ws")
+async def stock_websocket(
+    websocket: WebSocket,
+    token: Annotated[str, Query()],
+    category_id: Annotated[list[int] | None, Query()] = None,
+    include_descendants: Annotated[bool, Query()] = False,
+):
+    """Изменения остатков и цен через WebSocket; токен передается в token,
+    так как браузер не дает задать заголовки при подключении"""
+
+    try:
+        check_permission_version(decode_user(token)[0])
+        categories = await resolve_categories(
+            session, category_id, include_descendants
+        )
+    except HTTPException as error:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason=error.detail)
+        return
+
+    await websocket.accept()
+    await serve_stock_websocket(websocket, categories)
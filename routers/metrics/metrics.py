@@ -0,0 +1,110 @@
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, HTTPException, status
+
+from backend.cache import catalogue_cache
+from backend.passwords import password_hasher
+from backend.db import pool_metrics, read_router, replica_pool_metrics
+from routers.auth.utils import get_current_user, token_cache
+from services.stock.low_stock import low_stock_monitor
+from services.stock.stock_events import stock_bridge, stock_hub
+
+
+async def owner_only(current_user: Annotated[dict, Depends(get_current_user)]):
+    """Метрики показывают внутреннее состояние сервиса - только владельцу"""
+
+    if not current_user.get("is_owner", False):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="У вас нет доступа к этой операции!",
+        )
+
+
+router = APIRouter(
+    prefix="/metrics", tags=["Метрики"], dependencies=[Depends(owner_only)]
+)
+
+
+@router.get(
+    "/db_pool",
+    summary="Возвращает состояние пула соединений с БД",
+    status_code=status.HTTP_200_OK,
+)
+async def get_db_pool_metrics():
+    """Возвращает насыщенность пула соединений текущего процесса
+
+    Returns:
+        dict: занятые соединения, использование overflow, время ожидания соединения
+        для основной БД и реплики, а также состояние реплики
+    """
+
+    return {
+        "primary": pool_metrics.snapshot(),
+        "replica": replica_pool_metrics.snapshot(),
+        "replica_healthy": read_router.healthy,
+        "replica_lag_seconds": read_router.lag,
+    }
+
+
+@router.get(
+    "/cache",
+    summary="Возвращает счетчики кэша каталога",
+    status_code=status.HTTP_200_OK,
+)
+async def get_cache_metrics():
+    """Возвращает попадания, промахи и вытеснения по уровням кэша
+
+    Returns:
+        dict: счетчики кэша процесса и общего уровня
+    """
+
+    return catalogue_cache.stats()
+
+
+@router.get(
+    "/auth",
+    summary="Возвращает счетчики авторизации",
+    status_code=status.HTTP_200_OK,
+)
+async def get_auth_metrics():
+    """Возвращает счетчики кэша проверенных JWT и пула хэширования паролей
+
+    Returns:
+        dict: счетчики кэша токенов; занятость, отказы и среднее время пула bcrypt
+    """
+
+    return {"tokens": token_cache.stats(), "password_hash": password_hasher.stats()}
+
+
+@router.get(
+    "/low_stock",
+    summary="Возвращает счетчики уведомлений о низком остатке",
+    status_code=status.HTTP_200_OK,
+)
+async def get_low_stock_metrics():
+    """Возвращает размер буфера, число записанных и отброшенных повторов
+
+    Returns:
+        dict: счетчики монитора низкого остатка текущего процесса
+    """
+
+    return low_stock_monitor.stats()
+
+
+@router.get(
+    "/stock_events",
+    summary="Возвращает счетчики потока изменений товаров",
+    status_code=status.HTTP_200_OK,
+)
+async def get_stock_events_metrics():
+    """Возвращает число подписчиков, разосланных событий и сбросов очередей
+
+    Returns:
+        dict: счетчики рассылки текущего процесса и состояние моста LISTEN/NOTIFY
+    """
+
+    return {
+        **stock_hub.stats(),
+        "bridge_enabled": stock_bridge.enabled,
+        "bridge_outbox": stock_bridge.outbox.qsize(),
+    }
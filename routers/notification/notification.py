@@ -0,0 +1,72 @@
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, Header, Query, Request, status
+from fastapi.responses import StreamingResponse
+
+from backend.db import session
+from routers.auth.utils import get_current_user
+from services.stock.notification_feed import (
+    check_warehouse_access,
+    stream_notifications,
+    wait_for_notifications,
+)
+
+router = APIRouter(prefix="/notification", tags=["Уведомления склада"])
+
+
+@router.get(
+    "/poll",
+    summary="Ждет новые уведомления о низком остатке (long-poll)",
+    status_code=status.HTTP_200_OK,
+)
+async def poll_notifications(
+    current_user: Annotated[dict, Depends(get_current_user)],
+    after_id: Annotated[int | None, Query(ge=0)] = None,
+    timeout: Annotated[float, Query(ge=0, le=60)] = 25,
+    limit: Annotated[int, Query(ge=1, le=500)] = 100,
+):
+    """Возвращает уведомления с id больше after_id, а если их нет - ждет
+    до timeout секунд
+
+    Args:
+        after_id (int | None): последний полученный id; без него ждутся только новые
+        timeout (float): сколько ждать новые уведомления
+        limit (int): максимум уведомлений в ответе
+
+    Returns:
+        dict: уведомления и last_id для следующего запроса
+    """
+
+    check_warehouse_access(current_user)
+    return await wait_for_notifications(session, after_id, timeout, limit)
+
+
+@router.get(
+    "/stream",
+    summary="Поток уведомлений о низком остатке (Server-Sent Events)",
+    status_code=status.HTTP_200_OK,
+)
+async def notifications_stream(
+    request: Request,
+    current_user: Annotated[dict, Depends(get_current_user)],
+    after_id: Annotated[int | None, Query(ge=0)] = None,
+    last_event_id: Annotated[int | None, Header()] = None,
+):
+    """Отдает уведомления по мере появления, соединение держится открытым
+
+    Args:
+        after_id (int | None): с какого id начать; без него - только новые
+        last_event_id (int | None): заголовок Last-Event-ID при переподключении
+
+    Returns:
+        StreamingResponse: text/event-stream
+    """
+
+    check_warehouse_access(current_user)
+    return StreamingResponse(
+        stream_notifications(
+            session, request, last_event_id if last_event_id is not None else after_id
+        ),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,4 +1,7 @@
+from datetime import datetime
+
 from fastapi import APIRouter, HTTPException, status, Depends
+
 from sqlalchemy import select, update
 
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -9,6 +12,7 @@ from schemas.requests.permission_from_user import PermissionSet
 from typing import Annotated
 from backend.db import get_db
 from schemas.response.permission_set_for_user import PermissionResponse
+from services.auth.permission_watch import permission_watcher
 
 
 router = APIRouter(prefix="/permission", tags=["Права доступа"])
@@ -38,17 +42,23 @@ async def change_user_permission(
             detail="Пользователь с таким id не найден",
         )
 
-    await db.execute(
+    # токены со старой версией прав перестают приниматься в течение
+    # PERMISSION_POLL_SECONDS во всех процессах
+    permission_version = await db.scalar(
         update(User)
         .where(User.id == user_id)
         .values(
             is_owner=permission_status.set_owner,
             is_seller=permission_status.set_seller,
             is_warehouse_worker=permission_status.set_warehouse_worker,
+            permission_version=User.permission_version + 1,
+            permission_changed_at=datetime.now(),
         )
+        .returning(User.permission_version)
     )
 
     await db.commit()
+    permission_watcher.bump(user_id, permission_version)
 
     return PermissionResponse(
         user_id=user_id,
@@ -4,10 +4,24 @@ from typing import Annotated
 from fastapi import APIRouter, Depends, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from backend.db import get_db
+from backend.db import get_read_db
 from routers.auth.utils import get_current_user
+from backend import config
+from schemas.response.statistic_ranking import AbcResponse, TopGoodsResponse
 from schemas.response.statistic_sales_response import SalesStatsResponse
-from services.statisitc.statistic import get_sales_stat
+from schemas.response.statistic_sellers import (
+    SellersLeaderboardResponse,
+    ZReportResponse,
+)
+from schemas.response.statistic_series import SalesSeriesResponse
+from services.statisitc.statistic import (
+    get_abc_stat,
+    get_sales_series,
+    get_sales_stat,
+    get_sellers_stat,
+    get_top_goods_stat,
+    get_z_report,
+)
 
 router = APIRouter(
     prefix="/statistic",
@@ -20,10 +34,184 @@ router = APIRouter(
     summary="Возвращает статистику по проданным товарам за указанную дату",
 )
 async def get_sales_stat_endpoint(
-    db: Annotated[AsyncSession, Depends(get_db)],
+    db: Annotated[AsyncSession, Depends(get_read_db)],
     current_user: Annotated[dict, Depends(get_current_user)],
     start_date: Annotated[datetime, Query(...)] = datetime.now() - timedelta(days=1),
     end_date: Annotated[datetime, Query()] = datetime.now().date(),
 ) -> SalesStatsResponse:
     stat = await get_sales_stat(db, current_user, start_date, end_date)
     return stat
+
+
+@router.get(
+    "/series",
+    summary="Возвращает ряд выручки и прибыли по часам, дням, неделям или месяцам",
+)
+async def get_sales_series_endpoint(
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+    current_user: Annotated[dict, Depends(get_current_user)],
+    start_date: Annotated[datetime, Query(...)],
+    end_date: Annotated[datetime, Query(...)],
+    bucket: Annotated[str, Query(pattern="^(hour|day|week|month)$")] = "day",
+    group_by: Annotated[str | None, Query(pattern="^(category|seller)$")] = None,
+) -> SalesSeriesResponse:
+    """Весь ряд за период одним запросом вместо вызова / на каждый интервал
+
+    Args:
+        start_date (datetime): начало периода
+        end_date (datetime): конец периода включительно
+        bucket (str): hour, day, week (с понедельника) или month
+        group_by (str | None): отдельный ряд на каждую категорию или продавца
+
+    Returns:
+        SalesSeriesResponse: ряды с точками на каждый интервал, пустые - нулями
+    """
+
+    return await get_sales_series(
+        db, current_user, start_date, end_date, bucket, group_by
+    )
+
+
+@router.get(
+    "/top-goods",
+    summary="Возвращает самые продаваемые товары за период",
+)
+async def get_top_goods_endpoint(
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+    current_user: Annotated[dict, Depends(get_current_user)],
+    start_date: Annotated[datetime, Query(...)],
+    end_date: Annotated[datetime, Query(...)],
+    metric: Annotated[str, Query(pattern="^(revenue|profit|quantity)$")] = "revenue",
+    limit: Annotated[int, Query(ge=1, le=500)] = 20,
+    category_id: Annotated[int | None, Query()] = None,
+    include_descendants: Annotated[bool, Query()] = False,
+) -> TopGoodsResponse:
+    """Рейтинг товаров одним запросом вместо /good/statistic на каждый товар
+
+    Args:
+        start_date (datetime): начало периода
+        end_date (datetime): конец периода включительно
+        metric (str): revenue, profit или quantity
+        limit (int): сколько товаров вернуть
+        category_id (int | None): только товары категории
+        include_descendants (bool): вместе с подкатегориями
+
+    Returns:
+        TopGoodsResponse: товары с местом, долей и накопленной долей метрики
+    """
+
+    return await get_top_goods_stat(
+        db,
+        current_user,
+        start_date,
+        end_date,
+        metric,
+        limit,
+        category_id,
+        include_descendants,
+    )
+
+
+@router.get(
+    "/abc",
+    summary="Возвращает ABC-анализ товаров за период",
+)
+async def get_abc_endpoint(
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+    current_user: Annotated[dict, Depends(get_current_user)],
+    start_date: Annotated[datetime, Query(...)],
+    end_date: Annotated[datetime, Query(...)],
+    metric: Annotated[str, Query(pattern="^(revenue|profit|quantity)$")] = "revenue",
+    a_share: Annotated[float, Query(gt=0, le=1)] = config.STAT_ABC_A_SHARE,
+    b_share: Annotated[float, Query(gt=0, le=1)] = config.STAT_ABC_B_SHARE,
+    abc_class: Annotated[str | None, Query(pattern="^[ABC]$")] = None,
+    skip: Annotated[int, Query(ge=0)] = 0,
+    limit: Annotated[int, Query(ge=1, le=1000)] = 100,
+    category_id: Annotated[int | None, Query()] = None,
+    include_descendants: Annotated[bool, Query()] = False,
+) -> AbcResponse:
+    """Делит товары на классы по накопленной доле метрики
+
+    Args:
+        a_share (float): накопленная доля, до которой товары попадают в A
+        b_share (float): то же для B; остальные товары - C
+        abc_class (str | None): вернуть страницу товаров этого класса
+        skip (int): сколько товаров класса пропустить
+        limit (int): сколько товаров класса вернуть
+
+    Returns:
+        AbcResponse: итоги по классам и, если задан abc_class, его товары
+    """
+
+    return await get_abc_stat(
+        db,
+        current_user,
+        start_date,
+        end_date,
+        metric,
+        a_share,
+        b_share,
+        abc_class,
+        skip,
+        limit,
+        category_id,
+        include_descendants,
+    )
+
+
+@router.get(
+    "/sellers",
+    summary="Возвращает рейтинг продавцов за период",
+)
+async def get_sellers_endpoint(
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+    current_user: Annotated[dict, Depends(get_current_user)],
+    start_date: Annotated[datetime, Query(...)],
+    end_date: Annotated[datetime, Query(...)],
+    metric: Annotated[
+        str, Query(pattern="^(revenue|profit|receipts_count|items|average_basket)$")
+    ] = "revenue",
+    limit: Annotated[int, Query(ge=1, le=500)] = 50,
+    mode: Annotated[str, Query(pattern="^(rollup|raw)$")] = "rollup",
+) -> SellersLeaderboardResponse:
+    """Рейтинг по дневным агрегатам seller_stats и краям периода из sales
+
+    Args:
+        metric (str): revenue, profit, receipts_count, items или average_basket
+        limit (int): сколько продавцов вернуть
+        mode (str): rollup - из агрегатов, raw - пересчет из sales для сверки
+
+    Returns:
+        SellersLeaderboardResponse: продавцы с местом и итогами за период
+    """
+
+    return await get_sellers_stat(
+        db, current_user, start_date, end_date, metric, limit, mode
+    )
+
+
+@router.get(
+    "/sellers/{user_id}/z-report",
+    summary="Возвращает итоги смены продавца (Z-отчет)",
+)
+async def get_z_report_endpoint(
+    user_id: int,
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+    current_user: Annotated[dict, Depends(get_current_user)],
+    start_date: Annotated[datetime | None, Query()] = None,
+    end_date: Annotated[datetime | None, Query()] = None,
+    mode: Annotated[str, Query(pattern="^(rollup|raw)$")] = "rollup",
+) -> ZReportResponse:
+    """Чеки, проданные товары, выручка, возвраты и средний чек продавца
+
+    Args:
+        user_id (int): id продавца
+        start_date (datetime | None): начало смены, по умолчанию начало суток
+        end_date (datetime | None): конец смены, по умолчанию текущий момент
+        mode (str): rollup - из агрегатов, raw - пересчет из sales для сверки
+
+    Returns:
+        ZReportResponse: итоги продавца за смену
+    """
+
+    return await get_z_report(db, current_user, user_id, start_date, end_date, mode)
@@ -5,3 +5,4 @@ class CategoryRequest(BaseModel):
 
     name: str
     parent_id: int | None = Field(default=None, examples=[None])
+    low_stock_threshold: int | None = Field(default=None, examples=[None])
@@ -1,6 +1,6 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class GoodForRefund(BaseModel):
     good_id: int
-    quantity: int
+    quantity: int = Field(gt=0)
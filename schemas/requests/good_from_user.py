@@ -7,3 +7,4 @@ class GoodFromUser(BaseModel):
     price: int
     cost_price: int
     stock_quantity: int
+    low_stock_threshold: int | None = None
@@ -7,8 +7,19 @@ class PaginationParams(BaseModel):
     size: int = Query(
         default=10, ge=1, le=100, description="Количество элементов на странице"
     )
+    cursor: str | None = Query(
+        default=None,
+        description="Курсор следующей страницы из next_cursor."
+        " Пустая строка - первая страница в режиме курсоров,"
+        " без параметра - старый режим со страницами",
+    )
 
     @property
     def offset(self) -> int:
         """Вычисляет смещение для SQL-запросов (например, LIMIT + OFFSET)."""
         return (self.page - 1) * self.size
+
+    @property
+    def is_keyset(self) -> bool:
+        """Запрошена ли постраничная выдача по курсору вместо OFFSET"""
+        return self.cursor is not None
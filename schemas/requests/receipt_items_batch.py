@@ -0,0 +1,10 @@
+from pydantic import BaseModel, Field
+
+
+class ReceiptItemLine(BaseModel):
+    good_id: int = Field(gt=0)
+    count: int = Field(gt=0)
+
+
+class ReceiptItemsBatch(BaseModel):
+    items: list[ReceiptItemLine] = Field(min_length=1, max_length=500)
@@ -0,0 +1,19 @@
+from datetime import datetime
+from uuid import UUID
+
+from pydantic import BaseModel, Field
+
+from schemas.requests.receipt_items_batch import ReceiptItemLine
+
+
+class OfflineReceipt(BaseModel):
+    """Чек, пробитый кассой без связи с сервером"""
+
+    client_uuid: UUID
+    created_at: datetime
+    closed_at: datetime
+    items: list[ReceiptItemLine] = Field(min_length=1, max_length=500)
+
+
+class ReceiptSyncBatch(BaseModel):
+    receipts: list[OfflineReceipt] = Field(min_length=1, max_length=100)
@@ -0,0 +1,5 @@
+from pydantic import BaseModel
+
+
+class RefreshTokenRequest(BaseModel):
+    refresh_token: str
@@ -0,0 +1,8 @@
+from typing import Any
+
+from pydantic import BaseModel
+
+
+class Page(BaseModel):
+    items: list[dict[str, Any]]
+    next_cursor: str | None
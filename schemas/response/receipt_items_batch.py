@@ -0,0 +1,17 @@
+from typing import Literal
+
+from pydantic import BaseModel
+
+
+class ReceiptLineResult(BaseModel):
+    good_id: int
+    count: int
+    status: Literal["added", "not_found", "insufficient_stock"]
+    name: str | None = None
+    available: int | None = None
+
+
+class ReceiptItemsBatchResponse(BaseModel):
+    receipt_id: int
+    total_amount: float
+    lines: list[ReceiptLineResult]
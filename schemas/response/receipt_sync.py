@@ -0,0 +1,24 @@
+from typing import Literal
+
+from pydantic import BaseModel
+
+
+class SyncedReceipt(BaseModel):
+    client_uuid: str
+    receipt_id: int
+    # duplicate - чек уже был выгружен раньше, повторно не применялся
+    status: Literal["created", "duplicate"]
+    total_amount: float
+    # товары, которых нет в каталоге; в чек не вошли
+    not_found: list[int] = []
+
+
+class OversoldGood(BaseModel):
+    good_id: int
+    # сколько продано сверх остатка на складе
+    count: int
+
+
+class ReceiptSyncResponse(BaseModel):
+    receipts: list[SyncedReceipt]
+    oversold: list[OversoldGood]
@@ -0,0 +1,48 @@
+from datetime import datetime
+from typing import Literal
+
+from pydantic import BaseModel
+
+
+class RankedGood(BaseModel):
+    rank: int
+    good_id: int
+    name: str | None
+    category_id: int | None
+    revenue: float
+    cost: float
+    profit: float
+    quantity: int
+    sales_count: int
+    # доля товара и накопленная доля в сумме метрики за период
+    share: float
+    cumulative_share: float
+    abc_class: Literal["A", "B", "C"]
+
+
+class TopGoodsResponse(BaseModel):
+    period_start: datetime
+    period_end: datetime
+    metric: Literal["revenue", "profit", "quantity"]
+    category_id: int | None
+    goods: list[RankedGood]
+
+
+class AbcClassSummary(BaseModel):
+    abc_class: Literal["A", "B", "C"]
+    goods_count: int
+    value: float
+    revenue: float
+    share: float
+
+
+class AbcResponse(BaseModel):
+    period_start: datetime
+    period_end: datetime
+    metric: Literal["revenue", "profit", "quantity"]
+    category_id: int | None
+    a_share: float
+    b_share: float
+    classes: list[AbcClassSummary]
+    # товары класса abc_class из запроса, если он указан
+    goods: list[RankedGood]
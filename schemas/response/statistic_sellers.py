@@ -0,0 +1,39 @@
+from datetime import datetime
+from typing import Literal
+
+from pydantic import BaseModel
+
+
+class SellerTotals(BaseModel):
+    user_id: int
+    username: str | None
+    receipts_count: int
+    # строк sales и проданных единиц товара
+    sales_count: int
+    items: int
+    # выручка за вычетом возвратов этих продаж
+    revenue: float
+    cost: float
+    profit: float
+    average_basket: float
+    # возвраты, оформленные продавцом за период
+    refunds_count: int
+    refund_amount: float
+
+
+class RankedSeller(SellerTotals):
+    rank: int
+
+
+class SellersLeaderboardResponse(BaseModel):
+    period_start: datetime
+    period_end: datetime
+    metric: str
+    mode: Literal["rollup", "raw"]
+    sellers: list[RankedSeller]
+
+
+class ZReportResponse(SellerTotals):
+    period_start: datetime
+    period_end: datetime
+    mode: Literal["rollup", "raw"]
@@ -0,0 +1,26 @@
+from datetime import datetime
+from typing import Literal
+
+from pydantic import BaseModel
+
+
+class SeriesPoint(BaseModel):
+    period: datetime
+    revenue: float
+    cost: float
+    profit: float
+    sales_count: int
+
+
+class SalesSeries(BaseModel):
+    # id категории или продавца; None - без группировки
+    key: int | None
+    points: list[SeriesPoint]
+
+
+class SalesSeriesResponse(BaseModel):
+    period_start: datetime
+    period_end: datetime
+    bucket: Literal["hour", "day", "week", "month"]
+    group_by: Literal["category", "seller"] | None
+    series: list[SalesSeries]
@@ -0,0 +1,68 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from backend import config
+from backend.db import session
+from models import User
+
+logger = logging.getLogger(__name__)
+
+
+class PermissionWatcher:
+    """Версии прав пользователей, измененных за время жизни access-токена
+
+    Процесс раз в PERMISSION_POLL_SECONDS читает пользователей с недавним
+    permission_changed_at (индекс по колонке, обычно пустой результат).
+    Access-токен с версией прав ниже известной отклоняется, и клиент получает
+    новые права через /auth/refresh без повторного ввода пароля.
+    """
+
+    def __init__(self, factory: async_sessionmaker, interval: float):
+        self.factory = factory
+        self.interval = interval
+        self.versions: dict[int, int] = {}
+        self.task: asyncio.Task | None = None
+
+    def is_stale(self, user_id: int, version: int | None) -> bool:
+        return self.versions.get(user_id, 0) > (version or 0)
+
+    def bump(self, user_id: int, version: int):
+        self.versions[user_id] = max(self.versions.get(user_id, 0), version)
+
+    async def poll(self):
+        # старше окна токены уже истекли, поэтому окно равно их сроку жизни
+        window = timedelta(minutes=config.JWT_ACCESS_TOKEN_MINUTES)
+        async with self.factory() as db:
+            rows = await db.execute(
+                select(User.id, User.permission_version).where(
+                    User.permission_changed_at > datetime.now() - window
+                )
+            )
+            self.versions = {user_id: version for user_id, version in rows}
+
+    async def run(self):
+        while True:
+            try:
+                await self.poll()
+            except Exception:
+                logger.exception("Не удалось обновить версии прав пользователей")
+            await asyncio.sleep(self.interval)
+
+    async def start(self):
+        await self.poll()
+        self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+
+
+permission_watcher = PermissionWatcher(session, config.PERMISSION_POLL_SECONDS)
@@ -0,0 +1,168 @@
+import hashlib
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend import config
+from crud.cash.cash_crud import check_permission_owner_or_seller
+from crud.cash.sync_crud import (
+    claim_idempotency_key,
+    get_receipts_by_client_uuid,
+    insert_offline_receipts,
+    insert_offline_sales,
+    purge_idempotency_keys,
+    save_idempotent_response,
+)
+from crud.rollup.rollup_crud import add_receipts_to_rollups
+from crud.stock.stock_crud import consume_stock_batch
+from models import Article
+from schemas.requests.receipt_sync import OfflineReceipt, ReceiptSyncBatch
+from schemas.response.receipt_sync import (
+    OversoldGood,
+    ReceiptSyncResponse,
+    SyncedReceipt,
+)
+
+
+def request_hash(batch: ReceiptSyncBatch) -> str:
+    return hashlib.sha256(batch.model_dump_json().encode()).hexdigest()
+
+
+def server_time(moment: datetime) -> datetime:
+    """Время кассы в локальном времени сервера без таймзоны, как в БД;
+    время из будущего (сбитые часы кассы) заменяется текущим"""
+
+    if moment.tzinfo is not None:
+        moment = moment.astimezone().replace(tzinfo=None)
+    return min(moment, datetime.now())
+
+
+def collapse_items(receipt: OfflineReceipt) -> dict[int, int]:
+    counts: dict[int, int] = {}
+    for line in receipt.items:
+        counts[line.good_id] = counts.get(line.good_id, 0) + line.count
+    return counts
+
+
+async def sync_offline_receipts(
+    db: AsyncSession, current_user: dict, idempotency_key: str, batch: ReceiptSyncBatch
+) -> dict:
+    """Применяет чеки, пробитые кассой офлайн, одной транзакцией на пачку
+
+    Повтор пачки с тем же ключом возвращает сохраненный ответ. Чек, уже
+    выгруженный в другой пачке, узнается по client_uuid и не применяется
+    второй раз. Продажи не отклоняются из-за остатка: он списывается до нуля,
+    а нехватка по товарам возвращается в oversold. Цены берутся из каталога
+    на момент выгрузки.
+    """
+
+    await check_permission_owner_or_seller(current_user)
+    user_id = current_user["id"]
+
+    if (
+        stored := await claim_idempotency_key(
+            db, user_id, idempotency_key, request_hash(batch)
+        )
+    ) is not None:
+        await db.rollback()
+        return stored
+
+    # повтор чека внутри пачки - одна запись; порядок по uuid одинаков
+    # у любых пачек, поэтому параллельные вставки не ждут друг друга по кругу
+    receipts = {str(receipt.client_uuid): receipt for receipt in batch.receipts}
+    receipts = dict(sorted(receipts.items()))
+
+    counts = {uuid: collapse_items(receipt) for uuid, receipt in receipts.items()}
+    goods = await db.execute(
+        select(Article.id, Article.price, Article.cost_price).where(
+            Article.id.in_({good_id for lines in counts.values() for good_id in lines})
+        )
+    )
+    prices, costs = {}, {}
+    for good_id, price, cost_price in goods:
+        prices[good_id] = price
+        costs[good_id] = float(cost_price) if cost_price is not None else None
+    totals = {
+        uuid: sum(
+            float(prices[good_id]) * count
+            for good_id, count in lines.items()
+            if good_id in prices
+        )
+        for uuid, lines in counts.items()
+    }
+
+    created = await insert_offline_receipts(
+        db,
+        user_id,
+        [
+            {
+                "client_uuid": uuid,
+                "created_at": server_time(receipt.created_at),
+                "closed_at": server_time(receipt.closed_at),
+                "total_amount": totals[uuid],
+            }
+            for uuid, receipt in receipts.items()
+        ],
+    )
+    existing = await get_receipts_by_client_uuid(
+        db, [uuid for uuid in receipts if uuid not in created]
+    )
+
+    sold: dict[int, int] = {}
+    sales = []
+    for uuid, receipt_id in created.items():
+        for good_id, count in counts[uuid].items():
+            if good_id not in prices:
+                continue
+            sold[good_id] = sold.get(good_id, 0) + count
+            sales.append(
+                {
+                    "receipt_id": receipt_id,
+                    "good_id": good_id,
+                    "quantity": count,
+                    "user_id": user_id,
+                    "total_price": float(prices[good_id]) * count,
+                    "sales_date": server_time(receipts[uuid].closed_at),
+                    "price_at_sale": float(prices[good_id]),
+                    "cost_at_sale": costs[good_id],
+                }
+            )
+    await insert_offline_sales(db, sales)
+    consumed = await consume_stock_batch(db, sold)
+    await add_receipts_to_rollups(db, list(created.values()))
+
+    result = []
+    for uuid in receipts:
+        if uuid in created:
+            receipt_id, total, status = created[uuid], totals[uuid], "created"
+        else:
+            (receipt_id, total), status = existing[uuid], "duplicate"
+        result.append(
+            SyncedReceipt(
+                client_uuid=uuid,
+                receipt_id=receipt_id,
+                status=status,
+                total_amount=total or 0.0,
+                not_found=(
+                    [good_id for good_id in counts[uuid] if good_id not in prices]
+                    if status == "created"
+                    else []
+                ),
+            )
+        )
+    response = ReceiptSyncResponse(
+        receipts=result,
+        oversold=[
+            OversoldGood(good_id=good_id, count=oversold)
+            for good_id, (_, oversold) in sorted(consumed.items())
+            if oversold
+        ],
+    ).model_dump(mode="json")
+
+    await save_idempotent_response(db, user_id, idempotency_key, response)
+    await purge_idempotency_keys(
+        db, user_id, timedelta(hours=config.IDEMPOTENCY_KEY_TTL_HOURS)
+    )
+    await db.commit()
+    return response
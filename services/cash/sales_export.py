@@ -0,0 +1,162 @@
+import csv
+import gzip
+import io
+import json
+import logging
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import AsyncIterator
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from starlette.concurrency import run_in_threadpool
+
+from backend import config
+from models import Receipt, Sales
+
+logger = logging.getLogger(__name__)
+
+RECEIPT_COLUMNS = ("receipt_id", "user_id", "created_at", "closed_at", "total_amount")
+LINE_COLUMNS = ("sale_id", "good_id", "quantity", "total_price", "sales_date")
+
+
+def _plain(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+class ExportStats:
+    def __init__(self):
+        self.rows = 0
+        self.receipts = 0
+        self.started = time.perf_counter()
+
+    @property
+    def seconds(self) -> float:
+        return time.perf_counter() - self.started
+
+    def as_dict(self) -> dict:
+        return {
+            "rows": self.rows,
+            "receipts": self.receipts,
+            "seconds": round(self.seconds, 3),
+            "rows_per_second": round(self.rows / self.seconds) if self.seconds else 0,
+        }
+
+
+async def export_sales(
+    factory: async_sessionmaker,
+    start: datetime,
+    end: datetime,
+    fmt: str,
+    stats: ExportStats | None = None,
+) -> AsyncIterator[str]:
+    """Закрытые чеки со строками продаж за [start, end) через серверный курсор
+
+    CSV - строка на продажу с полями чека, NDJSON - объект на чек со списком
+    строк. Строки идут по sales_date (индекс ix_sales_sales_date), строки одного
+    чека закрываются одним INSERT и поэтому идут подряд.
+    """
+
+    stats = stats or ExportStats()
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if fmt == "csv":
+        writer.writerow(RECEIPT_COLUMNS + LINE_COLUMNS)
+
+    receipt, lines = None, []
+
+    def flush_receipt():
+        if receipt is not None:
+            buffer.write(
+                json.dumps(
+                    {**dict(zip(RECEIPT_COLUMNS, receipt)), "lines": lines},
+                    ensure_ascii=False,
+                )
+                + "\n"
+            )
+
+    query = (
+        select(
+            Receipt.id,
+            Receipt.user_id,
+            Receipt.created_at,
+            Receipt.closed_at,
+            Receipt.total_amount,
+            Sales.id,
+            Sales.good_id,
+            Sales.quantity,
+            Sales.total_price,
+            Sales.sales_date,
+        )
+        .join(Receipt, Receipt.id == Sales.receipt_id)
+        .where(
+            Receipt.status == "closed",
+            Sales.sales_date >= start,
+            Sales.sales_date < end,
+        )
+        .order_by(Sales.sales_date, Sales.receipt_id, Sales.id)
+        .execution_options(yield_per=config.EXPORT_BATCH_SIZE)
+    )
+
+    async with factory() as db:
+        result = await db.stream(query)
+        async for rows in result.partitions():
+            for row in rows:
+                values = tuple(_plain(value) for value in row)
+                head, line = (
+                    values[: len(RECEIPT_COLUMNS)],
+                    values[len(RECEIPT_COLUMNS) :],
+                )
+                stats.rows += 1
+                if receipt is None or head[0] != receipt[0]:
+                    if fmt == "ndjson":
+                        flush_receipt()
+                    receipt, lines = head, []
+                    stats.receipts += 1
+
+                if fmt == "csv":
+                    writer.writerow(values)
+                else:
+                    lines.append(dict(zip(LINE_COLUMNS, line)))
+
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    if fmt == "ndjson":
+        flush_receipt()
+    yield buffer.getvalue()
+
+    logger.info(
+        "Выгрузка продаж %s - %s: %s",
+        start.isoformat(),
+        end.isoformat(),
+        stats.as_dict(),
+    )
+
+
+async def export_sales_to_file(
+    factory: async_sessionmaker, start: datetime, end: datetime, fmt: str
+) -> dict:
+    """Пишет выгрузку в gzip-файл в EXPORT_DIR (для заданий по расписанию)"""
+
+    directory = Path(config.EXPORT_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"sales_{start:%Y%m%d}_{end:%Y%m%d}.{fmt}.gz"
+    partial = path.with_suffix(".gz.partial")
+
+    stats = ExportStats()
+    file = await run_in_threadpool(gzip.open, partial, "wt", encoding="utf-8")
+    try:
+        async for chunk in export_sales(factory, start, end, fmt, stats):
+            await run_in_threadpool(file.write, chunk)
+    except BaseException:
+        await run_in_threadpool(file.close)
+        partial.unlink(missing_ok=True)
+        raise
+    await run_in_threadpool(file.close)
+
+    # файл появляется под итоговым именем только целиком
+    partial.replace(path)
+    return {"path": str(path), **stats.as_dict()}
@@ -0,0 +1,122 @@
+from fastapi import HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend import config
+from crud.category.category_crud import (
+    count_goods_in_categories,
+    delete_categories_batch,
+    get_category_tree,
+    get_job,
+    goods_have_history,
+    remove_goods_batch,
+)
+from models import BackgroundJob
+from services.jobs.job_runner import job_runner
+
+JOB_KIND = "category_delete"
+
+
+async def start_category_delete(
+    db: AsyncSession,
+    category_id: int,
+    current_user: dict,
+    move_goods_to: int | None = None,
+) -> int:
+    """Ставит задачу удаления категории с подкатегориями, возвращает id задачи
+
+    Товары поддерева удаляются (или переносятся в move_goods_to) пачками по
+    JOB_BATCH_SIZE, затем удаляются категории, начиная с самых глубоких.
+    Если у товаров есть история продаж, без move_goods_to - ответ 409.
+    """
+
+    if not current_user.get("is_owner"):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="У вас нет доступа к этой операции!",
+        )
+
+    tree = await get_category_tree(db)
+    if category_id not in tree:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Категории с таким id не существует!",
+        )
+
+    subtree = tree.descendants(category_id)
+    if move_goods_to is not None and (
+        move_goods_to not in tree or move_goods_to in subtree
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Товары можно перенести только в существующую категорию"
+            " вне удаляемого поддерева",
+        )
+
+    # удаление идет пачками в отдельных транзакциях: товар с историей
+    # уронил бы задачу посередине, оставив поддерево удаленным частично
+    if move_goods_to is None and await goods_have_history(db, subtree):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="В категориях есть товары с продажами, чеками или возвратами:"
+            " укажите move_goods_to, чтобы перенести товары",
+        )
+
+    return await job_runner.create(
+        db,
+        JOB_KIND,
+        params={"category_id": category_id, "move_goods_to": move_goods_to},
+        progress={
+            "goods_total": await count_goods_in_categories(db, subtree),
+            "goods_done": 0,
+            "categories_total": len(subtree),
+            "categories_done": 0,
+        },
+        user_id=current_user.get("id"),
+    )
+
+
+async def get_category_delete_job(
+    db: AsyncSession, job_id: int, current_user: dict
+) -> dict:
+    """Состояние задачи: как и запуск, доступно только владельцу"""
+
+    if not current_user.get("is_owner"):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="У вас нет доступа к этой операции!",
+        )
+    return await get_job(db, job_id)
+
+
+@job_runner.handler(JOB_KIND)
+async def delete_category_batch(db: AsyncSession, job: BackgroundJob) -> bool:
+    """Одна пачка удаления; поддерево пересчитывается по актуальному дереву,
+    поэтому повтор после падения продолжает с оставшихся строк"""
+
+    tree = await get_category_tree(db)
+    category_id = job.params["category_id"]
+    if category_id not in tree:
+        return True
+
+    subtree = tree.descendants(category_id)
+    progress = dict(job.progress)
+    move_to = job.params.get("move_goods_to")
+
+    # история могла появиться после постановки задачи (продажа, перенос
+    # товара): задача останавливается до удаления очередной пачки
+    if move_to is None and await goods_have_history(db, subtree):
+        raise RuntimeError(
+            "В категориях появились товары с продажами, чеками или возвратами"
+        )
+
+    if moved := await remove_goods_batch(db, subtree, config.JOB_BATCH_SIZE, move_to):
+        progress["goods_done"] += moved
+        job.progress = progress
+        return False
+
+    # товаров не осталось - удаляем категории снизу вверх
+    deepest_first = sorted(subtree, key=tree.depths.__getitem__, reverse=True)
+    batch = deepest_first[: config.JOB_BATCH_SIZE]
+    progress["categories_done"] += await delete_categories_batch(db, batch)
+    job.progress = progress
+    return category_id in batch
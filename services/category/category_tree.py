@@ -0,0 +1,90 @@
+class CategoryTree:
+    """Дерево категорий в памяти, строится одним запросом по всем категориям
+
+    Узлы раскладываются в порядке обхода в глубину, поэтому поддерево любой
+    категории - непрерывный срез этого порядка: потомки находятся без запросов
+    к БД и без обхода дерева.
+    """
+
+    def __init__(self, rows):
+        self.titles: dict[int, str] = {}
+        self.parents: dict[int, int | None] = {}
+        self.children: dict[int | None, list[int]] = {}
+        for category_id, parent_id, title in rows:
+            self.titles[category_id] = title
+            self.parents[category_id] = parent_id
+
+        for category_id in sorted(self.titles):
+            parent_id = self.parents[category_id]
+            # ссылка на несуществующего родителя - узел считается корнем
+            if parent_id not in self.titles:
+                parent_id = None
+            self.children.setdefault(parent_id, []).append(category_id)
+
+        self.order: list[int] = []
+        self.start: dict[int, int] = {}
+        self.end: dict[int, int] = {}
+        self.depths: dict[int, int] = {}
+        self._walk(self.children.get(None, []))
+        # узлы, замкнутые в цикл через parent_id, не достижимы от корней
+        for category_id in sorted(self.titles):
+            if category_id not in self.start:
+                self._walk([category_id])
+
+    def _walk(self, roots: list[int]):
+        stack = [(root, 0, False) for root in reversed(roots)]
+        while stack:
+            node, depth, leaving = stack.pop()
+            if leaving:
+                self.end[node] = len(self.order)
+                continue
+            if node in self.start:
+                continue
+
+            self.start[node] = len(self.order)
+            self.depths[node] = depth
+            self.order.append(node)
+            stack.append((node, depth, True))
+            for child in reversed(self.children.get(node, [])):
+                stack.append((child, depth + 1, False))
+
+    def __contains__(self, category_id: int) -> bool:
+        return category_id in self.start
+
+    def __len__(self) -> int:
+        return len(self.order)
+
+    def descendants(self, category_id: int) -> list[int]:
+        """id категории и всех ее потомков"""
+
+        return self.order[self.start[category_id] : self.end[category_id]]
+
+    def as_nested(self, root_id: int | None = None, depth: int | None = None):
+        """Вложенные словари {id, title, parent_id, children} от корней или от root_id"""
+
+        if root_id is None:
+            ids = self.order
+            base_depth = 0
+        else:
+            ids = self.descendants(root_id)
+            base_depth = self.depths[root_id]
+
+        result, nodes = [], {}
+        for category_id in ids:
+            level = self.depths[category_id] - base_depth
+            if depth is not None and level > depth:
+                continue
+
+            node = {
+                "id": category_id,
+                "title": self.titles[category_id],
+                "parent_id": self.parents[category_id],
+                "children": [],
+            }
+            nodes[category_id] = node
+            parent = nodes.get(self.parents[category_id])
+            if level == 0 or parent is None:
+                result.append(node)
+            else:
+                parent["children"].append(node)
+        return result
@@ -0,0 +1,174 @@
+import csv
+import io
+import json
+from decimal import Decimal
+from itertools import islice
+from typing import IO, AsyncIterator, Iterator
+
+from pydantic import ValidationError
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from starlette.concurrency import run_in_threadpool
+
+from backend import config
+from crud.good.good_crud import upsert_goods_batch
+from models import Category
+from models.article import Article
+from schemas.requests.good_from_user import GoodFromUser
+
+FORMATS = ("csv", "ndjson")
+EXPORT_COLUMNS = (
+    "id",
+    "name",
+    "category_id",
+    "price",
+    "cost_price",
+    "stock_quantity",
+    "low_stock_threshold",
+)
+
+
+def detect_format(filename: str | None, requested: str | None) -> str:
+    if requested:
+        return requested
+    if filename and filename.lower().endswith((".ndjson", ".jsonl")):
+        return "ndjson"
+    return "csv"
+
+
+def iter_rows(file: IO[bytes], fmt: str) -> Iterator[tuple[int, dict | None, str]]:
+    """Читает файл построчно: (номер строки, данные или None, ошибка разбора)"""
+
+    text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+    if fmt == "csv":
+        reader = csv.DictReader(text)
+        for row in reader:
+            # пустая ячейка - отсутствие значения, как null в NDJSON: так
+            # выгрузка с пустым low_stock_threshold загружается обратно
+            row = {key: value if value != "" else None for key, value in row.items()}
+            # строка файла, на которой закончилась запись (с учетом заголовка)
+            yield reader.line_num, row, ""
+        return
+
+    for row_number, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield row_number, json.loads(line), ""
+        except json.JSONDecodeError as error:
+            yield row_number, None, f"Неверный JSON: {error.msg}"
+
+
+async def iter_batches(
+    file: IO[bytes], fmt: str, batch_size: int
+) -> AsyncIterator[list[tuple[int, dict | None, str]]]:
+    """Пачки строк; чтение файла идет в пуле потоков, чтобы не блокировать loop"""
+
+    rows = iter_rows(file, fmt)
+    while batch := await run_in_threadpool(lambda: list(islice(rows, batch_size))):
+        yield batch
+
+
+async def import_goods_batch(
+    db: AsyncSession, batch: list[tuple[int, dict | None, str]], report: dict
+):
+    """Проверяет пачку, одним запросом находит категории и сохраняет товары"""
+
+    def fail(row_number: int, error: str):
+        report["errors_count"] += 1
+        if len(report["errors"]) < config.IMPORT_MAX_ERRORS:
+            report["errors"].append({"row": row_number, "error": error})
+
+    goods: dict[str, tuple[int, GoodFromUser]] = {}
+    for row_number, row, parse_error in batch:
+        if row is None:
+            fail(row_number, parse_error)
+            continue
+        try:
+            good = GoodFromUser.model_validate(row)
+        except ValidationError as error:
+            fail(
+                row_number,
+                "; ".join(
+                    f"{'.'.join(map(str, item['loc']))}: {item['msg']}"
+                    for item in error.errors()
+                ),
+            )
+            continue
+        # повтор имени в пачке: побеждает последняя строка, как при построчной загрузке
+        goods[good.name] = (row_number, good)
+
+    categories = set(
+        await db.scalars(
+            select(Category.id).where(
+                Category.id.in_({good.category_id for _, good in goods.values()})
+            )
+        )
+    )
+    valid = []
+    for row_number, good in goods.values():
+        if good.category_id in categories:
+            valid.append(good)
+        else:
+            fail(row_number, f"Категории с id {good.category_id} не существует")
+
+    if valid:
+        inserted, updated = await upsert_goods_batch(db, valid)
+        await db.commit()
+        report["inserted"] += inserted
+        report["updated"] += updated
+
+
+async def import_goods(
+    db: AsyncSession, file: IO[bytes], fmt: str, batch_size: int | None = None
+) -> dict:
+    """Потоковый импорт товаров; каждая пачка - отдельная транзакция"""
+
+    report = {"inserted": 0, "updated": 0, "errors_count": 0, "errors": []}
+    async for batch in iter_batches(file, fmt, batch_size or config.IMPORT_BATCH_SIZE):
+        await import_goods_batch(db, batch, report)
+    return report
+
+
+def _plain(value):
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    return value
+
+
+async def export_goods(factory: async_sessionmaker, fmt: str) -> AsyncIterator[str]:
+    """Выгрузка всех товаров через серверный курсор, память не зависит от размера
+
+    Сессия открывается внутри генератора: она должна жить, пока отдается ответ.
+    """
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if fmt == "csv":
+        writer.writerow(EXPORT_COLUMNS)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+    columns = [getattr(Article, column) for column in EXPORT_COLUMNS]
+    async with factory() as db:
+        result = await db.stream(
+            select(*columns)
+            .order_by(Article.id)
+            .execution_options(yield_per=config.EXPORT_BATCH_SIZE)
+        )
+        async for rows in result.partitions():
+            for row in rows:
+                values = [_plain(value) for value in row]
+                if fmt == "csv":
+                    writer.writerow(values)
+                else:
+                    buffer.write(
+                        json.dumps(
+                            dict(zip(EXPORT_COLUMNS, values)), ensure_ascii=False
+                        )
+                        + "\n"
+                    )
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
@@ -0,0 +1,152 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable
+
+from sqlalchemy import or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from backend import config
+from backend.db import session
+from models import BackgroundJob
+
+logger = logging.getLogger(__name__)
+
+# обработчик делает одну пачку работы и возвращает True, когда задача закончена
+JobHandler = Callable[[AsyncSession, BackgroundJob], Awaitable[bool]]
+
+
+class JobRunner:
+    """Выполняет фоновые задачи пачками, каждая пачка - отдельная транзакция
+
+    Задачу выполняет процесс, который ее захватил (status=running и свежий
+    heartbeat_at). Задачи брошенные упавшим процессом подхватываются при
+    старте и периодической проверке.
+    """
+
+    def __init__(self, factory: async_sessionmaker):
+        self.factory = factory
+        self.handlers: dict[str, JobHandler] = {}
+        self.tasks: dict[int, asyncio.Task] = {}
+        self.sweeper: asyncio.Task | None = None
+
+    def handler(self, kind: str):
+        def register(func: JobHandler) -> JobHandler:
+            self.handlers[kind] = func
+            return func
+
+        return register
+
+    async def create(
+        self, db: AsyncSession, kind: str, params: dict, progress: dict, user_id=None
+    ) -> int:
+        job = BackgroundJob(
+            kind=kind,
+            status="pending",
+            params=params,
+            progress=progress,
+            created_by=user_id,
+        )
+        db.add(job)
+        await db.flush()
+        job_id = job.id
+        await db.commit()
+        self.start(job_id)
+        return job_id
+
+    def start(self, job_id: int):
+        if job_id in self.tasks:
+            return
+        task = asyncio.get_running_loop().create_task(self.run(job_id))
+        self.tasks[job_id] = task
+        task.add_done_callback(lambda _: self.tasks.pop(job_id, None))
+
+    async def claim(self, db: AsyncSession, job_id: int) -> bool:
+        now = datetime.now()
+        stale = now - timedelta(seconds=config.JOB_STALE_SECONDS)
+        claimed = await db.scalar(
+            update(BackgroundJob)
+            .where(
+                BackgroundJob.id == job_id,
+                or_(
+                    BackgroundJob.status == "pending",
+                    (BackgroundJob.status == "running")
+                    & (
+                        BackgroundJob.heartbeat_at.is_(None)
+                        | (BackgroundJob.heartbeat_at < stale)
+                    ),
+                ),
+            )
+            .values(status="running", heartbeat_at=now)
+            .returning(BackgroundJob.id)
+        )
+        await db.commit()
+        return claimed is not None
+
+    async def run(self, job_id: int):
+        async with self.factory() as db:
+            if not await self.claim(db, job_id):
+                return
+
+            try:
+                while True:
+                    job = await db.get(BackgroundJob, job_id, populate_existing=True)
+                    finished = await self.handlers[job.kind](db, job)
+                    job.heartbeat_at = datetime.now()
+                    if finished:
+                        job.status = "done"
+                        job.finished_at = job.heartbeat_at
+                    await db.commit()
+                    if finished:
+                        return
+                    await asyncio.sleep(config.JOB_BATCH_PAUSE_SECONDS)
+            except asyncio.CancelledError:
+                # процесс останавливается - задачу продолжит следующий
+                raise
+            except Exception as error:
+                logger.exception("Фоновая задача %s завершилась ошибкой", job_id)
+                await db.rollback()
+                await db.execute(
+                    update(BackgroundJob)
+                    .where(BackgroundJob.id == job_id)
+                    .values(
+                        status="failed",
+                        error=str(error)[:1000],
+                        finished_at=datetime.now(),
+                    )
+                )
+                await db.commit()
+
+    async def resume(self):
+        """Запускает незавершенные задачи; занятые живыми процессами не захватит claim"""
+
+        async with self.factory() as db:
+            job_ids = await db.scalars(
+                select(BackgroundJob.id).where(
+                    BackgroundJob.status.in_(("pending", "running"))
+                )
+            )
+            for job_id in job_ids.all():
+                self.start(job_id)
+
+    async def sweep(self):
+        while True:
+            try:
+                await self.resume()
+            except Exception:
+                logger.exception("Не удалось проверить фоновые задачи")
+            await asyncio.sleep(config.JOB_STALE_SECONDS)
+
+    async def start_sweeper(self):
+        self.sweeper = asyncio.create_task(self.sweep())
+
+    async def stop(self):
+        tasks = list(self.tasks.values())
+        if self.sweeper is not None:
+            tasks.append(self.sweeper)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+job_runner = JobRunner(session)
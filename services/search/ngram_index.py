@@ -0,0 +1,68 @@
+from collections import defaultdict
+
+
+def words(text: str) -> list[str]:
+    return "".join(ch if ch.isalnum() else " " for ch in text.lower()).split()
+
+
+def trigrams(text: str) -> set[str]:
+    """Триграммы строки по правилам pg_trgm: слова в нижнем регистре с отступами"""
+
+    result = set()
+    for word in words(text):
+        padded = f"  {word} "
+        result.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return result
+
+
+def similarity(left: set[str], right: set[str]) -> float:
+    if not left or not right:
+        return 0.0
+    return len(left & right) / len(left | right)
+
+
+class NGramIndex:
+    """Триграммный индекс названий товаров в памяти
+
+    Замена pg_trgm для баз без расширения (SQLite в тестах): кандидаты
+    берутся из posting-листов триграмм запроса, ранжирование повторяет
+    поиск в Postgres - сначала совпадение по началу, затем по похожести.
+    """
+
+    THRESHOLD = 0.3
+
+    def __init__(self, names: dict[int, str | None]):
+        # товар без названия по имени не найти, в индекс он не попадает
+        self.names = {
+            good_id: name.lower() for good_id, name in names.items() if name is not None
+        }
+        self.grams: dict[int, set[str]] = {}
+        self.word_grams: dict[int, list[set[str]]] = {}
+        self.postings: dict[str, set[int]] = defaultdict(set)
+        for good_id, name in self.names.items():
+            self.grams[good_id] = trigrams(name)
+            self.word_grams[good_id] = [trigrams(word) for word in words(name)]
+            for gram in self.grams[good_id]:
+                self.postings[gram].add(good_id)
+
+    def search(self, query: str, limit: int) -> list[int]:
+        query_grams = trigrams(query)
+        needle = query.lower()
+
+        candidates = set()
+        for gram in query_grams:
+            candidates |= self.postings.get(gram, set())
+
+        ranked = []
+        for good_id in candidates:
+            name = self.names[good_id]
+            # похожесть на все название или на отдельное слово, как word_similarity
+            score = max(
+                similarity(query_grams, grams)
+                for grams in [self.grams[good_id], *self.word_grams[good_id]]
+            )
+            if needle in name or score >= self.THRESHOLD:
+                ranked.append((not name.startswith(needle), -score, name, good_id))
+
+        ranked.sort()
+        return [good_id for *_, good_id in ranked[:limit]]
@@ -1,11 +1,24 @@
 from collections import defaultdict
-from datetime import datetime, date
+from datetime import datetime, date, time, timedelta
 
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import HTTPException, status
 
-from crud.statistic.statistic_crud import get_sales_stats
+from backend import config
+from crud.rollup.rollup_crud import as_datetime
+from crud.category.category_crud import get_category_tree
+from crud.statistic.statistic_crud import (
+    SELLER_TOTALS,
+    get_abc_goods,
+    get_abc_summary,
+    get_sales_series_rows,
+    get_sales_stats,
+    get_seller_leaderboard,
+    get_seller_totals,
+    get_top_goods,
+    get_usernames,
+)
 
 
 async def get_sales_stat(
@@ -20,10 +33,337 @@ async def get_sales_stat(
 
     sales_product = await get_sales_stats(db, start_date, end_date)
 
-    if not sales_product:
+    if not sales_product["sales_count"]:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="За указанный период -  нет продаж!",
         )
 
     return sales_product
+
+
+def truncate(moment: datetime, bucket: str) -> datetime:
+    """Начало интервала, как его считает date_trunc в postgres"""
+
+    if bucket == "hour":
+        return moment.replace(minute=0, second=0, microsecond=0)
+    day = datetime.combine(moment.date(), time.min)
+    if bucket == "week":
+        return day - timedelta(days=day.weekday())
+    if bucket == "month":
+        return day.replace(day=1)
+    return day
+
+
+def next_bucket(moment: datetime, bucket: str) -> datetime:
+    if bucket == "month":
+        return moment.replace(
+            year=moment.year + moment.month // 12, month=moment.month % 12 + 1
+        )
+    return (
+        moment
+        + {
+            "hour": timedelta(hours=1),
+            "day": timedelta(days=1),
+            "week": timedelta(weeks=1),
+        }[bucket]
+    )
+
+
+def bucket_starts(start: datetime, end: datetime, bucket: str) -> list[datetime]:
+    starts = []
+    moment = truncate(start, bucket)
+    while moment <= end:
+        starts.append(moment)
+        if len(starts) > config.STAT_SERIES_MAX_POINTS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Слишком много интервалов, максимум"
+                f" {config.STAT_SERIES_MAX_POINTS}: увеличьте bucket или сократите период",
+            )
+        moment = next_bucket(moment, bucket)
+    return starts
+
+
+async def get_sales_series(
+    db: AsyncSession,
+    current_user: dict,
+    start_date: datetime,
+    end_date: datetime | date,
+    bucket: str,
+    group_by: str | None = None,
+) -> dict:
+    """Ряд выручки и прибыли по интервалам за период; пустые интервалы - нули"""
+
+    if not current_user.get("is_owner"):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="У вас нет прав на эту операцию!",
+        )
+
+    end_date = as_datetime(end_date)
+    if start_date >= end_date:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Дата начала должна быть раньше даты окончания",
+        )
+
+    starts = bucket_starts(start_date, end_date, bucket)
+    rows = await get_sales_series_rows(db, start_date, end_date, bucket, group_by)
+
+    keys = sorted(
+        {key for _, key in rows}, key=lambda key: (key is not None, key or 0)
+    ) or [None]
+    series = []
+    for key in keys:
+        points = []
+        for period in starts:
+            revenue, cost, count = rows.get((period, key), (0.0, 0.0, 0))
+            points.append(
+                {
+                    "period": period,
+                    "revenue": revenue,
+                    "cost": cost,
+                    "profit": revenue - cost,
+                    "sales_count": count,
+                }
+            )
+        series.append({"key": key, "points": points})
+
+    return {
+        "period_start": start_date,
+        "period_end": end_date,
+        "bucket": bucket,
+        "group_by": group_by,
+        "series": series,
+    }
+
+
+async def ranking_scope(
+    db: AsyncSession,
+    current_user: dict,
+    start_date: datetime,
+    end_date: datetime | date,
+    category_id: int | None,
+    include_descendants: bool,
+    a_share: float,
+    b_share: float,
+) -> tuple[datetime, list[int] | None]:
+    """Проверяет права и параметры рейтинга товаров
+
+    Returns:
+        tuple: конец периода и id категорий фильтра (None - все товары)
+    """
+
+    if not current_user.get("is_owner"):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="У вас нет прав на эту операцию!",
+        )
+
+    end_date = as_datetime(end_date)
+    if start_date >= end_date:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Дата начала должна быть раньше даты окончания",
+        )
+    if not 0 < a_share < b_share <= 1:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Границы классов должны быть 0 < a_share < b_share <= 1",
+        )
+
+    if category_id is None:
+        return end_date, None
+    tree = await get_category_tree(db)
+    if category_id not in tree:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Категории с таким id не существует!",
+        )
+    return end_date, (
+        tree.descendants(category_id) if include_descendants else [category_id]
+    )
+
+
+async def get_top_goods_stat(
+    db: AsyncSession,
+    current_user: dict,
+    start_date: datetime,
+    end_date: datetime | date,
+    metric: str,
+    limit: int,
+    category_id: int | None = None,
+    include_descendants: bool = False,
+) -> dict:
+    end_date, category_ids = await ranking_scope(
+        db,
+        current_user,
+        start_date,
+        end_date,
+        category_id,
+        include_descendants,
+        config.STAT_ABC_A_SHARE,
+        config.STAT_ABC_B_SHARE,
+    )
+    goods = await get_top_goods(
+        db,
+        start_date,
+        end_date,
+        category_ids,
+        metric,
+        limit,
+        config.STAT_ABC_A_SHARE,
+        config.STAT_ABC_B_SHARE,
+    )
+    return {
+        "period_start": start_date,
+        "period_end": end_date,
+        "metric": metric,
+        "category_id": category_id,
+        "goods": goods,
+    }
+
+
+async def get_abc_stat(
+    db: AsyncSession,
+    current_user: dict,
+    start_date: datetime,
+    end_date: datetime | date,
+    metric: str,
+    a_share: float,
+    b_share: float,
+    abc_class: str | None = None,
+    skip: int = 0,
+    limit: int = 100,
+    category_id: int | None = None,
+    include_descendants: bool = False,
+) -> dict:
+    end_date, category_ids = await ranking_scope(
+        db,
+        current_user,
+        start_date,
+        end_date,
+        category_id,
+        include_descendants,
+        a_share,
+        b_share,
+    )
+    args = (db, start_date, end_date, category_ids, metric, a_share, b_share)
+    return {
+        "period_start": start_date,
+        "period_end": end_date,
+        "metric": metric,
+        "category_id": category_id,
+        "a_share": a_share,
+        "b_share": b_share,
+        "classes": await get_abc_summary(*args),
+        "goods": (
+            await get_abc_goods(*args, abc_class, skip, limit)
+            if abc_class is not None
+            else []
+        ),
+    }
+
+
+def seller_report(user_id: int, username: str | None, totals: dict | None) -> dict:
+    report = dict.fromkeys(SELLER_TOTALS, 0) | (totals or {})
+    report["profit"] = report["revenue"] - report["cost"]
+    report["average_basket"] = (
+        report["revenue"] / report["receipts_count"]
+        if report["receipts_count"]
+        else 0.0
+    )
+    return {"user_id": user_id, "username": username, **report}
+
+
+def check_period(start_date: datetime, end_date: datetime | date) -> datetime:
+    end_date = as_datetime(end_date)
+    if start_date >= end_date:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Дата начала должна быть раньше даты окончания",
+        )
+    return end_date
+
+
+async def get_sellers_stat(
+    db: AsyncSession,
+    current_user: dict,
+    start_date: datetime,
+    end_date: datetime | date,
+    metric: str,
+    limit: int,
+    mode: str = "rollup",
+) -> dict:
+    """Рейтинг продавцов по метрике за период"""
+
+    if not current_user.get("is_owner"):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="У вас нет прав на эту операцию!",
+        )
+    end_date = check_period(start_date, end_date)
+
+    totals = await get_seller_leaderboard(db, start_date, end_date, mode == "raw")
+    usernames = await get_usernames(db, totals)
+    sellers = sorted(
+        (
+            seller_report(user_id, usernames.get(user_id), seller)
+            for user_id, seller in totals.items()
+        ),
+        key=lambda seller: (-seller[metric], seller["user_id"]),
+    )[:limit]
+    for rank, seller in enumerate(sellers, start=1):
+        seller["rank"] = rank
+
+    return {
+        "period_start": start_date,
+        "period_end": end_date,
+        "metric": metric,
+        "mode": mode,
+        "sellers": sellers,
+    }
+
+
+async def get_z_report(
+    db: AsyncSession,
+    current_user: dict,
+    user_id: int,
+    start_date: datetime | None = None,
+    end_date: datetime | date | None = None,
+    mode: str = "rollup",
+) -> dict:
+    """Итоги смены продавца; по умолчанию - с начала суток до текущего момента
+
+    Владелец видит отчет любого продавца, продавец - только свой.
+    """
+
+    if not (
+        current_user.get("is_owner")
+        or (current_user.get("is_seller") and current_user.get("id") == user_id)
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="У вас нет прав на эту операцию!",
+        )
+
+    now = datetime.now()
+    start_date = start_date or datetime.combine(now.date(), time.min)
+    end_date = check_period(start_date, end_date or now)
+
+    if not (usernames := await get_usernames(db, [user_id])):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Пользователя с таким id не существует",
+        )
+
+    totals = await get_seller_totals(
+        db, start_date, end_date, user_id, raw=mode == "raw"
+    )
+    return {
+        **seller_report(user_id, usernames[user_id], totals.get(user_id)),
+        "period_start": start_date,
+        "period_end": end_date,
+        "mode": mode,
+    }
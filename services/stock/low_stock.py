@@ -0,0 +1,214 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import Session
+
+from backend import config
+from backend.db import session
+from crud.category.category_crud import get_category_stock_thresholds
+from models import Notification
+
+logger = logging.getLogger(__name__)
+
+
+class LowStockMonitor:
+    """Уведомления о товарах, остаток которых опустился до порога
+
+    Проверка идет по значениям из RETURNING тех UPDATE, что меняют остаток,
+    без отдельных запросов к товарам. Уведомление создается только при
+    переходе порога сверху вниз и попадает в буфер после коммита транзакции;
+    буфер пишется в notifications одним INSERT раз в LOW_STOCK_FLUSH_SECONDS.
+    По одному товару - не больше одного уведомления за LOW_STOCK_DEDUP_SECONDS.
+    """
+
+    def __init__(
+        self,
+        factory: async_sessionmaker,
+        window: float,
+        flush_seconds: float,
+        batch_size: int,
+    ):
+        self.factory = factory
+        self.window = window
+        self.flush_seconds = flush_seconds
+        self.batch_size = batch_size
+        self.pending: dict[int, dict] = {}
+        self.alerted_at: dict[int, float] = {}
+        self.latest_id = 0
+        self.written = 0
+        self.deduplicated = 0
+        self.wakeup = asyncio.Event()
+        self.published = asyncio.Event()
+        self.task: asyncio.Task | None = None
+
+    async def check(self, db: AsyncSession, rows):
+        """Строки (id, название, категория, порог товара, было, стало)"""
+
+        thresholds = None
+        for good_id, name, category_id, own_threshold, before, after in rows:
+            if after >= before:
+                continue
+            threshold = own_threshold
+            if threshold is None:
+                if thresholds is None:
+                    thresholds = await get_category_stock_thresholds(db)
+                threshold = thresholds.get(
+                    category_id, config.LOW_STOCK_DEFAULT_THRESHOLD
+                )
+            if threshold is None or not after <= threshold < before:
+                continue
+
+            db.info.setdefault("low_stock", {})[good_id] = {
+                "good_id": good_id,
+                "description": f"Низкий остаток товара «{name}»:"
+                f" {after} шт. при пороге {threshold}",
+            }
+
+    def enqueue(self, alerts: dict[int, dict]):
+        now = time.monotonic()
+        for good_id, alert in alerts.items():
+            if now - self.alerted_at.get(good_id, -self.window) < self.window:
+                self.deduplicated += 1
+                continue
+            self.alerted_at[good_id] = now
+            self.pending[good_id] = {**alert, "date": datetime.now()}
+
+        if len(self.pending) >= self.batch_size:
+            self.wakeup.set()
+
+    def forget_expired(self):
+        now = time.monotonic()
+        self.alerted_at = {
+            good_id: alerted_at
+            for good_id, alerted_at in self.alerted_at.items()
+            if now - alerted_at < self.window
+        }
+
+    async def flush(self):
+        if not self.pending:
+            return
+        alerts, self.pending = list(self.pending.values()), {}
+        try:
+            written, latest_id = await self.write(alerts)
+        except Exception:
+            self.requeue(alerts)
+            raise
+        if not written:
+            return
+
+        self.written += written
+        self.latest_id = max(self.latest_id, latest_id)
+        self.publish()
+
+    def requeue(self, alerts: list[dict]):
+        """Возвращает незаписанную пачку в буфер до следующей попытки
+
+        Отметки дедупликации снимаются: иначе новые переходы порога
+        отбрасывались бы как уже отправленные. Повторов это не дает -
+        буфер держит одно уведомление на товар, а flush сверяется с
+        notifications за окно.
+        """
+
+        for alert in alerts:
+            # более новое уведомление по товару, пришедшее во время записи, важнее
+            self.pending.setdefault(alert["good_id"], alert)
+            self.alerted_at.pop(alert["good_id"], None)
+
+    async def write(self, alerts: list[dict]) -> tuple[int, int | None]:
+        """Пишет пачку, кроме товаров с уведомлением за окно
+
+        Returns:
+            tuple: сколько записано и id последнего уведомления (None - ни одного)
+        """
+
+        async with self.factory() as db:
+            # уведомление за окно могло записать другое приложение
+            recent = set(
+                await db.scalars(
+                    select(Notification.good_id).where(
+                        Notification.good_id.in_({a["good_id"] for a in alerts}),
+                        Notification.date
+                        > datetime.now() - timedelta(seconds=self.window),
+                    )
+                )
+            )
+            fresh = [alert for alert in alerts if alert["good_id"] not in recent]
+            self.deduplicated += len(recent)
+            if not fresh:
+                return 0, None
+
+            ids = await db.scalars(
+                insert(Notification).values(fresh).returning(Notification.id)
+            )
+            latest_id = max(ids)
+            await db.commit()
+        return len(fresh), latest_id
+
+    def publish(self):
+        self.published.set()
+        self.published = asyncio.Event()
+
+    async def wait(self, timeout: float) -> bool:
+        """Ждет записи новых уведомлений этим процессом, не дольше timeout"""
+
+        try:
+            await asyncio.wait_for(self.published.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    async def run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), self.flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self.wakeup.clear()
+            self.forget_expired()
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Не удалось записать уведомления о низком остатке")
+
+    async def start(self):
+        self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+        await self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self.pending),
+            "written": self.written,
+            "deduplicated": self.deduplicated,
+            "latest_id": self.latest_id,
+        }
+
+
+low_stock_monitor = LowStockMonitor(
+    session,
+    config.LOW_STOCK_DEDUP_SECONDS,
+    config.LOW_STOCK_FLUSH_SECONDS,
+    config.LOW_STOCK_BATCH_SIZE,
+)
+
+
+@event.listens_for(Session, "after_commit")
+def _enqueue_after_commit(ses: Session):
+    if alerts := ses.info.pop("low_stock", None):
+        low_stock_monitor.enqueue(alerts)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_after_rollback(ses: Session):
+    ses.info.pop("low_stock", None)
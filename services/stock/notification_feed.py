@@ -0,0 +1,86 @@
+import json
+import time
+from datetime import datetime
+from typing import AsyncIterator
+
+from fastapi import HTTPException, Request, status
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from backend import config
+from crud.notification.notification_crud import (
+    get_latest_notification_id,
+    get_notifications_after,
+)
+from services.stock.low_stock import low_stock_monitor
+
+
+def check_warehouse_access(current_user: dict):
+    if not (current_user.get("is_owner") or current_user.get("is_warehouse_worker")):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="У вас нет доступа к уведомлениям склада",
+        )
+
+
+async def wait_for_notifications(
+    factory: async_sessionmaker, after_id: int | None, timeout: float, limit: int
+) -> dict:
+    """Long-poll: уведомления после after_id или пустой список по таймауту
+
+    Запись этим процессом будит ожидание сразу, записи других процессов
+    находятся повторным запросом раз в NOTIFICATION_POLL_SECONDS.
+    """
+
+    deadline = time.monotonic() + timeout
+    async with factory() as db:
+        if after_id is None:
+            after_id = await get_latest_notification_id(db)
+        while True:
+            if notifications := await get_notifications_after(db, after_id, limit):
+                return {
+                    "notifications": notifications,
+                    "last_id": notifications[-1]["id"],
+                }
+            if (remaining := deadline - time.monotonic()) <= 0:
+                return {"notifications": [], "last_id": after_id}
+            # соединение не держим, пока ждем
+            await db.close()
+            await low_stock_monitor.wait(
+                min(remaining, config.NOTIFICATION_POLL_SECONDS)
+            )
+
+
+def _event(notification: dict) -> str:
+    data = {
+        key: value.isoformat() if isinstance(value, datetime) else value
+        for key, value in notification.items()
+    }
+    return (
+        f"id: {notification['id']}\n"
+        "event: low_stock\n"
+        f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+    )
+
+
+async def stream_notifications(
+    factory: async_sessionmaker, request: Request, after_id: int | None
+) -> AsyncIterator[str]:
+    """Server-Sent Events с уведомлениями; после переподключения клиент
+    присылает Last-Event-ID и получает пропущенные уведомления"""
+
+    if after_id is None:
+        async with factory() as db:
+            after_id = await get_latest_notification_id(db)
+
+    yield f"retry: {int(config.NOTIFICATION_POLL_SECONDS * 1000)}\n\n"
+    while not await request.is_disconnected():
+        async with factory() as db:
+            notifications = await get_notifications_after(db, after_id, 100)
+        for notification in notifications:
+            yield _event(notification)
+            after_id = notification["id"]
+        if len(notifications) == 100:
+            continue
+        if not await low_stock_monitor.wait(config.NOTIFICATION_POLL_SECONDS):
+            # комментарий не дает прокси закрыть простаивающее соединение
+            yield ": keepalive\n\n"
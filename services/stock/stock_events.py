@@ -0,0 +1,288 @@
+import asyncio
+import json
+import logging
+import uuid
+from decimal import Decimal
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.orm import Session
+
+from backend import config
+from backend.cache import TieredCache, catalogue_cache
+from backend.db import engine
+
+logger = logging.getLogger(__name__)
+
+RESYNC = {"type": "resync"}
+
+
+def stock_event(good_id: int, category_id, stock_quantity, price, **extra) -> dict:
+    if isinstance(price, Decimal):
+        price = float(price)
+    return {
+        "good_id": good_id,
+        "category_id": category_id,
+        "stock_quantity": stock_quantity,
+        "price": price,
+        **extra,
+    }
+
+
+def publish_on_commit(db, events: list[dict]):
+    """Регистрирует изменения товаров; подписчики получат их после коммита"""
+
+    db.info.setdefault("stock_events", {}).update(
+        (item["good_id"], item) for item in events
+    )
+
+
+class Subscription:
+    """Очередь событий одного клиента с фильтром по категориям
+
+    Элемент очереди - список изменений одного коммита. Если клиент не успевает
+    читать и очередь заполнилась, накопленное выбрасывается и вместо него
+    кладется resync: клиент заново запрашивает товары, а память не растет.
+    """
+
+    def __init__(self, categories: set[int] | None, maxsize: int):
+        self.categories = categories
+        self.queue: asyncio.Queue[list[dict] | dict] = asyncio.Queue(maxsize)
+        self.dropped = 0
+
+    def push(self, item: list[dict] | dict):
+        try:
+            self.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC)
+
+    async def get(self) -> list[dict] | dict:
+        return await self.queue.get()
+
+
+class StockEventHub:
+    """Рассылка изменений остатков и цен подписчикам процесса
+
+    Подписчики с фильтром лежат в индексе по категории, поэтому рассылка
+    коммита затрагивает только тех, кому он нужен.
+    """
+
+    def __init__(self, queue_size: int):
+        self.queue_size = queue_size
+        self.everything: set[Subscription] = set()
+        self.by_category: dict[int, set[Subscription]] = {}
+        self.published = 0
+
+    def subscribe(self, categories: set[int] | None = None) -> Subscription:
+        subscription = Subscription(categories, self.queue_size)
+        if categories is None:
+            self.everything.add(subscription)
+        for category_id in categories or ():
+            self.by_category.setdefault(category_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self.everything.discard(subscription)
+        for category_id in subscription.categories or ():
+            subscribers = self.by_category.get(category_id, set())
+            subscribers.discard(subscription)
+            if not subscribers:
+                self.by_category.pop(category_id, None)
+
+    def dispatch(self, events: list[dict]):
+        self.published += len(events)
+        for subscription in self.everything:
+            subscription.push(events)
+
+        matched: dict[Subscription, list[dict]] = {}
+        for item in events:
+            for subscription in self.by_category.get(item["category_id"], ()):
+                matched.setdefault(subscription, []).append(item)
+        for subscription, items in matched.items():
+            subscription.push(items)
+
+    def resync_all(self):
+        for subscription in self.subscribers():
+            subscription.push(RESYNC)
+
+    def subscribers(self) -> set[Subscription]:
+        return self.everything.union(*self.by_category.values())
+
+    def stats(self) -> dict:
+        subscribers = self.subscribers()
+        return {
+            "subscribers": len(subscribers),
+            "published": self.published,
+            "dropped": sum(subscription.dropped for subscription in subscribers),
+        }
+
+
+class PgNotifyBridge:
+    """Передает события и сбросы кэша между процессами через LISTEN/NOTIFY postgres
+
+    Держит отдельное соединение asyncpg вне пула: на нем слушается канал и
+    отправляются события и сбросы кэша каталога этого процесса. Свои
+    сообщения процесс пропускает - у него они уже применены. После
+    переподключения подписчики получают resync, а кэш процесса очищается,
+    так как часть сообщений могла потеряться.
+    """
+
+    def __init__(
+        self,
+        hub: StockEventHub,
+        cache: TieredCache,
+        db_engine: AsyncEngine,
+        channel: str,
+    ):
+        self.hub = hub
+        self.cache = cache
+        self.engine = db_engine
+        self.channel = channel
+        self.origin = uuid.uuid4().hex[:12]
+        # элемент - поле сообщения и его содержимое: events или invalidate
+        self.outbox: asyncio.Queue[tuple[str, list]] = asyncio.Queue(
+            config.STOCK_EVENTS_OUTBOX_SIZE
+        )
+        self.overflowed = False
+        self.task: asyncio.Task | None = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.engine.dialect.name == "postgresql"
+
+    def send(self, events: list[dict]):
+        self._put("events", events)
+
+    def send_invalidation(self, pending: set[tuple[str, bool]]):
+        self._put("invalidate", [[key, is_prefix] for key, is_prefix in pending])
+
+    def _put(self, field: str, items: list):
+        if self.task is None:
+            return
+        try:
+            self.outbox.put_nowait((field, items))
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+    def receive(self, connection, pid, channel, payload: str):
+        message = json.loads(payload)
+        if message["origin"] == self.origin:
+            return
+        if message.get("resync"):
+            self.cache.clear_local()
+            self.hub.resync_all()
+        elif "invalidate" in message:
+            self.cache.apply_remote(
+                {(key, is_prefix) for key, is_prefix in message["invalidate"]}
+            )
+        else:
+            events = message["events"]
+            # событие может обогнать сброс кэша из того же коммита: клиент,
+            # получивший его, не должен прочитать из кэша старый товар
+            self.cache.apply_remote(
+                {(f"good:{item['good_id']}", False) for item in events}
+            )
+            self.hub.dispatch(events)
+
+    def messages(self, field: str, items: list) -> list[str]:
+        """Режет элементы поля на сообщения меньше лимита NOTIFY в 8000 байт"""
+
+        messages, chunk, size = [], [], 0
+        for item in items:
+            encoded = json.dumps(item)
+            if chunk and size + len(encoded) > config.STOCK_EVENTS_MESSAGE_BYTES:
+                messages.append(chunk)
+                chunk, size = [], 0
+            chunk.append(encoded)
+            size += len(encoded) + 1
+        if chunk:
+            messages.append(chunk)
+        return [
+            f'{{"origin": "{self.origin}", "{field}": [{",".join(chunk)}]}}'
+            for chunk in messages
+        ]
+
+    async def connect(self):
+        import asyncpg
+
+        # параметры запроса в URL - настройки диалекта sqlalchemy
+        # (prepared_statement_cache_size), asyncpg передал бы их серверу
+        url = self.engine.url.set(drivername="postgresql", query={})
+        connection = await asyncpg.connect(url.render_as_string(hide_password=False))
+        await connection.add_listener(self.channel, self.receive)
+        return connection
+
+    async def notify(self, connection, payload: str):
+        await connection.execute("SELECT pg_notify($1, $2)", self.channel, payload)
+
+    async def serve(self, connection):
+        while True:
+            if self.overflowed:
+                self.overflowed = False
+                await self.notify(
+                    connection, json.dumps({"origin": self.origin, "resync": True})
+                )
+            try:
+                field, items = await asyncio.wait_for(
+                    self.outbox.get(), config.STOCK_EVENTS_KEEPALIVE_SECONDS
+                )
+            except asyncio.TimeoutError:
+                # разрыв простаивающего соединения иначе не заметить
+                await connection.execute("SELECT 1")
+                continue
+            for payload in self.messages(field, items):
+                await self.notify(connection, payload)
+
+    async def run(self):
+        while True:
+            try:
+                connection = await self.connect()
+            except Exception:
+                logger.exception("Не удалось подключиться к каналу %s", self.channel)
+                await asyncio.sleep(config.STOCK_EVENTS_RECONNECT_SECONDS)
+                continue
+            try:
+                self.cache.clear_local()
+                self.hub.resync_all()
+                await self.serve(connection)
+            except Exception:
+                logger.exception("Потеряно соединение с каналом %s", self.channel)
+            finally:
+                await connection.close()
+
+    async def start(self):
+        if self.enabled:
+            self.task = asyncio.create_task(self.run())
+            self.cache.broadcast = self.send_invalidation
+
+    async def stop(self):
+        self.cache.broadcast = None
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+
+stock_hub = StockEventHub(config.STOCK_EVENTS_QUEUE_SIZE)
+stock_bridge = PgNotifyBridge(
+    stock_hub, catalogue_cache, engine, config.STOCK_EVENTS_CHANNEL
+)
+
+
+@event.listens_for(Session, "after_commit")
+def _dispatch_after_commit(ses: Session):
+    if events := ses.info.pop("stock_events", None):
+        events = list(events.values())
+        stock_hub.dispatch(events)
+        stock_bridge.send(events)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_after_rollback(ses: Session):
+    ses.info.pop("stock_events", None)
@@ -0,0 +1,109 @@
+import asyncio
+import json
+from typing import AsyncIterator
+
+from fastapi import HTTPException, Request, WebSocket, WebSocketDisconnect, status
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from backend import config
+from crud.category.category_crud import get_category_tree
+from services.stock.stock_events import RESYNC, stock_hub
+
+
+async def resolve_categories(
+    factory: async_sessionmaker,
+    category_ids: list[int] | None,
+    include_descendants: bool = False,
+) -> set[int] | None:
+    """Категории подписки; None - все товары. 404, если категории нет
+
+    Сама подписка создается в обработчике потока: если клиент отключится
+    до начала ответа, отписываться будет нечего.
+    """
+
+    if not category_ids:
+        return None
+
+    categories = set(category_ids)
+    async with factory() as db:
+        tree = await get_category_tree(db)
+    if missing := [
+        category_id for category_id in categories if category_id not in tree
+    ]:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Категорий с id {missing} не существует",
+        )
+    if include_descendants:
+        categories = {
+            descendant
+            for category_id in categories
+            for descendant in tree.descendants(category_id)
+        }
+    return categories
+
+
+def _message(item: list[dict] | dict) -> tuple[str, str]:
+    if item is RESYNC:
+        return "resync", "{}"
+    return "stock", json.dumps(item)
+
+
+async def stream_stock_events(
+    request: Request, categories: set[int] | None
+) -> AsyncIterator[str]:
+    """Server-Sent Events с изменениями остатков и цен
+
+    Первым приходит resync: клиент загружает товары уже после подписки
+    и не теряет изменения, сделанные между загрузкой и подпиской.
+    """
+
+    subscription = stock_hub.subscribe(categories)
+    subscription.push(RESYNC)
+    try:
+        while not await request.is_disconnected():
+            try:
+                item = await asyncio.wait_for(
+                    subscription.get(), config.STOCK_EVENTS_KEEPALIVE_SECONDS
+                )
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            event, data = _message(item)
+            yield f"event: {event}\ndata: {data}\n\n"
+    finally:
+        stock_hub.unsubscribe(subscription)
+
+
+async def serve_stock_websocket(websocket: WebSocket, categories: set[int] | None):
+    """То же, что SSE, сообщениями {"type": "stock" | "resync", "events": [...]}
+
+    Входящие сообщения читаются параллельно с отправкой, чтобы отключение
+    клиента замечалось сразу, а не при следующем событии.
+    """
+
+    async def send():
+        while True:
+            item = await subscription.get()
+            if item is RESYNC:
+                await websocket.send_json({"type": "resync"})
+            else:
+                await websocket.send_json({"type": "stock", "events": item})
+
+    async def receive():
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+
+    subscription = stock_hub.subscribe(categories)
+    subscription.push(RESYNC)
+    tasks = [asyncio.create_task(send()), asyncio.create_task(receive())]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            if isinstance(task.exception(), WebSocketDisconnect):
+                continue
+            task.result()
+    finally:
+        for task in tasks:
+            task.cancel()
+        stock_hub.unsubscribe(subscription)